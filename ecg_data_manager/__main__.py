@@ -0,0 +1,175 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Command-line entry point that processes and exports the ECG data without a notebook, e.g., for
+nightly exports from cron.
+
+Run from the repository root:
+
+    python -m ecg_data_manager [--output database] [--format csv] [--fetch_workers 8]
+        [--chunk_size 2048] [--cache_dir .ecg_cache] [--incremental] [--filter]
+        [--sampling_rate 512] [--service_account key.json]
+
+The exit status is 0 on success, 1 if the data of some users could not be fetched (the export
+contains all other users), and 2 for invalid arguments.
+"""
+
+# Standard library imports
+import argparse
+import os
+import sys
+from importlib.util import find_spec
+
+# Related third-party imports
+from spezi_data_pipeline.data_access.firebase_fhir_data_access import (
+    FirebaseFHIRAccess,
+)
+
+# Local application/library specific imports
+from .modules.pipeline import DEFAULT_FETCH_WORKERS, run_pipeline
+from .modules.utils import ExportFormat
+from .modules.waveforms import DEFAULT_CHUNK_SIZE
+
+
+def main():
+    """
+    Connects to Firestore using FirebaseFHIRAccess, runs the ECG processing pipeline, and prints
+    the stage timings.
+
+    Environment Variables:
+        FIRESTORE_EMULATOR_HOST (str): The Firestore emulator host (e.g., "localhost:8080").
+        GCLOUD_PROJECT (str): The Google Cloud project ID, unless --project_id is given.
+
+    Command-line Arguments:
+        --output (str): The base filename of the timestamped export (default is "database").
+        --format (str): The export format: csv, parquet, or pkl (default is csv).
+        --fetch_workers (int): Number of users fetched concurrently (default is 8).
+        --chunk_size (int): Maximum number of recordings processed at once (default is 2048).
+        --cache_dir (str): Directory in which the processed data is kept for incremental runs.
+        --incremental (bool): Reuse the waveform features of the recordings in the cache.
+        --filter (bool): Add filtered copies of the waveforms.
+        --sampling_rate (float): Resample all recordings to this sampling rate in Hz.
+        --quiet (bool): Only print the summary.
+        --project_id (str): The Google Cloud project ID (default is $GCLOUD_PROJECT).
+        --service_account (str): The path to the service account JSON file for Firebase.
+    """
+    parser = argparse.ArgumentParser(prog="python -m ecg_data_manager")
+    parser.add_argument(
+        "--output",
+        default="database",
+        type=str,
+        help="The base filename of the timestamped export",
+    )
+    parser.add_argument(
+        "--format",
+        default=ExportFormat.CSV.value,
+        choices=[export_format.value for export_format in ExportFormat],
+        help="The export format",
+    )
+    parser.add_argument(
+        "--fetch_workers",
+        default=DEFAULT_FETCH_WORKERS,
+        type=int,
+        help="Number of users fetched concurrently",
+    )
+    parser.add_argument(
+        "--chunk_size",
+        default=DEFAULT_CHUNK_SIZE,
+        type=int,
+        help="Maximum number of recordings processed at once",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        help="Directory in which the processed data is kept for incremental runs",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Reuse the waveform features of the recordings in the cache",
+    )
+    parser.add_argument(
+        "--filter",
+        action="store_true",
+        help="Add filtered copies of the waveforms",
+    )
+    parser.add_argument(
+        "--sampling_rate",
+        type=float,
+        help="Resample all recordings to this sampling rate in Hz, e.g., 512",
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Only print the summary",
+    )
+    parser.add_argument(
+        "--project_id",
+        default=os.environ.get("GCLOUD_PROJECT"),
+        type=str,
+        help="The Google Cloud project ID",
+    )
+    parser.add_argument(
+        "--service_account",
+        default="",
+        type=str,
+        help="The path to the service account JSON file for Firebase",
+    )
+    parsed = parser.parse_args()
+
+    if parsed.incremental and parsed.cache_dir is None:
+        parser.error("--incremental requires --cache_dir")
+    if parsed.fetch_workers < 1 or parsed.chunk_size < 1:
+        parser.error("--fetch_workers and --chunk_size must be positive")
+    if parsed.sampling_rate is not None and parsed.sampling_rate <= 0:
+        parser.error("--sampling_rate must be positive")
+    if parsed.format == ExportFormat.PARQUET.value and not (
+        find_spec("pyarrow") or find_spec("fastparquet")
+    ):
+        parser.error("--format parquet requires pyarrow or fastparquet to be installed")
+
+    firebase_access = FirebaseFHIRAccess(parsed.project_id, parsed.service_account)
+    firebase_access.connect()
+
+    result = run_pipeline(
+        firebase_access.db,
+        output=parsed.output,
+        output_format=ExportFormat(parsed.format),
+        fetch_workers=parsed.fetch_workers,
+        chunk_size=parsed.chunk_size,
+        cache_dir=parsed.cache_dir,
+        incremental=parsed.incremental,
+        filter_waveforms=parsed.filter,
+        sampling_rate=parsed.sampling_rate,
+        verbose=not parsed.quiet,
+    )
+
+    print(f"{'stage':<24}{'seconds':>10}")
+    for stage, seconds in result.timings.seconds.items():
+        print(f"{stage:<24}{seconds:>10.2f}")
+    print(f"{'total':<24}{result.timings.total:>10.2f}")
+    print(
+        f"Processed {result.recordings} recordings of {result.users} users "
+        f"({result.reused} with cached waveform features)."
+    )
+    if result.output_path is not None:
+        print(f"Exported to {result.output_path}.")
+
+    if result.partial_failure:
+        failed_users = sorted(set(result.failed_users))
+        print(
+            f"Failed to fetch the data of {len(failed_users)} users: "
+            f"{', '.join(failed_users)}",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Benchmark of the cold import time of the ECG data manager modules.
+
+Every module is imported in a fresh interpreter several times, and the median import time and
+the heavy packages the import loaded are reported. With `--check`, the benchmark fails if a
+module of the processing core loads matplotlib, IPython, ipywidgets, or the Firestore client,
+or if its median import time exceeds `--budget`.
+
+Run from the `ecg_data_manager` folder:
+
+    python -m benchmarks.import_time [--repeat 5] [--check] [--budget 2.0]
+"""
+
+# Standard library imports
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+CORE_MODULES = [
+    "agreement",
+    "compaction",
+    "diagnoses",
+    "duplicates",
+    "features",
+    "filtering",
+    "pipeline",
+    "priority",
+    "quality",
+    "resampling",
+    "similarity",
+    "utils",
+    "waveforms",
+]
+OTHER_MODULES = [
+    "plotting",
+    "figure_cache",
+    "rendering",
+    "assignment",
+    "live_updates",
+    "review_journal",
+    "write_queue",
+    "visualization",
+]
+# Dependencies of the rendering and review layers that the processing core must not load
+FORBIDDEN_IN_CORE = ["matplotlib", "IPython", "ipywidgets", "google.cloud.firestore"]
+# Packages reported as loaded by an import; the lazily imported ones are allowed in the core
+REPORTED_PACKAGES = FORBIDDEN_IN_CORE + ["scipy.signal", "scipy.sparse"]
+
+MEASURE = """
+import json, sys, time, warnings
+warnings.simplefilter("ignore")
+start = time.perf_counter()
+import modules.{module}
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": seconds,
+    "loaded": [name for name in {packages!r} if name in sys.modules],
+}}))
+"""
+
+
+def measure_import(module: str, repeat: int) -> dict:
+    """
+    Import a module in fresh interpreters and measure the import time.
+
+    Args:
+        module (str): The name of the module in the `modules` package.
+        repeat (int): The number of fresh interpreters.
+
+    Returns:
+        dict: The 'median' and 'min' import time in seconds and the 'loaded' heavy packages.
+    """
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                MEASURE.format(module=module, packages=REPORTED_PACKAGES),
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    seconds = [run["seconds"] for run in runs]
+    return {
+        "median": statistics.median(seconds),
+        "min": min(seconds),
+        "loaded": runs[-1]["loaded"],
+    }
+
+
+def main():
+    """
+    Measure the import time of all modules, print a table, and optionally check the budget of
+    the processing core.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--repeat",
+        default=5,
+        type=int,
+        help="The number of fresh interpreters per module",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Fail if the processing core loads a forbidden package or exceeds the budget",
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        help="The maximum median import time of a core module in seconds",
+    )
+    parsed = parser.parse_args()
+
+    failures = []
+    print(f"{'module':<16}{'layer':<8}{'median [s]':>12}{'min [s]':>10}  loaded")
+    for module in CORE_MODULES + OTHER_MODULES:
+        core = module in CORE_MODULES
+        result = measure_import(module, parsed.repeat)
+        print(
+            f"{module:<16}{'core' if core else '':<8}{result['median']:>12.2f}"
+            f"{result['min']:>10.2f}  {', '.join(result['loaded'])}"
+        )
+        if not core:
+            continue
+        forbidden = [name for name in result["loaded"] if name in FORBIDDEN_IN_CORE]
+        if forbidden:
+            failures.append(f"modules.{module} loads {', '.join(forbidden)}")
+        if parsed.budget is not None and result["median"] > parsed.budget:
+            failures.append(
+                f"modules.{module} takes {result['median']:.2f} s to import "
+                f"(budget {parsed.budget:.2f} s)"
+            )
+
+    if parsed.check and failures:
+        print("\n".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
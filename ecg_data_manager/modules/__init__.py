@@ -0,0 +1,24 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Modules of the ECG data manager, in three layers by their dependencies.
+
+- Processing core (`agreement`, `compaction`, `diagnoses`, `duplicates`, `features`,
+  `filtering`, `pipeline`, `priority`, `quality`, `resampling`, `similarity`, `utils`,
+  `waveforms`): DataFrame and signal processing for batch and command-line use. Importing
+  these modules loads neither matplotlib, IPython, ipywidgets, nor the Firestore client;
+  SciPy's signal and sparse modules and the Firestore helpers are imported on first use.
+  `python -m ecg_data_manager` runs the pipeline headless from the repository root.
+- Rendering (`plotting`, `figure_cache`, `rendering`): headless matplotlib figures.
+- Review tools (`assignment`, `live_updates`, `review_journal`, `write_queue`,
+  `visualization`): Firestore-backed review workflow and the notebook widgets.
+
+`python -m benchmarks.import_time --check` measures the cold import time of every module and
+fails if a module of the processing core loads a dependency of the other layers.
+"""
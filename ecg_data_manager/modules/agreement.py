@@ -0,0 +1,339 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Inter-rater agreement of the physician reviews, e.g., for the diagnosis and the tracing quality.
+
+The reviews of all recordings are encoded as one integer array of shape (recordings, reviews),
+from which Fleiss' kappa, the mean pairwise Cohen's kappa between the first, second, and third
+reviews, and the confusion matrix are computed with array operations. Bootstrap replicates
+resample recordings by drawing multinomial weights, so a whole block of replicates is a few
+matrix products; the blocks are distributed over a pool of worker processes.
+"""
+
+# Standard library imports
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+from itertools import combinations
+
+# Related third-party imports
+import numpy as np
+import pandas as pd
+
+# Local application/library specific imports
+from spezi_data_pipeline.data_flattening.fhir_resources_flattener import ColumnNames
+from .diagnoses import attach_diagnoses, diagnoses_wide_view, is_diagnoses_table
+
+MAX_REVIEWS = 3
+PHYSICIAN_DIAGNOSIS = "physicianDiagnosis"
+TRACING_QUALITY = "tracingQuality"
+AGE_GROUP = "AgeGroup"
+ALL = "All"
+DEFAULT_BOOTSTRAP_REPLICATES = 1000
+BOOTSTRAP_BLOCK_SIZE = 100
+
+
+class AgreementColumns(Enum):
+    """
+    Enumerates the columns of the agreement summary.
+    """
+
+    BREAKDOWN = "Breakdown"
+    VALUE = "Value"
+    RECORDINGS = "Recordings"
+    PERCENT_AGREEMENT = "PercentAgreement"
+    FLEISS_KAPPA = "FleissKappa"
+    FLEISS_CI_LOW = "FleissKappaCILow"
+    FLEISS_CI_HIGH = "FleissKappaCIHigh"
+    COHEN_KAPPA = "CohenKappa"
+    COHEN_CI_LOW = "CohenKappaCILow"
+    COHEN_CI_HIGH = "CohenKappaCIHigh"
+
+
+def rating_codes(
+    df: pd.DataFrame, key: str = PHYSICIAN_DIAGNOSIS
+) -> tuple[np.ndarray, list]:
+    """
+    Encode the reviews of every recording as category codes.
+
+    Args:
+        df (pd.DataFrame): The processed ECG data with 'Diagnosis{i}_{key}' columns, or the
+            diagnoses table indexed by (ResourceId, ReviewIndex).
+        key (str): The reviewed field, e.g., 'physicianDiagnosis' or 'tracingQuality'.
+
+    Returns:
+        tuple[np.ndarray, list]: Codes of shape (n_recordings, MAX_REVIEWS), with -1 for
+            missing reviews, and the categories the codes refer to.
+    """
+    if is_diagnoses_table(df):
+        df = diagnoses_wide_view(df[[key]])
+    columns = [f"Diagnosis{i + 1}_{key}" for i in range(MAX_REVIEWS)]
+    ratings = df.reindex(columns=columns).astype(object)
+    ratings = ratings.where(ratings.notna() & (ratings != ""), None)
+
+    categories = sorted(
+        {value for value in ratings.to_numpy().ravel() if value is not None}, key=str
+    )
+    codes = np.column_stack(
+        [
+            pd.Categorical(ratings[column], categories=categories).codes
+            for column in columns
+        ]
+    ).astype(np.int64)
+    return codes, categories
+
+
+def category_counts(codes: np.ndarray, n_categories: int) -> np.ndarray:
+    """
+    Count the reviews per category of every recording.
+
+    Args:
+        codes (np.ndarray): Category codes of shape (n_recordings, n_reviews), -1 if missing.
+        n_categories (int): Number of categories.
+
+    Returns:
+        np.ndarray: Counts of shape (n_recordings, n_categories).
+    """
+    return (codes[:, :, np.newaxis] == np.arange(n_categories)).sum(axis=1)
+
+
+def _as_weights(weights: np.ndarray | None, n_recordings: int) -> np.ndarray:
+    """Return the recording weights as a two-dimensional (replicates, recordings) array."""
+    if weights is None:
+        return np.ones((1, n_recordings))
+    return np.atleast_2d(weights).astype(float)
+
+
+def fleiss_kappa(
+    counts: np.ndarray, weights: np.ndarray | None = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compute Fleiss' kappa for recordings with varying numbers of reviews.
+
+    Args:
+        counts (np.ndarray): Reviews per category of shape (n_recordings, n_categories), only
+            recordings with at least two reviews.
+        weights (np.ndarray | None): Recording weights of shape (n_replicates, n_recordings),
+            e.g., bootstrap resampling counts (default is one unweighted replicate).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Fleiss' kappa and the observed pairwise agreement, one
+            value per replicate.
+    """
+    weights = _as_weights(weights, counts.shape[0])
+    reviews = counts.sum(axis=1)
+    pair_agreement = (counts * (counts - 1)).sum(axis=1) / (reviews * (reviews - 1))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        observed = weights @ pair_agreement / weights.sum(axis=1)
+        proportions = (weights @ counts) / (weights @ reviews)[:, np.newaxis]
+        expected = (proportions**2).sum(axis=1)
+        return (observed - expected) / (1 - expected), observed
+
+
+def cohen_kappa(
+    codes: np.ndarray, n_categories: int, weights: np.ndarray | None = None
+) -> np.ndarray:
+    """
+    Compute the mean Cohen's kappa over all pairs of review positions.
+
+    Args:
+        codes (np.ndarray): Category codes of shape (n_recordings, n_reviews), -1 if missing.
+        n_categories (int): Number of categories.
+        weights (np.ndarray | None): Recording weights of shape (n_replicates, n_recordings)
+            (default is one unweighted replicate).
+
+    Returns:
+        np.ndarray: The mean pairwise Cohen's kappa, one value per replicate.
+    """
+    weights = _as_weights(weights, codes.shape[0])
+    one_hot = codes[:, :, np.newaxis] == np.arange(n_categories)
+
+    kappas = []
+    for first, second in combinations(range(codes.shape[1]), 2):
+        rated = (codes[:, first] >= 0) & (codes[:, second] >= 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            total = weights @ rated
+            observed = weights @ (rated & (codes[:, first] == codes[:, second])) / total
+            first_marginal = (
+                weights
+                @ (one_hot[:, first] & rated[:, np.newaxis])
+                / total[:, np.newaxis]
+            )
+            second_marginal = (
+                weights
+                @ (one_hot[:, second] & rated[:, np.newaxis])
+                / total[:, np.newaxis]
+            )
+            expected = (first_marginal * second_marginal).sum(axis=1)
+            kappas.append((observed - expected) / (1 - expected))
+
+    kappas = np.array(kappas)
+    with np.errstate(invalid="ignore"):
+        valid = ~np.isnan(kappas)
+        return np.where(
+            valid.any(axis=0),
+            np.where(valid, kappas, 0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1),
+            np.nan,
+        )
+
+
+def confusion_matrix(df: pd.DataFrame, key: str = PHYSICIAN_DIAGNOSIS) -> pd.DataFrame:
+    """
+    Count how often two reviews of the same recording assign each pair of categories.
+
+    Every pair of reviews of a recording is counted in both directions, so the matrix is
+    symmetric and its diagonal holds the agreeing pairs.
+
+    Args:
+        df (pd.DataFrame): The processed ECG data with 'Diagnosis{i}_{key}' columns, or the
+            diagnoses table indexed by (ResourceId, ReviewIndex).
+        key (str): The reviewed field, e.g., 'physicianDiagnosis' or 'tracingQuality'.
+
+    Returns:
+        pd.DataFrame: Pair counts with the categories as index and columns.
+    """
+    codes, categories = rating_codes(df, key)
+    one_hot = (codes[:, :, np.newaxis] == np.arange(len(categories))).astype(np.int64)
+
+    matrix = np.zeros((len(categories), len(categories)), dtype=np.int64)
+    for first, second in combinations(range(codes.shape[1]), 2):
+        pairs = one_hot[:, first].T @ one_hot[:, second]
+        matrix += pairs + pairs.T
+    return pd.DataFrame(matrix, index=categories, columns=categories)
+
+
+def _bootstrap_block(args) -> np.ndarray:
+    """
+    Compute a block of bootstrap replicates of Fleiss' and Cohen's kappa.
+
+    Args:
+        args (tuple): The codes, the number of categories, the number of replicates, and the
+            seed of the block.
+
+    Returns:
+        np.ndarray: Array of shape (2, n_replicates) with Fleiss' and Cohen's kappa.
+    """
+    codes, n_categories, replicates, seed = args
+    rng = np.random.default_rng(seed)
+    n_recordings = codes.shape[0]
+    weights = rng.multinomial(
+        n_recordings, np.full(n_recordings, 1 / n_recordings), size=replicates
+    )
+    fleiss, _ = fleiss_kappa(category_counts(codes, n_categories), weights)
+    return np.vstack([fleiss, cohen_kappa(codes, n_categories, weights)])
+
+
+def agreement_summary(  # pylint: disable=too-many-arguments, too-many-positional-arguments, too-many-locals
+    df: pd.DataFrame,
+    key: str = PHYSICIAN_DIAGNOSIS,
+    by: tuple = (AGE_GROUP, ColumnNames.APPLE_ELECTROCARDIOGRAM_CLASSIFICATION.value),
+    n_bootstrap: int = DEFAULT_BOOTSTRAP_REPLICATES,
+    confidence: float = 0.95,
+    max_workers: int | None = None,
+    seed: int = 0,
+    diagnoses: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    """
+    Summarize the inter-rater agreement overall and broken down by the given columns.
+
+    Only recordings with at least two reviews are included.
+
+    Args:
+        df (pd.DataFrame): The processed ECG data with 'Diagnosis{i}_{key}' columns.
+        key (str): The reviewed field, e.g., 'physicianDiagnosis' (default) or
+            'tracingQuality'.
+        by (tuple): Columns to break the agreement down by (default is the age group and the
+            Apple classification).
+        n_bootstrap (int): Number of bootstrap replicates for the confidence intervals
+            (default is 1000, 0 disables the intervals).
+        confidence (float): Confidence level of the intervals (default is 0.95).
+        max_workers (int | None): Number of worker processes for the bootstrap (default is the
+            number of CPUs).
+        seed (int): Seed of the bootstrap (default is 0).
+        diagnoses (pd.DataFrame | None): Diagnoses table indexed by (ResourceId,
+            ReviewIndex), joined onto the data by ResourceId (default is None, which reads the
+            'Diagnosis{i}_{key}' columns of the data).
+
+    Returns:
+        pd.DataFrame: One row per breakdown value with the number of recordings, the percent
+            agreement, and Fleiss' and mean pairwise Cohen's kappa with confidence intervals.
+    """
+    if diagnoses is not None:
+        df = attach_diagnoses(df, diagnoses[[key]])
+    codes, categories = rating_codes(df, key)
+    reviewed = (codes >= 0).sum(axis=1) >= 2
+
+    groups = [(ALL, ALL, reviewed)]
+    for column in by:
+        values = df[column].astype(str).to_numpy() if column in df.columns else None
+        if values is None:
+            continue
+        for value in sorted(pd.unique(values[reviewed])):
+            groups.append((column, value, reviewed & (values == value)))
+
+    rows, jobs = [], []
+    seeds = np.random.SeedSequence(seed).spawn(
+        len(groups) * -(-n_bootstrap // BOOTSTRAP_BLOCK_SIZE)
+    )
+    for breakdown, value, mask in groups:
+        group_codes = codes[mask]
+        fleiss, observed = fleiss_kappa(category_counts(group_codes, len(categories)))
+        rows.append(
+            {
+                AgreementColumns.BREAKDOWN.value: breakdown,
+                AgreementColumns.VALUE.value: value,
+                AgreementColumns.RECORDINGS.value: int(mask.sum()),
+                AgreementColumns.PERCENT_AGREEMENT.value: observed[0] * 100,
+                AgreementColumns.FLEISS_KAPPA.value: fleiss[0],
+                AgreementColumns.COHEN_KAPPA.value: cohen_kappa(
+                    group_codes, len(categories)
+                )[0],
+            }
+        )
+        if len(group_codes) > 0:
+            for start in range(0, n_bootstrap, BOOTSTRAP_BLOCK_SIZE):
+                jobs.append(
+                    (
+                        len(rows) - 1,
+                        (
+                            group_codes,
+                            len(categories),
+                            min(BOOTSTRAP_BLOCK_SIZE, n_bootstrap - start),
+                            seeds[len(jobs)],
+                        ),
+                    )
+                )
+
+    if jobs:
+        workers = max_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            blocks = list(executor.map(_bootstrap_block, [job for _, job in jobs]))
+
+        tail = (1 - confidence) / 2 * 100
+        for row_index, row in enumerate(rows):
+            replicates = [
+                block for (index, _), block in zip(jobs, blocks) if index == row_index
+            ]
+            if not replicates:
+                continue
+            fleiss, cohen = np.hstack(replicates)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", category=RuntimeWarning)
+                (
+                    row[AgreementColumns.FLEISS_CI_LOW.value],
+                    row[AgreementColumns.FLEISS_CI_HIGH.value],
+                ) = np.nanpercentile(fleiss, [tail, 100 - tail])
+                (
+                    row[AgreementColumns.COHEN_CI_LOW.value],
+                    row[AgreementColumns.COHEN_CI_HIGH.value],
+                ) = np.nanpercentile(cohen, [tail, 100 - tail])
+
+    return pd.DataFrame(rows, columns=[column.value for column in AgreementColumns])
@@ -0,0 +1,405 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Reviewer assignment with leases, so concurrent review sessions do not review the same ECG while
+other recordings wait for their first review.
+
+A recording needs MAX_REVIEWS distinct reviewers. Its load is the number of completed reviews
+plus the number of active leases, and a recording is only handed out while its load is below
+MAX_REVIEWS. Recordings are handed out abnormal first, then with the lowest load, then in the
+order of the processed DataFrame. The candidates are kept in a heap with lazy invalidation and
+the leases in a heap by expiry, so the next assignment takes logarithmic time regardless of the
+number of concurrent reviewers. Leases expire after a timeout, e.g., when a reviewer leaves. A
+recording whose remaining reviews are leased by other sessions is skipped for a short time only,
+so it is offered again soon after another session releases its lease.
+
+Leases of sessions in different notebooks are coordinated by a lease store: the
+InMemoryLeaseStore serves a single process, and the FirestoreLeaseStore keeps the leases in a
+Firestore collection and acquires them in transactions.
+"""
+
+# Standard library imports
+import heapq
+import threading
+import time
+from typing import Callable
+
+# Related third-party imports
+import pandas as pd
+from google.cloud import firestore
+
+# Local application/library specific imports
+from spezi_data_pipeline.data_flattening.fhir_resources_flattener import ColumnNames
+from .compaction import reviewer_list
+from .duplicates import DuplicateColumns
+
+MAX_REVIEWS = 3
+LEASE_TIMEOUT_SEC = 15 * 60
+BLOCKED_RETRY_SEC = 30
+LEASES_COLLECTION = "reviewLeases"
+LEASES_FIELD = "leases"
+REVIEWERS = "Reviewers"
+SINUS_RHYTHM = "sinusRhythm"
+
+
+class InMemoryLeaseStore:
+    """
+    Lease store for review sessions within one process.
+    """
+
+    def __init__(self):
+        self._leases: dict[str, dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(  # pylint: disable=too-many-arguments, too-many-positional-arguments
+        self,
+        resource_id: str,
+        reviewer: str,
+        now: float,
+        expires_at: float,
+        capacity: int,
+    ) -> bool:
+        """
+        Acquire or renew a lease if fewer than `capacity` other leases are active.
+
+        Args:
+            resource_id (str): The ResourceId of the recording.
+            reviewer (str): The initials of the reviewer.
+            now (float): The current time as a UNIX timestamp.
+            expires_at (float): Expiry of the lease as a UNIX timestamp.
+            capacity (int): Number of reviews the recording still needs.
+
+        Returns:
+            bool: Whether the lease was acquired.
+        """
+        with self._lock:
+            leases = _active_leases(self._leases.get(resource_id, {}), now)
+            if reviewer not in leases and len(leases) >= capacity:
+                return False
+            leases[reviewer] = expires_at
+            self._leases[resource_id] = leases
+            return True
+
+    def release(self, resource_id: str, reviewer: str):
+        """
+        Release a lease.
+
+        Args:
+            resource_id (str): The ResourceId of the recording.
+            reviewer (str): The initials of the reviewer.
+        """
+        with self._lock:
+            self._leases.get(resource_id, {}).pop(reviewer, None)
+
+
+class FirestoreLeaseStore:
+    """
+    Lease store shared by review sessions in different notebooks through Firestore.
+
+    The leases of a recording are a map from reviewer initials to expiry timestamps in one
+    document of the leases collection, and are acquired in a transaction.
+
+    Attributes:
+        db (firestore.Client): Firestore database client.
+        collection_name (str): Name of the leases collection.
+    """
+
+    def __init__(self, db: firestore.Client, collection_name: str = LEASES_COLLECTION):
+        self.db = db
+        self.collection_name = collection_name
+
+    def acquire(  # pylint: disable=too-many-arguments, too-many-positional-arguments
+        self,
+        resource_id: str,
+        reviewer: str,
+        now: float,
+        expires_at: float,
+        capacity: int,
+    ) -> bool:
+        """
+        Acquire or renew a lease if fewer than `capacity` other leases are active.
+
+        Args:
+            resource_id (str): The ResourceId of the recording.
+            reviewer (str): The initials of the reviewer.
+            now (float): The current time as a UNIX timestamp.
+            expires_at (float): Expiry of the lease as a UNIX timestamp.
+            capacity (int): Number of reviews the recording still needs.
+
+        Returns:
+            bool: Whether the lease was acquired.
+        """
+        lease_ref = self.db.collection(self.collection_name).document(resource_id)
+
+        @firestore.transactional
+        def acquire_in_transaction(transaction) -> bool:
+            snapshot = lease_ref.get(transaction=transaction)
+            leases = _active_leases(
+                (
+                    (snapshot.to_dict() or {}).get(LEASES_FIELD, {})
+                    if snapshot.exists
+                    else {}
+                ),
+                now,
+            )
+            if reviewer not in leases and len(leases) >= capacity:
+                return False
+            leases[reviewer] = expires_at
+            transaction.set(lease_ref, {LEASES_FIELD: leases})
+            return True
+
+        return acquire_in_transaction(self.db.transaction())
+
+    def release(self, resource_id: str, reviewer: str):
+        """
+        Release a lease.
+
+        Args:
+            resource_id (str): The ResourceId of the recording.
+            reviewer (str): The initials of the reviewer.
+        """
+        self.db.collection(self.collection_name).document(resource_id).set(
+            {LEASES_FIELD: {reviewer: firestore.DELETE_FIELD}}, merge=True
+        )
+
+
+def _active_leases(leases: dict, now: float) -> dict[str, float]:
+    """Return the leases that have not expired yet."""
+    return {reviewer: expiry for reviewer, expiry in leases.items() if expiry > now}
+
+
+class ReviewScheduler:  # pylint: disable=too-many-instance-attributes
+    """
+    Hands out ECG recordings to reviewers with leases until each has MAX_REVIEWS reviewers.
+
+    Attributes:
+        lease_store (InMemoryLeaseStore | FirestoreLeaseStore): Store coordinating leases.
+        lease_timeout (float): Duration of a lease in seconds.
+        blocked_retry (float): Time in seconds before a recording that is leased by other
+            sessions is tried again.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments, too-many-positional-arguments
+        self,
+        df_ecg: pd.DataFrame,
+        lease_store: InMemoryLeaseStore | FirestoreLeaseStore | None = None,
+        lease_timeout: float = LEASE_TIMEOUT_SEC,
+        clock: Callable[[], float] = time.time,
+        blocked_retry: float = BLOCKED_RETRY_SEC,
+    ):
+        """
+        Initializes the scheduler from the processed ECG data. Duplicate uploads flagged by
+        `add_duplicate_detection` are not scheduled.
+
+        Args:
+            df_ecg (pd.DataFrame): The processed ECG data in priority order, e.g., as returned
+                by `process_ecg_data`.
+            lease_store (InMemoryLeaseStore | FirestoreLeaseStore | None): Store coordinating
+                leases across sessions (default is an InMemoryLeaseStore).
+            lease_timeout (float): Duration of a lease in seconds (default is 15 minutes).
+            clock (Callable[[], float]): Source of the current UNIX time (default is
+                `time.time`).
+            blocked_retry (float): Time in seconds before a recording that is leased by other
+                sessions is tried again (default is 30 seconds).
+        """
+        self.lease_store = lease_store or InMemoryLeaseStore()
+        self.lease_timeout = lease_timeout
+        self.blocked_retry = blocked_retry
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        if DuplicateColumns.IS_DUPLICATE.value in df_ecg.columns:
+            df_ecg = df_ecg[
+                ~df_ecg[DuplicateColumns.IS_DUPLICATE.value].fillna(False).astype(bool)
+            ]
+
+        resource_ids = df_ecg[ColumnNames.RESOURCE_ID.value].tolist()
+        abnormal = (
+            df_ecg[ColumnNames.APPLE_ELECTROCARDIOGRAM_CLASSIFICATION.value]
+            != SINUS_RHYTHM
+        ).tolist()
+        self._priority = {
+            resource_id: (0 if is_abnormal else 1, rank)
+            for rank, (resource_id, is_abnormal) in enumerate(
+                zip(resource_ids, abnormal)
+            )
+        }
+        self._reviewers = {
+            resource_id: set(reviewer_list(reviewers))
+            for resource_id, reviewers in zip(resource_ids, df_ecg[REVIEWERS])
+        }
+        self._leases: dict[str, dict[str, float]] = {
+            resource_id: {} for resource_id in resource_ids
+        }
+        # Recordings whose remaining slots are leased by other sessions, until the given time
+        self._blocked: dict[str, float] = {}
+        # Recordings known to have all reviews although not all reviewers are known
+        self._closed: set[str] = set()
+
+        self._candidates = []
+        self._expiries = []
+        for resource_id in resource_ids:
+            self._push_candidate(resource_id)
+
+    def _load(self, resource_id: str) -> int:
+        if resource_id in self._blocked or resource_id in self._closed:
+            return MAX_REVIEWS
+        return len(self._reviewers[resource_id]) + len(self._leases[resource_id])
+
+    def _push_candidate(self, resource_id: str):
+        load = self._load(resource_id)
+        if load < MAX_REVIEWS:
+            group, rank = self._priority[resource_id]
+            heapq.heappush(self._candidates, (group, load, rank, resource_id))
+
+    def _expire(self, now: float):
+        while self._expiries and self._expiries[0][0] <= now:
+            expires_at, resource_id, reviewer = heapq.heappop(self._expiries)
+            if reviewer is None:
+                if self._blocked.get(resource_id) == expires_at:
+                    del self._blocked[resource_id]
+                    self._push_candidate(resource_id)
+            elif self._leases[resource_id].get(reviewer) == expires_at:
+                del self._leases[resource_id][reviewer]
+                self._push_candidate(resource_id)
+
+    def next_for(self, reviewer: str) -> str | None:
+        """
+        Lease the next recording to a reviewer.
+
+        Args:
+            reviewer (str): The initials of the reviewer.
+
+        Returns:
+            str | None: The ResourceId of the leased recording, or None if no recording needs a
+                review by this reviewer.
+        """
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+
+            skipped, leased = [], None
+            while self._candidates and leased is None:
+                entry = heapq.heappop(self._candidates)
+                _, load, _, resource_id = entry
+                if load != self._load(resource_id):
+                    continue  # Outdated entry, a current one is in the heap
+                if (
+                    reviewer in self._reviewers[resource_id]
+                    or reviewer in self._leases[resource_id]
+                ):
+                    skipped.append(entry)
+                    continue
+
+                expires_at = now + self.lease_timeout
+                capacity = MAX_REVIEWS - len(self._reviewers[resource_id])
+                if self.lease_store.acquire(
+                    resource_id, reviewer, now, expires_at, capacity
+                ):
+                    self._leases[resource_id][reviewer] = expires_at
+                    heapq.heappush(self._expiries, (expires_at, resource_id, reviewer))
+                    leased = resource_id
+                else:
+                    retry_at = now + self.blocked_retry
+                    self._blocked[resource_id] = retry_at
+                    heapq.heappush(self._expiries, (retry_at, resource_id, None))
+                self._push_candidate(resource_id)
+
+            for entry in skipped:
+                heapq.heappush(self._candidates, entry)
+            return leased
+
+    def renew(self, resource_id: str, reviewer: str) -> bool:
+        """
+        Extend a reviewer's lease, e.g., while the reviewer is still looking at the recording.
+
+        Args:
+            resource_id (str): The ResourceId of the leased recording.
+            reviewer (str): The initials of the reviewer.
+
+        Returns:
+            bool: Whether the lease was still active and has been extended.
+        """
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            if reviewer not in self._leases.get(resource_id, {}):
+                return False
+            expires_at = now + self.lease_timeout
+            capacity = MAX_REVIEWS - len(self._reviewers[resource_id])
+            if not self.lease_store.acquire(
+                resource_id, reviewer, now, expires_at, capacity
+            ):
+                return False
+            self._leases[resource_id][reviewer] = expires_at
+            heapq.heappush(self._expiries, (expires_at, resource_id, reviewer))
+            return True
+
+    def release(self, resource_id: str, reviewer: str):
+        """
+        Return a leased recording without a review, e.g., when the reviewer skips it.
+
+        Args:
+            resource_id (str): The ResourceId of the leased recording.
+            reviewer (str): The initials of the reviewer.
+        """
+        with self._lock:
+            if self._leases.get(resource_id, {}).pop(reviewer, None) is not None:
+                self.lease_store.release(resource_id, reviewer)
+                self._push_candidate(resource_id)
+
+    def complete(self, resource_id: str, reviewer: str):
+        """
+        Record a saved review and end the reviewer's lease.
+
+        Args:
+            resource_id (str): The ResourceId of the reviewed recording.
+            reviewer (str): The initials of the reviewer.
+        """
+        self.update_reviews(
+            resource_id, self._reviewers.get(resource_id, set()) | {reviewer}
+        )
+        self.release(resource_id, reviewer)
+
+    def update_reviews(self, resource_id: str, reviewers):
+        """
+        Replace the completed reviews of a recording, e.g., after live review updates.
+
+        Args:
+            resource_id (str): The ResourceId of the recording.
+            reviewers (Iterable[str]): The initials of all reviewers of the recording.
+        """
+        with self._lock:
+            if resource_id not in self._reviewers:
+                return
+            self._reviewers[resource_id] = set(reviewers)
+            self._push_candidate(resource_id)
+
+    def close(self, resource_id: str):
+        """
+        Stop handing out a recording, e.g., after a write found that it already has all
+        reviews.
+
+        Args:
+            resource_id (str): The ResourceId of the recording.
+        """
+        with self._lock:
+            self._closed.add(resource_id)
+
+    def remaining_reviews(self) -> int:
+        """
+        Returns:
+            int: Number of reviews still needed until every recording has MAX_REVIEWS reviews.
+        """
+        with self._lock:
+            return sum(
+                max(0, MAX_REVIEWS - len(reviewers))
+                for resource_id, reviewers in self._reviewers.items()
+                if resource_id not in self._closed
+            )
@@ -0,0 +1,244 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Compact dtypes for the processed ECG data.
+
+Repeated strings, such as the classification, the age group, the review status, and the
+symptoms, are stored as categoricals, numeric metadata as the smallest nullable integer dtype,
+and dates as datetime64. The reviewers of a recording are encoded as one categorical string of
+initials joined in review order, so the few distinct reviewer combinations are stored once;
+`reviewer_list`, `has_reviewer`, and `set_reviewers` read and write the column in either
+encoding.
+"""
+
+# Standard library imports
+import re
+
+# Related third-party imports
+import numpy as np
+import pandas as pd
+
+# Local application/library specific imports
+from spezi_data_pipeline.data_flattening.fhir_resources_flattener import ColumnNames
+from .diagnoses import CATEGORICAL_FIELDS, DIAGNOSIS_COLUMN_PREFIX
+from .duplicates import DuplicateColumns
+from .features import RhythmFeatures
+from .quality import SignalQuality
+from .resampling import SOURCE_SAMPLING_FREQUENCY
+
+REVIEWERS = "Reviewers"
+REVIEW_STATUS = "ReviewStatus"
+REVIEW_STATUSES = ["Incomplete review", "Complete review"]
+REVIEWER_SEPARATOR = "|"
+BYTES_PER_MB = 1024**2
+
+CATEGORICAL_COLUMNS = [
+    ColumnNames.USER_ID.value,
+    ColumnNames.APPLE_ELECTROCARDIOGRAM_CLASSIFICATION.value,
+    ColumnNames.SAMPLING_FREQUENCY_UNIT.value,
+    ColumnNames.HEART_RATE_UNIT.value,
+    ColumnNames.ECG_RECORDING_UNIT.value,
+    "AgeGroup",
+    "Symptoms",
+    RhythmFeatures.RHYTHM_REGULARITY.value,
+    SignalQuality.LABEL.value,
+    DuplicateColumns.DUPLICATE_MATCH.value,
+]
+INTEGER_COLUMNS = [
+    "NumberOfReviewers",
+    ColumnNames.NUMBER_OF_MEASUREMENTS.value,
+]
+FLOAT_COLUMNS = [
+    ColumnNames.HEART_RATE.value,
+    ColumnNames.SAMPLING_FREQUENCY.value,
+    SOURCE_SAMPLING_FREQUENCY,
+]
+UTC_DATETIME_COLUMNS = [ColumnNames.EFFECTIVE_DATE_TIME.value]
+DATE_COLUMNS = ["DateOfBirthKey"]
+CATEGORICAL_DIAGNOSIS_PATTERN = re.compile(
+    rf"^{DIAGNOSIS_COLUMN_PREFIX}\d+_({'|'.join(CATEGORICAL_FIELDS)})$"
+)
+
+
+def encode_reviewers(reviewers) -> str:
+    """
+    Encode the initials of the reviewers of a recording as one string.
+
+    Args:
+        reviewers (Iterable[str]): The initials in review order.
+
+    Returns:
+        str: The initials joined by '|', empty if there are no reviewers.
+    """
+    return REVIEWER_SEPARATOR.join(str(initials) for initials in reviewers)
+
+
+def reviewer_list(value) -> list[str]:
+    """
+    Decode the reviewers of a recording from either encoding.
+
+    Args:
+        value (list | str | None): A list of initials or an encoded string.
+
+    Returns:
+        list[str]: The initials in review order, empty if there are none.
+    """
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    if isinstance(value, str):
+        return value.split(REVIEWER_SEPARATOR) if value else []
+    return []
+
+
+def has_reviewer(reviewers: pd.Series, initials: str) -> pd.Series:
+    """
+    Check which recordings have been reviewed by a reviewer.
+
+    For the categorical encoding, only the distinct reviewer combinations are checked.
+
+    Args:
+        reviewers (pd.Series): The 'Reviewers' column.
+        initials (str): The initials of the reviewer.
+
+    Returns:
+        pd.Series: Boolean mask with the index of the column.
+    """
+    if isinstance(reviewers.dtype, pd.CategoricalDtype):
+        reviewed = np.array(
+            [initials in reviewer_list(value) for value in reviewers.cat.categories]
+            + [False],
+            dtype=bool,
+        )
+        return pd.Series(
+            reviewed[reviewers.cat.codes.to_numpy()], index=reviewers.index
+        )
+    return reviewers.map(lambda value: initials in reviewer_list(value)).astype(bool)
+
+
+def set_reviewers(df: pd.DataFrame, index, reviewers: list[str]):
+    """
+    Replace the reviewers of a row in place, keeping the encoding of the column.
+
+    Args:
+        df (pd.DataFrame): The ECG data.
+        index: The index label of the row.
+        reviewers (list[str]): The initials of all reviewers in review order.
+    """
+    if not isinstance(df[REVIEWERS].dtype, pd.CategoricalDtype):
+        df.at[index, REVIEWERS] = list(reviewers)
+        return
+    encoded = encode_reviewers(reviewers)
+    if encoded not in df[REVIEWERS].cat.categories:
+        df[REVIEWERS] = df[REVIEWERS].cat.add_categories([encoded])
+    df.at[index, REVIEWERS] = encoded
+
+
+def _smallest_integer_dtype(values: pd.Series) -> str:
+    """Return the smallest nullable integer dtype that holds all values."""
+    if values.isna().all():
+        return "Int8"
+    for dtype in ("Int8", "Int16", "Int32"):
+        info = np.iinfo(dtype.lower())
+        if info.min <= values.min() and values.max() <= info.max:
+            return dtype
+    return "Int64"
+
+
+def memory_usage_mb(df: pd.DataFrame, columns: list | None = None) -> float:
+    """
+    Measure the memory usage of a DataFrame, including the Python objects it references.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to measure.
+        columns (list | None): Only measure these columns (default is all columns).
+
+    Returns:
+        float: The memory usage in MB.
+    """
+    if columns is not None:
+        df = df[columns]
+    return df.memory_usage(deep=True, index=False).sum() / BYTES_PER_MB
+
+
+def compact_dtypes(  # pylint: disable=too-many-branches
+    df: pd.DataFrame, report: bool = True
+) -> pd.DataFrame:
+    """
+    Convert the columns of the processed ECG data to compact dtypes.
+
+    Columns that are missing are skipped, and values that cannot be converted become missing.
+
+    Args:
+        df (pd.DataFrame): The processed ECG data.
+        report (bool): Whether to print the memory usage before and after (default is True).
+
+    Returns:
+        pd.DataFrame: A copy of the data with compact dtypes.
+    """
+    compacted = set(
+        CATEGORICAL_COLUMNS
+        + INTEGER_COLUMNS
+        + FLOAT_COLUMNS
+        + UTC_DATETIME_COLUMNS
+        + DATE_COLUMNS
+        + [REVIEW_STATUS, REVIEWERS]
+    )
+    columns = [
+        column
+        for column in df.columns
+        if column in compacted or CATEGORICAL_DIAGNOSIS_PATTERN.match(column)
+    ]
+    before = (memory_usage_mb(df, columns), memory_usage_mb(df)) if report else None
+    df = df.copy()
+
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+
+    for column in columns:
+        if CATEGORICAL_DIAGNOSIS_PATTERN.match(column):
+            df[column] = df[column].astype("category")
+
+    if REVIEW_STATUS in df.columns:
+        df[REVIEW_STATUS] = pd.Categorical(
+            df[REVIEW_STATUS], categories=REVIEW_STATUSES
+        )
+
+    if REVIEWERS in df.columns:
+        df[REVIEWERS] = pd.Categorical(
+            [encode_reviewers(reviewer_list(value)) for value in df[REVIEWERS]]
+        )
+
+    for column in INTEGER_COLUMNS:
+        if column in df.columns:
+            values = pd.to_numeric(df[column], errors="coerce")
+            if (values.dropna() % 1 == 0).all():
+                df[column] = values.astype(_smallest_integer_dtype(values))
+            else:
+                df[column] = values
+
+    for column in FLOAT_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors="coerce")
+
+    for column in UTC_DATETIME_COLUMNS + DATE_COLUMNS:
+        if column in df.columns and not pd.api.types.is_datetime64_any_dtype(
+            df[column]
+        ):
+            df[column] = pd.to_datetime(
+                df[column], errors="coerce", utc=column in UTC_DATETIME_COLUMNS
+            )
+
+    if report:
+        after = (memory_usage_mb(df, columns), memory_usage_mb(df))
+        print(
+            f"Memory usage of the compacted columns: {before[0]:.1f} MB -> {after[0]:.1f} MB, "
+            f"of the ECG data: {before[1]:.1f} MB -> {after[1]:.1f} MB."
+        )
+    return df
@@ -0,0 +1,192 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Normalized table of the physician reviews, with one row per review instead of one set of
+'Diagnosis{i}_{key}' columns per review on every ECG row.
+
+The table is indexed by (ResourceId, ReviewIndex), stores the low-cardinality fields as
+categoricals, and orders its columns deterministically. Lookups and joins with the ECG data go
+through the index; `diagnoses_wide_view` pivots the table back into the wide columns for code
+that still expects them.
+"""
+
+# Standard library imports
+from enum import Enum
+
+# Related third-party imports
+import pandas as pd
+
+# Local application/library specific imports
+from spezi_data_pipeline.data_flattening.fhir_resources_flattener import ColumnNames
+
+DIAGNOSIS_COLUMN_PREFIX = "Diagnosis"
+WIDE_COLUMN_PATTERN = rf"^{DIAGNOSIS_COLUMN_PREFIX}\d+_"
+
+
+class DiagnosisColumns(Enum):
+    """
+    Enumerates the columns of the diagnoses table that are not fields of the Diagnosis
+    documents.
+    """
+
+    REVIEW_INDEX = "ReviewIndex"
+    DIAGNOSIS_ID = "DiagnosisId"
+
+
+class DiagnosisFields(Enum):
+    """
+    Enumerates the known fields of a Diagnosis document in the order of the table columns.
+    """
+
+    PHYSICIAN_INITIALS = "physicianInitials"
+    DIAGNOSIS_DATE = "diagnosisDate"
+    PHYSICIAN_DIAGNOSIS = "physicianDiagnosis"
+    TRACING_QUALITY = "tracingQuality"
+    NOTES = "notes"
+
+
+CATEGORICAL_FIELDS = (
+    DiagnosisFields.PHYSICIAN_INITIALS.value,
+    DiagnosisFields.PHYSICIAN_DIAGNOSIS.value,
+    DiagnosisFields.TRACING_QUALITY.value,
+)
+INDEX_COLUMNS = [ColumnNames.RESOURCE_ID.value, DiagnosisColumns.REVIEW_INDEX.value]
+
+
+def diagnosis_records(resource_id: str, diagnosis_docs: list) -> list[dict]:
+    """
+    Convert the Diagnosis documents of a recording into rows of the diagnoses table.
+
+    Args:
+        resource_id (str): The ResourceId of the recording.
+        diagnosis_docs (list): The Diagnosis document snapshots in the order they are streamed.
+
+    Returns:
+        list[dict]: One record per document with the 1-based review index.
+    """
+    return [
+        {
+            **diagnosis_doc.to_dict(),
+            ColumnNames.RESOURCE_ID.value: resource_id,
+            DiagnosisColumns.REVIEW_INDEX.value: index + 1,
+            DiagnosisColumns.DIAGNOSIS_ID.value: diagnosis_doc.id,
+        }
+        for index, diagnosis_doc in enumerate(diagnosis_docs)
+    ]
+
+
+def build_diagnoses_table(records: list[dict]) -> pd.DataFrame:
+    """
+    Build the diagnoses table from review records.
+
+    Args:
+        records (list[dict]): Records with the ResourceId, the review index, and the fields of
+            the Diagnosis document.
+
+    Returns:
+        pd.DataFrame: Table indexed by (ResourceId, ReviewIndex) with the known fields first,
+            followed by any other fields in alphabetical order.
+    """
+    table = pd.DataFrame.from_records(records)
+    known = [DiagnosisColumns.DIAGNOSIS_ID.value] + [
+        field.value for field in DiagnosisFields
+    ]
+    extra = sorted(
+        column
+        for column in table.columns
+        if column not in known and column not in INDEX_COLUMNS
+    )
+    table = table.reindex(columns=INDEX_COLUMNS + known + extra)
+
+    for field in CATEGORICAL_FIELDS:
+        table[field] = table[field].astype("category")
+    table[DiagnosisColumns.REVIEW_INDEX.value] = table[
+        DiagnosisColumns.REVIEW_INDEX.value
+    ].astype("int8")
+
+    return table.set_index(INDEX_COLUMNS).sort_index()
+
+
+def is_diagnoses_table(df: pd.DataFrame) -> bool:
+    """
+    Check whether a DataFrame is a diagnoses table rather than ECG data.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to check.
+
+    Returns:
+        bool: True if the DataFrame is indexed by (ResourceId, ReviewIndex).
+    """
+    return list(df.index.names) == INDEX_COLUMNS
+
+
+def diagnoses_wide_view(diagnoses: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pivot the diagnoses table into one row per recording with 'Diagnosis{i}_{key}' columns.
+
+    Args:
+        diagnoses (pd.DataFrame): The diagnoses table.
+
+    Returns:
+        pd.DataFrame: Wide columns indexed by ResourceId, ordered by the review index and then
+            by the column order of the table.
+    """
+    fields = [
+        column
+        for column in diagnoses.columns
+        if column != DiagnosisColumns.DIAGNOSIS_ID.value
+    ]
+    wide = diagnoses[fields].unstack(DiagnosisColumns.REVIEW_INDEX.value)
+    wide = wide.reindex(
+        columns=[
+            (field, review_index)
+            for review_index in sorted(wide.columns.get_level_values(1).unique())
+            for field in fields
+        ]
+    )
+    wide.columns = [
+        f"{DIAGNOSIS_COLUMN_PREFIX}{review_index}_{field}"
+        for field, review_index in wide.columns
+    ]
+    return wide
+
+
+def attach_diagnoses(df: pd.DataFrame, diagnoses: pd.DataFrame) -> pd.DataFrame:
+    """
+    Join the wide view of the diagnoses onto ECG data by ResourceId.
+
+    Existing 'Diagnosis{i}_{key}' columns are dropped first.
+
+    Args:
+        df (pd.DataFrame): The ECG data.
+        diagnoses (pd.DataFrame): The diagnoses table.
+
+    Returns:
+        pd.DataFrame: The ECG data with the wide diagnosis columns.
+    """
+    wide = diagnoses_wide_view(diagnoses)
+    df = df.drop(columns=df.filter(regex=WIDE_COLUMN_PATTERN).columns)
+    return df.join(wide, on=ColumnNames.RESOURCE_ID.value)
+
+
+def reviews_of(diagnoses: pd.DataFrame, resource_id: str) -> pd.DataFrame:
+    """
+    Look up the reviews of a recording.
+
+    Args:
+        diagnoses (pd.DataFrame): The diagnoses table.
+        resource_id (str): The ResourceId of the recording.
+
+    Returns:
+        pd.DataFrame: The reviews indexed by ReviewIndex, empty if there are none.
+    """
+    try:
+        return diagnoses.loc[resource_id]
+    except KeyError:
+        return diagnoses.iloc[0:0].droplevel(0)
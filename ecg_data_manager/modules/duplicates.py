@@ -0,0 +1,283 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Detection of duplicate ECG uploads, e.g., HealthKit re-syncs that store the same voltage data in
+multiple documents.
+
+Exact duplicates belong to the same user and share the hash of their waveform quantized to
+microvolts and their sampling frequency. Near-exact duplicates of the same user, e.g., with
+rounding differences or a few samples more or less, are found by comparing 1-second block means
+of all recordings of the user at once and verifying the candidates sample by sample. Flat or
+empty recordings carry no content to compare and are never grouped. Every group of duplicates
+is collapsed to one canonical recording, preferring the recording with the most reviews.
+"""
+
+# Standard library imports
+import hashlib
+from enum import Enum
+
+# Related third-party imports
+import numpy as np
+import pandas as pd
+
+# Local application/library specific imports
+from spezi_data_pipeline.data_flattening.fhir_resources_flattener import ColumnNames
+from .waveforms import stack_waveforms
+
+NEAR_DUPLICATE_TOLERANCE_MV = 0.005
+NEAR_DUPLICATE_LENGTH_TOLERANCE_SEC = 0.5
+SIGNATURE_CHUNK_SIZE = 256
+NUMBER_OF_REVIEWERS = "NumberOfReviewers"
+
+
+class DuplicateColumns(Enum):
+    """
+    Enumerates the columns added by the duplicate detection.
+    """
+
+    WAVEFORM_HASH = "WaveformHash"
+    CANONICAL_RESOURCE_ID = "CanonicalResourceId"
+    IS_DUPLICATE = "IsDuplicate"
+    DUPLICATE_MATCH = "DuplicateMatch"
+
+
+class DuplicateMatch(Enum):
+    """
+    Enumerates how a duplicate matches its canonical recording.
+    """
+
+    EXACT = "Exact"
+    NEAR_EXACT = "NearExact"
+
+
+def waveform_hash(recording, sampling_frequency: float) -> str:
+    """
+    Compute the content hash of a recording.
+
+    Args:
+        recording (array-like): Samples in mV.
+        sampling_frequency (float): Sampling frequency in Hz.
+
+    Returns:
+        str: The hex digest of the waveform quantized to microvolts and the sampling frequency.
+    """
+    samples = np.rint(np.asarray(recording, dtype=float) * 1000).astype("<i4")
+    digest = hashlib.sha256(str(float(sampling_frequency)).encode())
+    digest.update(samples.tobytes())
+    return digest.hexdigest()
+
+
+def is_degenerate(recording) -> bool:
+    """
+    Check whether a recording is empty, all NaN, or flat, e.g., an upload without a signal.
+
+    Args:
+        recording (array-like): Samples in mV.
+
+    Returns:
+        bool: True if the valid samples of the recording have zero variance.
+    """
+    samples = np.asarray(recording, dtype=float)
+    samples = samples[~np.isnan(samples)]
+    return samples.size == 0 or bool(samples.min() == samples.max())
+
+
+def near_duplicate_pairs(
+    recordings: list, sampling_frequency: float
+) -> list[tuple[int, int]]:
+    """
+    Find the pairs of near-exact duplicates among recordings sharing a sampling frequency.
+
+    Args:
+        recordings (list): Recordings as lists or arrays of samples in mV.
+        sampling_frequency (float): Sampling frequency of all recordings in Hz.
+
+    Returns:
+        list[tuple[int, int]]: Position pairs (i, j) with i < j of recordings whose lengths
+            differ by at most NEAR_DUPLICATE_LENGTH_TOLERANCE_SEC and whose common samples differ
+            by at most NEAR_DUPLICATE_TOLERANCE_MV.
+    """
+    lengths = np.array([len(r) for r in recordings])
+    block = max(1, int(sampling_frequency))
+    blocks = int(lengths.min()) // block
+    if len(recordings) < 2 or blocks == 0:
+        return []
+
+    matrix = stack_waveforms(recordings, dtype=np.float64)
+    signatures = matrix[:, : blocks * block].reshape(len(recordings), blocks, block)
+    signatures = signatures.mean(axis=2)
+
+    # Block means of near-identical recordings differ by at most the sample tolerance, so
+    # comparing them first avoids comparing all samples of all pairs
+    close = np.zeros((len(recordings), len(recordings)), dtype=bool)
+    for start in range(0, len(recordings), SIGNATURE_CHUNK_SIZE):
+        chunk = slice(start, start + SIGNATURE_CHUNK_SIZE)
+        close[chunk] = (
+            np.abs(signatures[chunk, np.newaxis, :] - signatures[np.newaxis, :, :]).max(
+                axis=2
+            )
+            <= NEAR_DUPLICATE_TOLERANCE_MV
+        )
+    close &= (
+        np.abs(lengths[:, np.newaxis] - lengths[np.newaxis, :])
+        <= NEAR_DUPLICATE_LENGTH_TOLERANCE_SEC * sampling_frequency
+    )
+
+    pairs = []
+    for i, j in zip(*np.nonzero(np.triu(close, k=1))):
+        common = min(lengths[i], lengths[j])
+        if (
+            np.abs(matrix[i, :common] - matrix[j, :common]).max()
+            <= NEAR_DUPLICATE_TOLERANCE_MV
+        ):
+            pairs.append((int(i), int(j)))
+    return pairs
+
+
+def add_duplicate_detection(  # pylint: disable=too-many-locals
+    df: pd.DataFrame,
+) -> pd.DataFrame:
+    """
+    Add the waveform hash and the canonical ResourceId of every recording as columns.
+
+    Recordings without duplicates, and flat or empty recordings, are their own canonical
+    recording. Within a group of duplicates of one user, the recording with the most reviews,
+    then the earliest recording, is canonical.
+
+    Args:
+        df (pd.DataFrame): DataFrame with ECG data whose 'ECGRecording' column holds lists of
+            samples in mV, e.g., after `split_ecg_recording_in_10sec_parts`.
+
+    Returns:
+        pd.DataFrame: The DataFrame with the DuplicateColumns added.
+    """
+    if df.empty:
+        for column in DuplicateColumns:
+            df[column.value] = None
+        return df
+
+    recordings = df[ColumnNames.ECG_RECORDING.value].tolist()
+    sampling_frequencies = df[ColumnNames.SAMPLING_FREQUENCY.value].astype(float)
+    hashes = pd.Series(
+        [
+            waveform_hash(recording, sampling_frequency)
+            for recording, sampling_frequency in zip(recordings, sampling_frequencies)
+        ],
+        index=df.index,
+    )
+
+    user_ids = df[ColumnNames.USER_ID.value].to_numpy()
+    degenerate = np.array([is_degenerate(recording) for recording in recordings])
+
+    # Exact duplicates are grouped per user, so that flat uploads of different children or
+    # other coincidental matches across users are never collapsed
+    positions = pd.Series(np.arange(len(df)), index=df.index)
+    exact_first = positions.groupby(
+        [user_ids, hashes.to_numpy()], dropna=False
+    ).transform("first")
+    exact_first[degenerate] = positions[degenerate]
+    pairs = list(zip(exact_first.to_numpy(), positions.to_numpy()))
+
+    # Near-exact duplicates are only searched among the distinct recordings of each user
+    distinct = (exact_first == positions) & ~degenerate
+    for _, group in positions[distinct].groupby(
+        [user_ids[distinct], sampling_frequencies[distinct].to_numpy()], dropna=False
+    ):
+        if len(group) < 2:
+            continue
+        group_pairs = near_duplicate_pairs(
+            [recordings[p] for p in group], sampling_frequencies.iloc[group.iloc[0]]
+        )
+        pairs.extend((group.iloc[i], group.iloc[j]) for i, j in group_pairs)
+
+    # pylint: disable=import-outside-toplevel
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    # pylint: enable=import-outside-toplevel
+
+    rows, columns = np.array(pairs).T
+    _, components = connected_components(
+        coo_matrix((np.ones(len(rows)), (rows, columns)), shape=(len(df), len(df))),
+        directed=False,
+    )
+
+    preference = pd.DataFrame(
+        {
+            "component": components,
+            "reviews": pd.to_numeric(
+                df.get(NUMBER_OF_REVIEWERS, pd.Series(0, index=df.index)),
+                errors="coerce",
+            )
+            .fillna(0)
+            .to_numpy(),
+            "date": df.get(
+                ColumnNames.EFFECTIVE_DATE_TIME.value,
+                pd.Series(None, index=df.index, dtype=object),
+            )
+            .astype(str)
+            .to_numpy(),
+            "position": np.arange(len(df)),
+        }
+    ).sort_values(
+        ["component", "reviews", "date", "position"],
+        ascending=[True, False, True, True],
+    )
+    canonical_position = (
+        preference.groupby("component")["position"].first().to_numpy()[components]
+    )
+
+    resource_ids = df[ColumnNames.RESOURCE_ID.value].to_numpy()
+    is_duplicate = canonical_position != np.arange(len(df))
+    exact = hashes.to_numpy() == hashes.to_numpy()[canonical_position]
+
+    df[DuplicateColumns.WAVEFORM_HASH.value] = hashes
+    df[DuplicateColumns.CANONICAL_RESOURCE_ID.value] = resource_ids[canonical_position]
+    df[DuplicateColumns.IS_DUPLICATE.value] = is_duplicate
+    df[DuplicateColumns.DUPLICATE_MATCH.value] = np.where(
+        is_duplicate,
+        np.where(exact, DuplicateMatch.EXACT.value, DuplicateMatch.NEAR_EXACT.value),
+        None,
+    )
+
+    return df
+
+
+def duplicate_report(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    List all duplicate recordings next to their canonical recording.
+
+    Reviews stored on a duplicate are not counted for its canonical recording, so the
+    'NumberOfReviewers' column shows which reviews may need to be reconciled.
+
+    Args:
+        df (pd.DataFrame): DataFrame after `add_duplicate_detection`.
+
+    Returns:
+        pd.DataFrame: One row per duplicate, sorted by canonical ResourceId.
+    """
+    columns = [
+        DuplicateColumns.CANONICAL_RESOURCE_ID.value,
+        ColumnNames.RESOURCE_ID.value,
+        ColumnNames.USER_ID.value,
+        ColumnNames.EFFECTIVE_DATE_TIME.value,
+        DuplicateColumns.DUPLICATE_MATCH.value,
+        NUMBER_OF_REVIEWERS,
+    ]
+    duplicates = df[df[DuplicateColumns.IS_DUPLICATE.value].fillna(False).astype(bool)]
+    return (
+        duplicates[[column for column in columns if column in df.columns]]
+        .sort_values(
+            [
+                DuplicateColumns.CANONICAL_RESOURCE_ID.value,
+                ColumnNames.RESOURCE_ID.value,
+            ]
+        )
+        .reset_index(drop=True)
+    )
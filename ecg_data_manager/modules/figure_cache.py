@@ -0,0 +1,250 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Content-addressed on-disk cache for rendered ECG figures.
+
+ECG waveforms never change after upload, so a rendered figure is fully determined by the waveform
+samples and the plot parameters. The cache stores rasterized PNGs under the hash of exactly those
+inputs, which lets the interactive tools serve repeat views with a single file read instead of a
+matplotlib render. The cache is bounded in size and evicts the least recently used figures.
+"""
+
+# Standard library imports
+import hashlib
+import io
+import os
+import tempfile
+import threading
+
+# Related third-party imports
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Local application/library specific imports
+from spezi_data_pipeline.data_flattening.fhir_resources_flattener import ColumnNames
+from .plotting import (
+    ECG_PART_COLUMNS,
+    EFFECTIVE_DATE_TIME_HHMM,
+    PlotParams,
+    ecg_panels,
+    panels_figsize,
+    plot_ecg_parts,
+)
+from .waveforms import WindowSpec
+
+DEFAULT_CACHE_DIR = ".figure_cache"
+DEFAULT_MAX_BYTES = 512 * 1024**2
+FIGURE_DPI = 100
+
+
+def figure_cache_key(
+    row: pd.Series | dict,
+    date_column: str = EFFECTIVE_DATE_TIME_HHMM,
+    decimation: int = 1,
+    window: WindowSpec | None = None,
+) -> str:
+    """
+    Compute the cache key of a figure from the waveform bytes and the plot parameters.
+
+    Args:
+        row (pd.Series | dict): The row of the DataFrame containing the ECG data.
+        date_column (str): Column used for the recording date in the panel titles.
+        decimation (int): Decimation factor applied before plotting.
+        window (WindowSpec | None): Windows shown as panels (default is None, which shows the
+            three 10-second parts).
+
+    Returns:
+        str: Hex digest identifying the rendered figure.
+    """
+    digest = hashlib.sha256()
+    digest.update(repr([(p.name, p.value) for p in PlotParams]).encode("utf-8"))
+    digest.update(f"{row[date_column]}|{decimation}|{FIGURE_DPI}".encode("utf-8"))
+    digest.update(str(float(row[ColumnNames.SAMPLING_FREQUENCY.value])).encode())
+    if window is None:
+        for key in ECG_PART_COLUMNS:
+            digest.update(np.asarray(row[key], dtype=np.float64).tobytes())
+    else:
+        digest.update(repr(window).encode("utf-8"))
+        digest.update(
+            np.asarray(row[ColumnNames.ECG_RECORDING.value], dtype=np.float64).tobytes()
+        )
+    return digest.hexdigest()
+
+
+def render_ecg_png(
+    row: pd.Series | dict,
+    date_column: str = EFFECTIVE_DATE_TIME_HHMM,
+    decimation: int = 1,
+    window: WindowSpec | None = None,
+) -> bytes:
+    """
+    Render the panel figure of a recording to PNG bytes on the Agg backend.
+
+    Args:
+        row (pd.Series | dict): The row of the DataFrame containing the ECG data.
+        date_column (str): Column used for the recording date in the panel titles.
+        decimation (int): Only every n-th sample is drawn (default is 1).
+        window (WindowSpec | None): Windows shown as panels (default is None, which shows the
+            three 10-second parts).
+
+    Returns:
+        bytes: The PNG-encoded figure.
+    """
+    fig = Figure(
+        figsize=panels_figsize(max(1, len(ecg_panels(row, window)))),
+        layout="constrained",
+    )
+    FigureCanvasAgg(fig)
+    plot_ecg_parts(
+        row, date_column=date_column, fig=fig, decimation=decimation, window=window
+    )
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=FIGURE_DPI)
+    return buffer.getvalue()
+
+
+class FigureCache:
+    """
+    A size-bounded, least recently used on-disk cache of rendered ECG figures.
+
+    The modification time of a cache entry doubles as its last access time, so the cache
+    directory can be shared between sessions and reviewers without any additional index.
+
+    Attributes:
+        cache_dir (str): Directory holding the cached PNG files.
+        max_bytes (int): Upper bound for the total size of the cached files.
+    """
+
+    def __init__(
+        self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        """
+        Initialize the cache and create the cache directory if needed.
+
+        Args:
+            cache_dir (str): Directory holding the cached PNG files (default is
+                DEFAULT_CACHE_DIR).
+            max_bytes (int): Upper bound for the total size of the cached files (default is
+                512 MiB).
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._entries())
+
+    def _path(self, key: str) -> str:
+        """Return the file path of a cache entry, sharded by the first two hex digits."""
+        return os.path.join(self.cache_dir, key[:2], f"{key}.png")
+
+    def _entries(self) -> list[tuple[float, str, int]]:
+        """List all cache entries as (last access time, path, size) tuples."""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".png"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def get(self, key: str) -> bytes | None:
+        """
+        Read a cached figure and mark it as recently used.
+
+        Args:
+            key (str): The cache key as returned by `figure_cache_key`.
+
+        Returns:
+            bytes | None: The PNG bytes, or None on a cache miss.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                png = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return png
+
+    def put(self, key: str, png: bytes) -> None:
+        """
+        Store a figure and evict the least recently used entries if the cache is too large.
+
+        Args:
+            key (str): The cache key as returned by `figure_cache_key`.
+            png (bytes): The PNG-encoded figure.
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(png)
+
+        with self._lock:
+            # A replaced entry no longer counts towards the total size
+            try:
+                replaced_bytes = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced_bytes = 0
+            os.replace(tmp_path, path)
+            self._total_bytes += len(png) - replaced_bytes
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Remove the least recently used entries until the cache fits into `max_bytes`."""
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._total_bytes = total
+
+    def get_or_render(
+        self,
+        row: pd.Series | dict,
+        date_column: str = EFFECTIVE_DATE_TIME_HHMM,
+        decimation: int = 1,
+        window: WindowSpec | None = None,
+    ) -> bytes:
+        """
+        Return the PNG of a recording from the cache, rendering and storing it on a miss.
+
+        Args:
+            row (pd.Series | dict): The row of the DataFrame containing the ECG data.
+            date_column (str): Column used for the recording date in the panel titles.
+            decimation (int): Only every n-th sample is drawn (default is 1).
+            window (WindowSpec | None): Windows shown as panels (default is None, which shows
+                the three 10-second parts).
+
+        Returns:
+            bytes: The PNG-encoded figure.
+        """
+        key = figure_cache_key(
+            row, date_column=date_column, decimation=decimation, window=window
+        )
+        png = self.get(key)
+        if png is None:
+            png = render_ecg_png(
+                row, date_column=date_column, decimation=decimation, window=window
+            )
+            self.put(key, png)
+        return png
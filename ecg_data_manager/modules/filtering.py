@@ -0,0 +1,205 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Optional zero-phase filtering stage for the displayed ECG waveforms.
+
+Baseline wander is removed with a high-pass filter, the signal is band-limited with a low-pass
+filter, and mains interference is suppressed with a notch filter. All filters are cascaded into a
+single second-order-sections filter that is applied forward and backward (zero phase) to whole
+batches of recordings in one call. The filtered recordings and their 10-second parts are stored
+in columns next to the raw data, so viewers can switch between both without recomputation.
+"""
+
+# Standard library imports
+from enum import Enum
+
+# Related third-party imports
+import numpy as np
+import pandas as pd
+
+# Local application/library specific imports
+from spezi_data_pipeline.data_flattening.fhir_resources_flattener import ColumnNames
+from .waveforms import (
+    DEFAULT_CHUNK_SIZE,
+    ECG_PART_COLUMNS,
+    fill_nan_padding,
+    filtfilt_padlen,
+    iter_waveform_batches,
+    window_waveforms,
+)
+
+BASELINE_CUTOFF_HZ = 0.5
+LOWPASS_CUTOFF_HZ = 40.0
+MAINS_FREQUENCY_HZ = 60.0
+NOTCH_QUALITY_FACTOR = 30.0
+FILTER_ORDER = 2
+
+
+class FilteredColumns(Enum):
+    """
+    Enumerates the columns holding the filtered waveforms.
+    """
+
+    ECG_RECORDING = "ECGRecordingFiltered"
+    ECG_PART_1 = "ECGDataRecordingFiltered1"
+    ECG_PART_2 = "ECGDataRecordingFiltered2"
+    ECG_PART_3 = "ECGDataRecordingFiltered3"
+
+
+FILTERED_PART_COLUMNS = [
+    FilteredColumns.ECG_PART_1.value,
+    FilteredColumns.ECG_PART_2.value,
+    FilteredColumns.ECG_PART_3.value,
+]
+
+
+def design_ecg_filter(
+    sampling_frequency: float,
+    baseline_cutoff: float = BASELINE_CUTOFF_HZ,
+    lowpass_cutoff: float = LOWPASS_CUTOFF_HZ,
+    mains_frequency: float | None = MAINS_FREQUENCY_HZ,
+) -> np.ndarray:
+    """
+    Design the cascaded baseline, low-pass and notch filter as second-order sections.
+
+    Args:
+        sampling_frequency (float): Sampling frequency in Hz.
+        baseline_cutoff (float): High-pass cutoff removing baseline wander in Hz (default 0.5).
+        lowpass_cutoff (float): Low-pass cutoff in Hz (default 40). Skipped if it is not below
+            the Nyquist frequency.
+        mains_frequency (float | None): Mains frequency to notch out in Hz (default 60), or None
+            to disable the notch filter. Skipped if it is not below the Nyquist frequency.
+
+    Returns:
+        np.ndarray: The filter as second-order sections.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from scipy.signal import butter, iirnotch, tf2sos
+
+    nyquist = sampling_frequency / 2
+    sections = [
+        butter(FILTER_ORDER, baseline_cutoff / nyquist, btype="highpass", output="sos")
+    ]
+    if lowpass_cutoff < nyquist:
+        sections.append(
+            butter(
+                FILTER_ORDER, lowpass_cutoff / nyquist, btype="lowpass", output="sos"
+            )
+        )
+    if mains_frequency is not None and mains_frequency < nyquist:
+        sections.append(
+            tf2sos(
+                *iirnotch(mains_frequency, NOTCH_QUALITY_FACTOR, fs=sampling_frequency)
+            )
+        )
+    return np.concatenate(sections)
+
+
+def filter_waveforms(
+    matrix: np.ndarray, sampling_frequency: float, **filter_kwargs
+) -> np.ndarray:
+    """
+    Apply the zero-phase ECG filter to a batch of NaN-padded recordings in a single call.
+
+    The NaN padding is replaced with the last valid sample of each recording before filtering,
+    which avoids ringing at the end of shorter recordings, and restored afterwards. Batches
+    not longer than the padding of the zero-phase filter are returned unfiltered.
+
+    Args:
+        matrix (np.ndarray): Recordings of shape (n_recordings, n_samples), NaN-padded.
+        sampling_frequency (float): Sampling frequency of all recordings in Hz.
+        **filter_kwargs: Forwarded to `design_ecg_filter`.
+
+    Returns:
+        np.ndarray: The filtered recordings as float32, with the original NaN padding.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from scipy.signal import sosfiltfilt
+
+    valid = ~np.isnan(matrix)
+    sos = design_ecg_filter(sampling_frequency, **filter_kwargs)
+    # Recordings too short to be filtered, e.g., truncated uploads, are left unfiltered
+    if matrix.size == 0 or matrix.shape[1] <= filtfilt_padlen(sos):
+        return matrix.astype(np.float32)
+
+    filled = fill_nan_padding(matrix)
+
+    filtered = sosfiltfilt(sos, filled, axis=1).astype(np.float32)
+    filtered[~valid] = np.nan
+    return filtered
+
+
+def add_filtered_waveforms(
+    df: pd.DataFrame, chunk_size: int = DEFAULT_CHUNK_SIZE, **filter_kwargs
+) -> pd.DataFrame:
+    """
+    Add filtered copies of the recordings and their 10-second parts next to the raw columns.
+
+    The per-row values are views into one filtered array per batch, so the parts do not
+    allocate additional memory.
+
+    Args:
+        df (pd.DataFrame): DataFrame with ECG data after `split_ecg_recording_in_10sec_parts`.
+        chunk_size (int): Maximum number of recordings filtered at once (default is 2048).
+        **filter_kwargs: Forwarded to `design_ecg_filter`.
+
+    Returns:
+        pd.DataFrame: The DataFrame with the FilteredColumns added.
+    """
+    batches = []
+    for sampling_frequency, index, matrix in iter_waveform_batches(
+        df, chunk_size=chunk_size
+    ):
+        # Allocate at least 30 seconds, so that the windows of the parts are views
+        length = max(
+            int(sampling_frequency * 10) * len(ECG_PART_COLUMNS), matrix.shape[1]
+        )
+        filtered = np.full((matrix.shape[0], length), np.nan, dtype=np.float32)
+        filtered[:, : matrix.shape[1]] = filter_waveforms(
+            matrix, sampling_frequency, **filter_kwargs
+        )
+        lengths = df.loc[index, ColumnNames.ECG_RECORDING.value].map(len)
+
+        batch = {
+            FilteredColumns.ECG_RECORDING.value: [
+                filtered[i, :n] for i, n in enumerate(lengths)
+            ]
+        }
+        windows = window_waveforms(filtered, sampling_frequency)
+        for part, column in enumerate(FILTERED_PART_COLUMNS):
+            batch[column] = list(windows[:, part])
+        batches.append(pd.DataFrame(batch, index=index))
+
+    if not batches:
+        return df
+
+    filtered_columns = pd.concat(batches).reindex(df.index)
+    for column in filtered_columns.columns:
+        df[column] = filtered_columns[column]
+
+    return df
+
+
+def with_filtered_parts(row: pd.Series) -> pd.Series:
+    """
+    Return a shallow copy of a recording whose waveforms are the filtered ones.
+
+    Args:
+        row (pd.Series): The row of the DataFrame containing the ECG data.
+
+    Returns:
+        pd.Series: The row with 'ECGDataRecording{1,2,3}' replaced by the filtered parts and
+            'ECGRecording' by the filtered recording, if present.
+    """
+    row = row.copy(deep=False)
+    for raw_column, filtered_column in zip(ECG_PART_COLUMNS, FILTERED_PART_COLUMNS):
+        row[raw_column] = row[filtered_column]
+    if FilteredColumns.ECG_RECORDING.value in row.index:
+        row[ColumnNames.ECG_RECORDING.value] = row[FilteredColumns.ECG_RECORDING.value]
+    return row
@@ -0,0 +1,172 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Live review-status updates for the processed ECG data.
+
+A collection-group listener on all Diagnosis subcollections keeps the number of reviewers, the
+reviewers, and the review status of the in-memory DataFrame up to date while other physicians
+save reviews. Only the rows of recordings whose reviews changed are rewritten. The listener works
+with any Firestore client, including one connected to the Firestore emulator via
+FIRESTORE_EMULATOR_HOST, and `wait_for_sync` allows waiting for the initial snapshot.
+"""
+
+# Standard library imports
+import threading
+from typing import Callable
+
+# Related third-party imports
+import pandas as pd
+from google.cloud.firestore import Client
+
+# Local application/library specific imports
+from spezi_data_pipeline.data_flattening.fhir_resources_flattener import ColumnNames
+from .compaction import reviewer_list, set_reviewers
+from .utils import DIAGNOSIS_DATA_SUBCOLLECTION
+
+MAX_REVIEWS = 3
+NUMBER_OF_REVIEWERS = "NumberOfReviewers"
+REVIEWERS = "Reviewers"
+REVIEW_STATUS = "ReviewStatus"
+PHYSICIAN_INITIALS = "physicianInitials"
+INCOMPLETE_REVIEW = "Incomplete review"
+COMPLETE_REVIEW = "Complete review"
+ADDED = "ADDED"
+REMOVED = "REMOVED"
+
+
+class ReviewStatusListener:
+    """
+    Applies changes of the Diagnosis documents to the review columns of a DataFrame.
+
+    Attributes:
+        db (Client): Firestore database client.
+        df_ecg (pd.DataFrame): The processed ECG data, updated in place.
+        on_change (Callable[[set], None] | None): Called with the ResourceIds of the updated
+            recordings after every applied snapshot.
+    """
+
+    def __init__(
+        self,
+        db: Client,
+        df_ecg: pd.DataFrame,
+        on_change: Callable[[set], None] | None = None,
+        lock=None,
+    ):
+        """
+        Initializes the listener without subscribing yet.
+
+        Args:
+            db (Client): Firestore database client.
+            df_ecg (pd.DataFrame): The processed ECG data, updated in place.
+            on_change (Callable[[set], None] | None): Called from the listener thread with the
+                ResourceIds of the updated recordings (default is None).
+            lock (threading.RLock | None): Lock held while the DataFrame is updated, shared
+                with other writers of `df_ecg` (default is None, which creates a new lock).
+        """
+        self.db = db
+        self.df_ecg = df_ecg
+        self.on_change = on_change
+        self._reviews: dict[str, dict[str, str]] = {}
+        self._lock = lock or threading.RLock()
+        self._synced = threading.Event()
+        self._watch = None
+
+    def start(self) -> "ReviewStatusListener":
+        """
+        Subscribe to all Diagnosis documents. The first snapshot reconciles all rows.
+
+        Returns:
+            ReviewStatusListener: The listener itself.
+        """
+        if self._watch is None:
+            self._watch = self.db.collection_group(
+                DIAGNOSIS_DATA_SUBCOLLECTION
+            ).on_snapshot(self._on_snapshot)
+        return self
+
+    def stop(self):
+        """
+        Unsubscribe from the Diagnosis documents.
+        """
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def wait_for_sync(self, timeout: float | None = None) -> bool:
+        """
+        Block until the initial snapshot has been applied.
+
+        Args:
+            timeout (float | None): Maximum time to wait in seconds (default is no limit).
+
+        Returns:
+            bool: True if the initial snapshot has been applied.
+        """
+        return self._synced.wait(timeout)
+
+    def _on_snapshot(self, docs, changes, read_time):  # pylint: disable=unused-argument
+        """
+        Translate a snapshot of the collection-group query into review changes.
+        """
+        self.apply_changes(
+            [
+                (
+                    change.document.reference.parent.parent.id,
+                    change.document.id,
+                    (change.document.to_dict() or {}).get(PHYSICIAN_INITIALS, ""),
+                    change.type.name,
+                )
+                for change in changes
+            ],
+            full=not self._synced.is_set(),
+        )
+        self._synced.set()
+
+    def apply_changes(self, changes: list[tuple[str, str, str, str]], full=False):
+        """
+        Apply review changes to the DataFrame.
+
+        Args:
+            changes (list[tuple[str, str, str, str]]): Tuples of the recording's ResourceId,
+                the diagnosis document ID, the physician initials, and the change type
+                ('ADDED', 'MODIFIED', or 'REMOVED').
+            full (bool): Whether the changes describe all reviews, as the initial snapshot does.
+                Recordings without changes are then reset to no reviews (default is False).
+                Changes are keyed on the diagnosis document ID, so applying a change twice,
+                e.g., once from the saving viewer and once from the snapshot, has no effect.
+        """
+        with self._lock:
+            updated = set()
+            for resource_id, diagnosis_id, initials, change_type in changes:
+                reviews = self._reviews.setdefault(resource_id, {})
+                if change_type == REMOVED:
+                    reviews.pop(diagnosis_id, None)
+                else:
+                    reviews[diagnosis_id] = initials
+                updated.add(resource_id)
+
+            resource_ids = self.df_ecg[ColumnNames.RESOURCE_ID.value]
+            rows = self.df_ecg.index[
+                resource_ids.notna() if full else resource_ids.isin(updated)
+            ]
+            for idx in rows:
+                reviewers = list(self._reviews.get(resource_ids.at[idx], {}).values())
+                if full and reviewer_list(self.df_ecg.at[idx, REVIEWERS]) == reviewers:
+                    continue
+                self.df_ecg.at[idx, NUMBER_OF_REVIEWERS] = len(reviewers)
+                set_reviewers(self.df_ecg, idx, reviewers)
+                self.df_ecg.at[idx, REVIEW_STATUS] = (
+                    INCOMPLETE_REVIEW
+                    if len(reviewers) < MAX_REVIEWS
+                    else COMPLETE_REVIEW
+                )
+                updated.add(resource_ids.at[idx])
+
+        if self.on_change is not None and updated:
+            self.on_change(updated)
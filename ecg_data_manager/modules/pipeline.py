@@ -0,0 +1,261 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Headless run of the ECG processing pipeline for scheduled jobs.
+
+The ECG observations of all users are fetched with a pool of threads, processed with
+`process_ecg_data`, and exported in CSV, Parquet, or pickle format, while the duration of every
+stage is recorded. With a cache directory, the processed data of every run is kept, and an
+incremental run reuses the waveform features of the recordings processed before instead of
+recomputing them. Reviews and user information are always fetched again.
+"""
+
+# Standard library imports
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+# Related third-party imports
+import pandas as pd
+
+# Local application/library specific imports
+from spezi_data_pipeline.data_flattening.fhir_resources_flattener import (
+    flatten_fhir_resources,
+)
+from .utils import (
+    ECG_DATA_SUBCOLLECTION,
+    USERS_COLLECTION,
+    ExportFormat,
+    StageTimings,
+    ecg_observations_query,
+    export_database,
+    process_ecg_data,
+)
+from .waveforms import DEFAULT_CHUNK_SIZE
+
+if TYPE_CHECKING:
+    from google.cloud.firestore import Client
+
+CACHE_FILENAME = "processed_ecg_data.pkl"
+DEFAULT_FETCH_WORKERS = 8
+PROGRESS_STEPS = 10
+
+
+@dataclass
+class PipelineResult:
+    """
+    Outcome of a headless pipeline run.
+
+    Attributes:
+        users (int): The number of users whose observations were fetched.
+        recordings (int): The number of processed recordings.
+        reused (int): The number of recordings whose waveform features came from the cache.
+        failed_users (list[str]): The IDs of the users whose data could not be fetched.
+        output_path (str | None): The path of the exported file, if any.
+        timings (StageTimings): The duration of every stage.
+    """
+
+    users: int = 0
+    recordings: int = 0
+    reused: int = 0
+    failed_users: list[str] = field(default_factory=list)
+    output_path: str | None = None
+    timings: StageTimings = field(default_factory=StageTimings)
+
+    @property
+    def partial_failure(self) -> bool:
+        """
+        Whether the data of some users could not be fetched.
+        """
+        return bool(self.failed_users)
+
+
+def fetch_ecg_observations(
+    db: "Client",
+    max_workers: int = DEFAULT_FETCH_WORKERS,
+    failed_users: list[str] | None = None,
+    verbose: bool = False,
+) -> tuple[list, int]:
+    """
+    Fetch the ECG observations of all users as FHIR resources, several users at a time.
+
+    Args:
+        db (Client): Firestore database client.
+        max_workers (int): Number of users fetched concurrently (default is 8).
+        failed_users (list[str] | None): If given, the IDs of the users whose observations
+            could not be fetched are appended to it (default is None).
+        verbose (bool): If True, the progress is printed in steps of 10% (default is False).
+
+    Returns:
+        tuple[list, int]: The ECG observations and the number of users.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from spezi_data_pipeline.data_access.firebase_fhir_data_access import (
+        ObservationCreator,
+    )
+
+    users = list(db.collection(USERS_COLLECTION).stream())
+
+    def fetch_user(user) -> list | Exception:
+        try:
+            docs = list(
+                ecg_observations_query(
+                    db, user.id, USERS_COLLECTION, ECG_DATA_SUBCOLLECTION
+                ).stream()
+            )
+            return ObservationCreator().create_resources(docs, user)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            return e
+
+    resources = []
+    step = max(1, len(users) // PROGRESS_STEPS)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for done, (user, result) in enumerate(
+            zip(users, executor.map(fetch_user, users)), start=1
+        ):
+            if isinstance(result, Exception):
+                print(f"An error occurred while fetching user {user.id}: {result}")
+                if failed_users is not None:
+                    failed_users.append(user.id)
+            else:
+                resources.extend(result)
+            if verbose and (done % step == 0 or done == len(users)):
+                print(
+                    f"Fetched {done}/{len(users)} users, {len(resources)} recordings",
+                    flush=True,
+                )
+    return resources, len(users)
+
+
+def load_cached_data(cache_dir: str) -> pd.DataFrame | None:
+    """
+    Load the processed ECG data of the previous run from the cache directory.
+
+    Args:
+        cache_dir (str): The cache directory.
+
+    Returns:
+        pd.DataFrame | None: The processed data, or None if there is no readable cache.
+    """
+    try:
+        return pd.read_pickle(os.path.join(cache_dir, CACHE_FILENAME))
+    except (OSError, ValueError, EOFError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Ignoring the unreadable cache in {cache_dir}: {e}")
+        return None
+
+
+def save_cached_data(cache_dir: str, data: pd.DataFrame) -> None:
+    """
+    Atomically write the processed ECG data to the cache directory.
+
+    Args:
+        cache_dir (str): The cache directory. Created if it does not exist.
+        data (pd.DataFrame): The processed data.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, CACHE_FILENAME)
+    data.to_pickle(f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+
+
+def run_pipeline(  # pylint: disable=too-many-arguments, too-many-positional-arguments, too-many-locals
+    db: "Client",
+    output: str | None = "database",
+    output_format: ExportFormat = ExportFormat.CSV,
+    fetch_workers: int = DEFAULT_FETCH_WORKERS,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache_dir: str | None = None,
+    incremental: bool = False,
+    filter_waveforms: bool = False,
+    sampling_rate: float | None = None,
+    verbose: bool = True,
+) -> PipelineResult:
+    """
+    Fetch, process, and export the ECG data of all users without a notebook kernel.
+
+    Args:
+        db (Client): Firestore database client.
+        output (str | None): The base filename of the export, or None to skip the export
+            (default is "database").
+        output_format (ExportFormat): The format of the export (default is ExportFormat.CSV).
+        fetch_workers (int): Number of users fetched concurrently (default is 8).
+        chunk_size (int): Maximum number of recordings processed at once by the waveform stages
+            (default is 2048).
+        cache_dir (str | None): Directory in which the processed data is kept for incremental
+            runs (default is None).
+        incremental (bool): If True, the waveform features of the recordings in the cache are
+            reused (default is False).
+        filter_waveforms (bool): If True, filtered copies of the waveforms are added (default
+            is False).
+        sampling_rate (float | None): If given, all recordings are resampled to this sampling
+            rate in Hz (default is None).
+        verbose (bool): If True, the progress and every stage are printed (default is True).
+
+    Returns:
+        PipelineResult: The number of users and recordings, the failed users, the path of the
+            export, and the stage timings.
+
+    Raises:
+        ValueError: If incremental is True without a cache directory.
+    """
+    if incremental and cache_dir is None:
+        raise ValueError("An incremental run requires a cache directory.")
+
+    result = PipelineResult(timings=StageTimings(verbose=verbose))
+    timings = result.timings
+
+    with timings.stage("fetch_observations"):
+        resources, result.users = fetch_ecg_observations(
+            db, fetch_workers, result.failed_users, verbose
+        )
+    if not resources:
+        print("No ECG recordings found.")
+        return result
+
+    with timings.stage("flatten_observations"):
+        data = flatten_fhir_resources(resources).df
+
+    cached = None
+    if incremental:
+        with timings.stage("load_cache"):
+            cached = load_cached_data(cache_dir)
+
+    reused_ids: list[str] = []
+    processed_data = process_ecg_data(
+        db,
+        data,
+        filter_waveforms=filter_waveforms,
+        sampling_rate=sampling_rate,
+        fetch_workers=fetch_workers,
+        chunk_size=chunk_size,
+        cached=cached,
+        timings=timings,
+        failed_users=result.failed_users,
+        reused_ids=reused_ids,
+    )
+    result.recordings = len(processed_data)
+    result.reused = len(reused_ids)
+    if cached is not None and verbose:
+        print(
+            f"Reused the waveform features of {result.reused} of "
+            f"{result.recordings} recordings",
+            flush=True,
+        )
+
+    if cache_dir is not None:
+        with timings.stage("save_cache"):
+            save_cached_data(cache_dir, processed_data)
+
+    if output is not None:
+        with timings.stage("export"):
+            result.output_path = export_database(processed_data, output, output_format)
+
+    return result
@@ -0,0 +1,206 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+This module provides the plotting primitives shared by the interactive ECG tools and the
+headless batch renderer, so that every ECG is drawn with the same three-panel layout.
+"""
+
+# Standard library imports
+from enum import Enum
+from math import ceil
+
+# Related third-party imports
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.ticker import AutoMinorLocator
+
+# Local application/library specific imports
+from spezi_data_pipeline.data_flattening.fhir_resources_flattener import ColumnNames
+from .waveforms import ECG_PART_COLUMNS, WindowSpec, window_waveforms
+
+EFFECTIVE_DATE_TIME_HHMM = "EffectiveDateTimeHHMM"
+
+
+class PlotParams(Enum):
+    """
+    Enumerates parameters for plotting ECG signals."""
+
+    LWIDTH = 0.5
+    AMPLITUTE_ECG = 1.8
+    TIME_TICKS = 0.2
+    ECG_UNIT = "uV"
+    TIME_UNIT = "sec"
+    FIG_WIDTH = 15
+    FIG_HEIGHT = 2
+    PANELS_FIG_WIDTH = 14
+    PANELS_FIG_HEIGHT = 5
+
+
+def _ax_plot(ax, x, y, secs):
+    """
+    Plot the ECG data on the given axis.
+
+    Args:
+        ax (plt.Axes): The axis to plot on.
+        x (np.ndarray): The x values of the plot.
+        y (np.ndarray): The y values of the plot.
+        secs (float): The duration of the ECG recording in seconds.
+    """
+    ax.set_xticks(
+        np.arange(
+            0,
+            secs + PlotParams.TIME_TICKS.value,
+            PlotParams.TIME_TICKS.value,
+        )
+    )
+    ax.set_yticks(
+        np.arange(
+            -ceil(PlotParams.AMPLITUTE_ECG.value),
+            ceil(PlotParams.AMPLITUTE_ECG.value),
+            1.0,
+        )
+    )
+
+    ax.minorticks_on()
+    ax.xaxis.set_minor_locator(AutoMinorLocator(5))
+    ax.set_ylim(-PlotParams.AMPLITUTE_ECG.value, PlotParams.AMPLITUTE_ECG.value)
+    ax.set_xlim(0, secs)
+
+    ax.grid(which="major", linestyle="-", linewidth="0.5", color="red")
+    ax.grid(which="minor", linestyle="-", linewidth="0.5", color=(1, 0.7, 0.7))
+
+    ax.plot(x, y, linewidth=PlotParams.LWIDTH.value)
+
+
+def plot_single_lead_ecg(
+    ecg: list | np.ndarray,
+    sample_rate: int = 500,
+    title: str = "ECG",
+    ax: plt.Axes | None = None,
+) -> None:
+    """
+    Plot a single lead ECG chart.
+
+    Args:
+        ecg (list | np.ndarray): ECG signal data.
+        sample_rate (int): Sample rate of the signal.
+        title (str): Title to be shown on the chart.
+        ax (plt.Axes | None): The axis to plot on (default is None).
+    """
+    if ax is None:
+        plt.figure(figsize=(PlotParams.FIG_WIDTH.value, PlotParams.FIG_HEIGHT.value))
+        ax = plt.gca()
+
+    ax.set_title(title)
+    ax.set_ylabel(PlotParams.ECG_UNIT.value)
+    ax.set_xlabel(PlotParams.TIME_UNIT.value)
+    seconds = len(ecg) / sample_rate
+
+    step = 1.0 / sample_rate
+    _ax_plot(ax, np.arange(0, len(ecg) * step, step), ecg, seconds)
+
+
+def panels_figsize(n_panels: int = len(ECG_PART_COLUMNS)) -> tuple[float, float]:
+    """
+    Return the size of a figure with ECG panels below each other.
+
+    Args:
+        n_panels (int): The number of panels (default is 3).
+
+    Returns:
+        tuple[float, float]: The width and height of the figure in inches.
+    """
+    return (
+        PlotParams.PANELS_FIG_WIDTH.value,
+        PlotParams.PANELS_FIG_HEIGHT.value * n_panels / len(ECG_PART_COLUMNS),
+    )
+
+
+def ecg_panels(
+    row: pd.Series | dict, window: WindowSpec | None = None
+) -> list[tuple[str, np.ndarray | list]]:
+    """
+    Return the panels of an ECG recording as pairs of a title prefix and the samples.
+
+    Args:
+        row (pd.Series | dict): The ECG recording holding the 'ECGDataRecording{1,2,3}' parts,
+            the 'ECGRecording', and its sampling frequency.
+        window (WindowSpec | None): Windows of the 'ECGRecording' shown as panels, as views
+            into the recording (default is None, which shows the three 10-second parts).
+
+    Returns:
+        list[tuple[str, np.ndarray | list]]: The title prefix and the samples of every panel.
+    """
+    if window is None:
+        return [(f"ECG part {i+1}", row[key]) for i, key in enumerate(ECG_PART_COLUMNS)]
+
+    windows = window_waveforms(
+        np.asarray(row[ColumnNames.ECG_RECORDING.value], dtype=float),
+        row[ColumnNames.SAMPLING_FREQUENCY.value],
+        window,
+    )
+    return [
+        (f"ECG {start:g}-{start + window.length_sec:g} s", samples)
+        for start, samples in zip(window.starts_sec(len(windows)), windows)
+    ]
+
+
+def plot_ecg_parts(
+    row: pd.Series | dict,
+    date_column: str = EFFECTIVE_DATE_TIME_HHMM,
+    fig: Figure | None = None,
+    decimation: int = 1,
+    window: WindowSpec | None = None,
+) -> Figure:
+    """
+    Plot the 10-second parts, or other windows, of an ECG recording below each other.
+
+    Args:
+        row (pd.Series | dict): The ECG recording holding the 'ECGDataRecording{1,2,3}' parts
+            and its sampling frequency.
+        date_column (str): Column used for the recording date in the panel titles (default is
+            'EffectiveDateTimeHHMM').
+        fig (Figure | None): Figure to draw into. If None, a new pyplot figure is created.
+        decimation (int): Only every n-th sample is drawn, e.g., for thumbnails (default is 1).
+        window (WindowSpec | None): Windows of the 'ECGRecording' shown as panels, e.g.,
+            WindowSpec(5.0) for 5-second panels (default is None, which shows the three
+            10-second parts).
+
+    Returns:
+        Figure: The figure containing one panel per part or window.
+
+    Raises:
+        ValueError: If the recording is shorter than a window that must not be padded.
+    """
+    panels = ecg_panels(row, window)
+    if not panels:
+        raise ValueError("The ECG recording is shorter than one window.")
+
+    if fig is None:
+        fig, axs = plt.subplots(
+            len(panels),
+            1,
+            figsize=panels_figsize(len(panels)),
+            constrained_layout=True,
+            squeeze=False,
+        )
+    else:
+        axs = fig.subplots(len(panels), 1, squeeze=False)
+
+    for ax, (prefix, samples) in zip(axs[:, 0], panels):
+        plot_single_lead_ecg(
+            samples[::decimation],
+            sample_rate=row[ColumnNames.SAMPLING_FREQUENCY.value] / decimation,
+            title=f"{prefix} recorded on {row[date_column]}",
+            ax=ax,
+        )
+
+    return fig
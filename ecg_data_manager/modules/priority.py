@@ -0,0 +1,308 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Review priority of the ECG recordings from configurable weighted keys.
+
+Every key scores a recording between 0 and 1: the severity of the Apple classification, the
+presence of symptoms, the number of existing reviews (to complete started recordings first),
+the age group (children first), and the signal quality. The priority is the weighted sum of the
+key scores; ties are broken by the recording date and then by the original order, so the
+ranking is stable. Only a small array of sort keys is sorted, and the ranking can be updated
+incrementally when a review lands without re-sorting all recordings.
+"""
+
+# Standard library imports
+import bisect
+import threading
+from enum import Enum
+
+# Related third-party imports
+import numpy as np
+import pandas as pd
+
+# Local application/library specific imports
+from spezi_data_pipeline.data_flattening.fhir_resources_flattener import ColumnNames
+from .quality import SignalQuality
+
+MAX_REVIEWS = 3
+NUMBER_OF_REVIEWERS = "NumberOfReviewers"
+AGE_GROUP = "AgeGroup"
+CHILD = "Child"
+SYMPTOMS = "Symptoms"
+NO_SYMPTOMS = "No symptoms."
+EFFECTIVE_DATE_TIME_HHMM = "EffectiveDateTimeHHMM"
+
+
+class PriorityKeys(Enum):
+    """
+    Enumerates the keys the review priority is computed from.
+    """
+
+    SEVERITY = "severity"
+    SYMPTOMS = "symptoms"
+    AGE_GROUP = "ageGroup"
+    REVIEW_COUNT = "reviewCount"
+    SIGNAL_QUALITY = "signalQuality"
+
+
+# The lowest non-sinus severity score (0.25) times the severity weight exceeds the sum of all
+# other weights, so every non-sinus recording stays ahead of all sinus rhythm recordings.
+DEFAULT_WEIGHTS = {
+    PriorityKeys.SEVERITY.value: 100.0,
+    PriorityKeys.SYMPTOMS.value: 10.0,
+    PriorityKeys.AGE_GROUP.value: 5.0,
+    PriorityKeys.REVIEW_COUNT.value: 2.0,
+    PriorityKeys.SIGNAL_QUALITY.value: 1.0,
+}
+
+CLASSIFICATION_SEVERITY = {
+    "atrialFibrillation": 1.0,
+    "inconclusiveHighHeartRate": 0.75,
+    "inconclusiveLowHeartRate": 0.75,
+    "inconclusiveOther": 0.5,
+    "unrecognized": 0.5,
+    "inconclusivePoorReading": 0.25,
+    "notSet": 0.25,
+    "sinusRhythm": 0.0,
+}
+UNKNOWN_SEVERITY = 0.5
+# Priorities are rounded so that floating-point noise does not break ties
+PRIORITY_DECIMALS = 9
+
+
+def key_scores(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Score every recording between 0 and 1 for each priority key.
+
+    Missing columns score 0 for their key.
+
+    Args:
+        df (pd.DataFrame): The processed ECG data.
+
+    Returns:
+        pd.DataFrame: One column per priority key with the index of the data.
+    """
+    scores = pd.DataFrame(
+        0.0, index=df.index, columns=[key.value for key in PriorityKeys]
+    )
+
+    if ColumnNames.APPLE_ELECTROCARDIOGRAM_CLASSIFICATION.value in df.columns:
+        scores[PriorityKeys.SEVERITY.value] = (
+            df[ColumnNames.APPLE_ELECTROCARDIOGRAM_CLASSIFICATION.value]
+            .astype(object)
+            .map(CLASSIFICATION_SEVERITY)
+            .fillna(UNKNOWN_SEVERITY)
+            .astype(float)
+        )
+    if SYMPTOMS in df.columns:
+        symptoms = df[SYMPTOMS].astype(object)
+        scores[PriorityKeys.SYMPTOMS.value] = (
+            symptoms.notna() & (symptoms != NO_SYMPTOMS)
+        ).astype(float)
+    if AGE_GROUP in df.columns:
+        scores[PriorityKeys.AGE_GROUP.value] = (
+            df[AGE_GROUP].astype(object) == CHILD
+        ).astype(float)
+    if NUMBER_OF_REVIEWERS in df.columns:
+        scores[PriorityKeys.REVIEW_COUNT.value] = review_count_score(
+            pd.to_numeric(df[NUMBER_OF_REVIEWERS], errors="coerce").to_numpy(
+                dtype=float, na_value=0.0
+            )
+        )
+    if SignalQuality.SCORE.value in df.columns:
+        scores[PriorityKeys.SIGNAL_QUALITY.value] = (
+            pd.to_numeric(df[SignalQuality.SCORE.value], errors="coerce")
+            .fillna(0.0)
+            .clip(0.0, 1.0)
+        )
+    return scores
+
+
+def review_count_score(number_of_reviewers):
+    """
+    Score the number of existing reviews: started recordings score higher, complete ones 0.
+
+    Args:
+        number_of_reviewers (float | np.ndarray): The number of reviews.
+
+    Returns:
+        float | np.ndarray: The review-count score between 0 and 1.
+    """
+    number_of_reviewers = np.asarray(number_of_reviewers, dtype=float)
+    return np.where(
+        number_of_reviewers < MAX_REVIEWS,
+        number_of_reviewers / MAX_REVIEWS,
+        0.0,
+    )
+
+
+def recording_dates(df: pd.DataFrame) -> np.ndarray:
+    """
+    Return the recording dates as sortable integers, missing dates last.
+
+    Args:
+        df (pd.DataFrame): The processed ECG data.
+
+    Returns:
+        np.ndarray: Nanoseconds since the epoch in UTC.
+    """
+    for column in (ColumnNames.EFFECTIVE_DATE_TIME.value, EFFECTIVE_DATE_TIME_HHMM):
+        if column in df.columns:
+            dates = pd.to_datetime(df[column], errors="coerce", utc=True)
+            nanoseconds = (
+                dates.dt.tz_localize(None).astype("datetime64[ns]").to_numpy()
+            ).view(np.int64)
+            return np.where(dates.isna(), np.iinfo(np.int64).max, nanoseconds)
+    return np.zeros(len(df), dtype=np.int64)
+
+
+class PriorityEngine:  # pylint: disable=too-many-instance-attributes
+    """
+    Ranks recordings by the weighted sum of their priority keys.
+
+    Attributes:
+        weights (dict[str, float]): The weight of every priority key.
+    """
+
+    def __init__(self, df: pd.DataFrame, weights: dict[str, float] | None = None):
+        """
+        Scores and ranks all recordings.
+
+        Args:
+            df (pd.DataFrame): The processed ECG data.
+            weights (dict[str, float] | None): Weights by PriorityKeys value, overriding the
+                defaults (default is DEFAULT_WEIGHTS).
+        """
+        unknown = set(weights or {}) - set(DEFAULT_WEIGHTS)
+        if unknown:
+            raise ValueError(f"Unknown priority keys: {sorted(unknown)}")
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+
+        self._index = df.index
+        self._scores = key_scores(df).to_numpy()
+        self._weights = np.array([self.weights[key.value] for key in PriorityKeys])
+        self._priority = self._weighted_sum(self._scores)
+        self._dates = recording_dates(df)
+
+        positions = np.arange(len(df))
+        # Highest priority first, then the oldest recording, then the original order
+        order = np.lexsort((positions, self._dates, -self._priority))
+        self._sort_keys = list(
+            zip(
+                (-self._priority[order]).tolist(),
+                self._dates[order].tolist(),
+                order.tolist(),
+            )
+        )
+
+        self._lock = threading.Lock()
+        self._positions: dict[str, list[int]] = {}
+        if ColumnNames.RESOURCE_ID.value in df.columns:
+            for position, resource_id in enumerate(df[ColumnNames.RESOURCE_ID.value]):
+                self._positions.setdefault(resource_id, []).append(position)
+
+    def _weighted_sum(self, scores: np.ndarray) -> np.ndarray:
+        return np.round((scores * self._weights).sum(axis=-1), PRIORITY_DECIMALS)
+
+    def _sort_key(self, position: int) -> tuple:
+        return (
+            -float(self._priority[position]),
+            int(self._dates[position]),
+            int(position),
+        )
+
+    def order(self) -> np.ndarray:
+        """
+        Return the row positions in priority order.
+
+        Returns:
+            np.ndarray: Positions of the rows of the ranked data, highest priority first.
+        """
+        with self._lock:
+            return np.fromiter(
+                (position for _, _, position in self._sort_keys),
+                dtype=np.int64,
+                count=len(self._sort_keys),
+            )
+
+    def ranks(self) -> pd.Series:
+        """
+        Return the rank of every recording.
+
+        Returns:
+            pd.Series: Ranks starting at 0 for the highest priority, with the index of the data.
+        """
+        ranks = np.empty(len(self._sort_keys), dtype=np.int64)
+        ranks[self.order()] = np.arange(len(self._sort_keys))
+        return pd.Series(ranks, index=self._index)
+
+    def priorities(self) -> pd.Series:
+        """
+        Return the priority of every recording.
+
+        Returns:
+            pd.Series: The weighted sums of the key scores, with the index of the data.
+        """
+        return pd.Series(self._priority, index=self._index)
+
+    def sort(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Order the rows of the ranked data by priority.
+
+        Args:
+            df (pd.DataFrame): The data the engine was created from.
+
+        Returns:
+            pd.DataFrame: The rows in priority order.
+        """
+        return df.iloc[self.order()]
+
+    def update_reviews(self, resource_id: str, number_of_reviewers: int) -> int | None:
+        """
+        Re-rank a recording after its number of reviews changed.
+
+        Args:
+            resource_id (str): The ResourceId of the recording.
+            number_of_reviewers (int): The new number of reviews.
+
+        Returns:
+            int | None: The new rank of the recording, or None if it is unknown.
+        """
+        positions = self._positions.get(resource_id)
+        if not positions:
+            return None
+
+        column = list(PriorityKeys).index(PriorityKeys.REVIEW_COUNT)
+        with self._lock:
+            for position in positions:
+                del self._sort_keys[
+                    bisect.bisect_left(self._sort_keys, self._sort_key(position))
+                ]
+                self._scores[position, column] = review_count_score(number_of_reviewers)
+                self._priority[position] = self._weighted_sum(self._scores[position])
+                bisect.insort(self._sort_keys, self._sort_key(position))
+
+            return bisect.bisect_left(self._sort_keys, self._sort_key(positions[0]))
+
+
+def prioritize_recordings(
+    df: pd.DataFrame, weights: dict[str, float] | None = None
+) -> pd.DataFrame:
+    """
+    Order the ECG recordings by review priority.
+
+    Args:
+        df (pd.DataFrame): The processed ECG data.
+        weights (dict[str, float] | None): Weights by PriorityKeys value, overriding the
+            defaults (default is DEFAULT_WEIGHTS).
+
+    Returns:
+        pd.DataFrame: The rows in priority order.
+    """
+    return PriorityEngine(df, weights).sort(df)
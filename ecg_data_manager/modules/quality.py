@@ -0,0 +1,256 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Vectorized signal-quality index to pre-triage ECG recordings that are likely uninterpretable.
+
+The quality of every recording and of each of its 10-second parts is derived from five artifact
+measures: flatline fraction, saturation/clipping, NaN padding ratio, high-frequency noise energy
+and baseline wander. Each measure is mapped to a penalty between 0 and 1, and the quality score
+is the product of the complementary penalties, i.e., 1 for a clean and 0 for an unusable tracing.
+All measures are computed on whole batches of recordings at once.
+"""
+
+# Standard library imports
+from enum import Enum
+
+# Related third-party imports
+import numpy as np
+import pandas as pd
+from scipy.ndimage import maximum_filter1d, minimum_filter1d, uniform_filter1d
+
+# Local application/library specific imports
+from .waveforms import (
+    DEFAULT_CHUNK_SIZE,
+    NUMBER_OF_PARTS,
+    PART_DURATION_SEC,
+    iter_waveform_batches,
+)
+
+FLATLINE_WINDOW_SEC = 0.2
+FLATLINE_RANGE_MV = 0.01
+SATURATION_MV = 5.0
+CLIPPING_TOLERANCE = 0.005
+HIGH_FREQUENCY_CUTOFF_HZ = 40.0
+BASELINE_CUTOFF_HZ = 0.5
+GOOD_QUALITY_SCORE = 0.8
+ACCEPTABLE_QUALITY_SCORE = 0.5
+
+
+class SignalQuality(Enum):
+    """
+    Enumerates the columns added by the signal-quality scorer.
+    """
+
+    SCORE = "SignalQuality"
+    PART_SCORES = "SignalQualityPart"
+    LABEL = "SignalQualityLabel"
+    FLATLINE = "FlatlineFraction"
+    CLIPPING = "ClippingFraction"
+    NAN_RATIO = "NaNRatio"
+    HIGH_FREQUENCY_NOISE = "HighFrequencyNoiseRatio"
+    BASELINE_WANDER = "BaselineWanderRatio"
+
+
+class SignalQualityLabel(Enum):
+    """
+    Enumerates the labels of the signal-quality label column.
+    """
+
+    GOOD = "Good"
+    ACCEPTABLE = "Acceptable"
+    POOR = "Poor"
+
+
+# Penalty ramps per measure: no penalty up to the first value, full penalty from the second.
+PENALTY_RAMPS = {
+    SignalQuality.NAN_RATIO.value: (0.0, 0.5),
+    SignalQuality.FLATLINE.value: (0.05, 0.5),
+    SignalQuality.CLIPPING.value: (0.01, 0.1),
+    SignalQuality.HIGH_FREQUENCY_NOISE.value: (0.1, 0.5),
+    SignalQuality.BASELINE_WANDER.value: (0.2, 0.8),
+}
+
+
+def _segment_sums(values: np.ndarray, segments: int) -> np.ndarray:
+    """Sum a (rows, samples) array over `segments` equally long consecutive segments."""
+    return values.reshape(values.shape[0], segments, -1).sum(axis=2, dtype=np.float64)
+
+
+def quality_measures(  # pylint: disable=too-many-locals
+    matrix: np.ndarray, sampling_frequency: float, segments: int = 1
+) -> dict[str, np.ndarray]:
+    """
+    Compute the artifact measures of a batch of recordings per segment and per recording.
+
+    Baseline wander and high-frequency noise are estimated with moving averages, i.e., the
+    energy below roughly BASELINE_CUTOFF_HZ and above roughly HIGH_FREQUENCY_CUTOFF_HZ relative
+    to the energy of the mean-free signal.
+
+    Args:
+        matrix (np.ndarray): NaN-padded recordings in mV of shape (n_recordings, n_samples),
+            where n_samples is divisible by `segments`.
+        sampling_frequency (float): Sampling frequency of all recordings in Hz.
+        segments (int): Number of equally long segments to evaluate separately (default is 1).
+
+    Returns:
+        dict[str, np.ndarray]: One array of shape (n_recordings, segments + 1) per measure, with
+            the measure of the whole recording in the last column.
+    """
+    valid = ~np.isnan(matrix)
+    signal = np.where(valid, matrix, 0.0).astype(np.float32)
+
+    window = max(1, int(FLATLINE_WINDOW_SEC * sampling_frequency))
+    moving_range = maximum_filter1d(
+        np.where(valid, signal, -np.inf), size=window, axis=1
+    ) - minimum_filter1d(np.where(valid, signal, np.inf), size=window, axis=1)
+    flat = valid & (moving_range < FLATLINE_RANGE_MV)
+    del moving_range
+
+    row_max = np.max(np.where(valid, signal, -np.inf), axis=1, keepdims=True)
+    row_min = np.min(np.where(valid, signal, np.inf), axis=1, keepdims=True)
+    tolerance = CLIPPING_TOLERANCE * (row_max - row_min)
+    clipped = valid & (
+        (np.abs(signal) >= SATURATION_MV)
+        | (
+            (tolerance > 0)
+            & ((signal >= row_max - tolerance) | (signal <= row_min + tolerance))
+        )
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        row_mean = signal.sum(axis=1, keepdims=True) / valid.sum(axis=1, keepdims=True)
+    centered = np.where(valid, signal - np.nan_to_num(row_mean), 0.0)
+    baseline = uniform_filter1d(
+        centered, size=max(1, int(sampling_frequency / BASELINE_CUTOFF_HZ)), axis=1
+    )
+    high_frequency = centered - uniform_filter1d(
+        centered,
+        size=max(1, int(sampling_frequency / HIGH_FREQUENCY_CUTOFF_HZ)),
+        axis=1,
+    )
+
+    sums = {
+        "valid": _segment_sums(valid, segments),
+        "flat": _segment_sums(flat, segments),
+        "clipped": _segment_sums(clipped, segments),
+        "total": _segment_sums(centered**2, segments),
+        "baseline": _segment_sums(np.where(valid, baseline, 0.0) ** 2, segments),
+        "high_frequency": _segment_sums(
+            np.where(valid, high_frequency, 0.0) ** 2, segments
+        ),
+    }
+    sums = {
+        name: np.concatenate([values, values.sum(axis=1, keepdims=True)], axis=1)
+        for name, values in sums.items()
+    }
+    expected = np.append(np.full(segments, matrix.shape[1] / segments), matrix.shape[1])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            SignalQuality.NAN_RATIO.value: 1.0 - sums["valid"] / expected,
+            SignalQuality.FLATLINE.value: np.nan_to_num(
+                sums["flat"] / sums["valid"], nan=1.0
+            ),
+            SignalQuality.CLIPPING.value: np.nan_to_num(
+                sums["clipped"] / sums["valid"]
+            ),
+            SignalQuality.HIGH_FREQUENCY_NOISE.value: np.nan_to_num(
+                sums["high_frequency"] / sums["total"]
+            ),
+            SignalQuality.BASELINE_WANDER.value: np.nan_to_num(
+                sums["baseline"] / sums["total"]
+            ),
+        }
+
+
+def quality_score(measures: dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Combine artifact measures into a quality score between 0 (unusable) and 1 (clean).
+
+    Args:
+        measures (dict[str, np.ndarray]): Artifact measures as returned by `quality_measures`.
+
+    Returns:
+        np.ndarray: The quality score, with the shape of the individual measures.
+    """
+    score = np.ones_like(measures[SignalQuality.NAN_RATIO.value], dtype=float)
+    for name, (no_penalty, full_penalty) in PENALTY_RAMPS.items():
+        penalty = np.clip(
+            (measures[name] - no_penalty) / (full_penalty - no_penalty), 0.0, 1.0
+        )
+        score *= 1.0 - penalty
+    return score
+
+
+def compute_signal_quality(
+    matrix: np.ndarray, sampling_frequency: float
+) -> dict[str, np.ndarray]:
+    """
+    Compute the per-recording and per-10-second-part signal quality of a batch of recordings.
+
+    Args:
+        matrix (np.ndarray): NaN-padded recordings in mV of shape (n_recordings, n_samples).
+        sampling_frequency (float): Sampling frequency of all recordings in Hz.
+
+    Returns:
+        dict[str, np.ndarray]: The per-recording measures, score and label, and one score
+            column per 10-second part.
+    """
+    samples_per_part = int(sampling_frequency * PART_DURATION_SEC)
+    length = samples_per_part * NUMBER_OF_PARTS
+    matrix = np.pad(
+        matrix[:, :length],
+        ((0, 0), (0, max(0, length - matrix.shape[1]))),
+        constant_values=np.nan,
+    )
+
+    measures = quality_measures(matrix, sampling_frequency, segments=NUMBER_OF_PARTS)
+    scores = quality_score(measures)
+
+    results = {name: values[:, -1] for name, values in measures.items()}
+    score = scores[:, -1]
+    results[SignalQuality.SCORE.value] = score
+    results[SignalQuality.LABEL.value] = np.select(
+        [score >= GOOD_QUALITY_SCORE, score >= ACCEPTABLE_QUALITY_SCORE],
+        [SignalQualityLabel.GOOD.value, SignalQualityLabel.ACCEPTABLE.value],
+        default=SignalQualityLabel.POOR.value,
+    )
+    for part in range(NUMBER_OF_PARTS):
+        results[f"{SignalQuality.PART_SCORES.value}{part + 1}"] = scores[:, part]
+    return results
+
+
+def add_signal_quality(
+    df: pd.DataFrame, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> pd.DataFrame:
+    """
+    Add the signal-quality score, label and artifact measures of every recording as columns.
+
+    Args:
+        df (pd.DataFrame): DataFrame with ECG data whose 'ECGRecording' column holds lists of
+            samples in mV, e.g., after `split_ecg_recording_in_10sec_parts`.
+        chunk_size (int): Maximum number of recordings processed at once (default is 2048).
+
+    Returns:
+        pd.DataFrame: The DataFrame with the signal-quality columns added.
+    """
+    batches = [
+        pd.DataFrame(compute_signal_quality(matrix, sampling_frequency), index=index)
+        for sampling_frequency, index, matrix in iter_waveform_batches(
+            df, chunk_size=chunk_size
+        )
+    ]
+    if not batches:
+        return df
+
+    quality = pd.concat(batches).reindex(df.index)
+    for column in quality.columns:
+        df[column] = quality[column]
+
+    return df
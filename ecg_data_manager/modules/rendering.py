@@ -0,0 +1,273 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Headless batch rendering of ECG review packets.
+
+Every recording is drawn with the same three-panel layout as the interactive ECG tools, on the
+Agg backend and in a pool of worker processes. Outputs are written either as one PNG/PDF file
+per recording or as one multi-page PDF per user. A manifest of content fingerprints is kept in
+the output directory so that outputs which are already up to date are skipped on the next run.
+"""
+
+# Standard library imports
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Related third-party imports
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+
+# Local application/library specific imports
+from spezi_data_pipeline.data_flattening.fhir_resources_flattener import ColumnNames
+from .plotting import (
+    ECG_PART_COLUMNS,
+    EFFECTIVE_DATE_TIME_HHMM,
+    PlotParams,
+    plot_ecg_parts,
+)
+
+MANIFEST_FILENAME = ".render_manifest.json"
+SUPPORTED_FORMATS = ("png", "pdf")
+OVERLAY_HEIGHT_PER_LINE = 0.25
+
+DEFAULT_OVERLAY_FIELDS = [
+    ColumnNames.USER_ID.value,
+    ColumnNames.RESOURCE_ID.value,
+    "AgeGroup",
+    ColumnNames.HEART_RATE.value,
+    ColumnNames.APPLE_ELECTROCARDIOGRAM_CLASSIFICATION.value,
+    "Symptoms",
+    "NumberOfReviewers",
+]
+
+
+def _recording_payload(row: pd.Series, overlay_fields: list[str]) -> dict:
+    """
+    Extract the picklable subset of a recording that a worker process needs to render it.
+
+    Args:
+        row (pd.Series): The row of the DataFrame containing the ECG data.
+        overlay_fields (list[str]): Columns to print as a metadata overlay above the panels.
+
+    Returns:
+        dict: The waveform parts, sampling frequency, date and overlay text of the recording.
+    """
+    overlay = " | ".join(
+        f"{field}: {row.get(field, 'Unknown')}"
+        for field in overlay_fields
+        if field in row.index
+    )
+    return {
+        ColumnNames.SAMPLING_FREQUENCY.value: float(
+            row[ColumnNames.SAMPLING_FREQUENCY.value]
+        ),
+        EFFECTIVE_DATE_TIME_HHMM: row.get(EFFECTIVE_DATE_TIME_HHMM, "Unknown"),
+        "overlay": overlay,
+        **{key: np.asarray(row[key], dtype=np.float64) for key in ECG_PART_COLUMNS},
+    }
+
+
+def _fingerprint(payloads: list[dict], output_format: str) -> str:
+    """
+    Compute a content fingerprint for an output file from everything that affects its pixels.
+
+    Args:
+        payloads (list[dict]): The recordings rendered into the output file, in page order.
+        output_format (str): The output file format.
+
+    Returns:
+        str: Hex digest identifying the rendered content.
+    """
+    digest = hashlib.sha256(output_format.encode("utf-8"))
+    digest.update(repr([(p.name, p.value) for p in PlotParams]).encode("utf-8"))
+    for payload in payloads:
+        digest.update(str(payload[EFFECTIVE_DATE_TIME_HHMM]).encode("utf-8"))
+        digest.update(payload["overlay"].encode("utf-8"))
+        digest.update(str(payload[ColumnNames.SAMPLING_FREQUENCY.value]).encode())
+        for key in ECG_PART_COLUMNS:
+            digest.update(payload[key].tobytes())
+    return digest.hexdigest()
+
+
+def _draw_figure(payload: dict) -> Figure:
+    """
+    Draw a single recording onto a new figure attached to an Agg canvas.
+
+    Args:
+        payload (dict): The recording as produced by `_recording_payload`.
+
+    Returns:
+        Figure: The rendered figure.
+    """
+    overlay_lines = 1 if payload["overlay"] else 0
+    fig = Figure(
+        figsize=(
+            PlotParams.PANELS_FIG_WIDTH.value,
+            PlotParams.PANELS_FIG_HEIGHT.value
+            + overlay_lines * OVERLAY_HEIGHT_PER_LINE,
+        ),
+        layout="constrained",
+    )
+    FigureCanvasAgg(fig)
+    plot_ecg_parts(payload, fig=fig)
+    if payload["overlay"]:
+        fig.suptitle(payload["overlay"], fontsize="medium", ha="center")
+    return fig
+
+
+def _render_job(job: tuple[str, list[dict], str]) -> tuple[str, str]:
+    """
+    Render one output file. Runs inside a worker process.
+
+    Args:
+        job (tuple[str, list[dict], str]): Output path, recordings in page order, and format.
+
+    Returns:
+        tuple[str, str]: The output path and either "rendered" or the error message.
+    """
+    path, payloads, output_format = job
+    tmp_path = f"{path}.tmp"
+    try:
+        if len(payloads) > 1:
+            with PdfPages(tmp_path) as pdf:
+                for payload in payloads:
+                    pdf.savefig(_draw_figure(payload))
+        else:
+            _draw_figure(payloads[0]).savefig(tmp_path, format=output_format)
+        os.replace(tmp_path, path)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return path, f"failed: {e}"
+    return path, "rendered"
+
+
+def _load_manifest(output_dir: str) -> dict:
+    """
+    Load the render manifest mapping output filenames to content fingerprints.
+
+    Args:
+        output_dir (str): Directory containing the rendered outputs.
+
+    Returns:
+        dict: The manifest, or an empty dictionary if none exists or it cannot be read.
+    """
+    try:
+        with open(
+            os.path.join(output_dir, MANIFEST_FILENAME), "r", encoding="utf-8"
+        ) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(output_dir: str, manifest: dict) -> None:
+    """
+    Atomically write the render manifest.
+
+    Args:
+        output_dir (str): Directory containing the rendered outputs.
+        manifest (dict): Mapping of output filenames to content fingerprints.
+    """
+    path = os.path.join(output_dir, MANIFEST_FILENAME)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def render_ecg_batch(  # pylint: disable=too-many-arguments, too-many-positional-arguments, too-many-locals
+    data: pd.DataFrame,
+    output_dir: str,
+    output_format: str = "png",
+    per_user: bool = False,
+    overlay_fields: list[str] | None = None,
+    max_workers: int | None = None,
+    force: bool = False,
+) -> pd.DataFrame:
+    """
+    Render ECG recordings to image or PDF files without a display, using all available cores.
+
+    Args:
+        data (pd.DataFrame): Processed ECG data as returned by `process_ecg_data`.
+        output_dir (str): Directory the files are written to. Created if it does not exist.
+        output_format (str): Either "png" or "pdf" (default is "png"). Ignored when `per_user`
+            is True, which always produces PDFs.
+        per_user (bool): If True, write one multi-page PDF per user instead of one file per
+            recording (default is False).
+        overlay_fields (list[str] | None): Columns printed as a metadata overlay above the
+            panels. Defaults to DEFAULT_OVERLAY_FIELDS; pass an empty list for no overlay.
+        max_workers (int | None): Number of worker processes (default is the number of CPUs).
+        force (bool): If True, re-render outputs even if they are up to date (default is False).
+
+    Returns:
+        pd.DataFrame: One row per output file with its 'Path' and 'Status' ("rendered",
+            "skipped" or "failed: <reason>").
+
+    Raises:
+        ValueError: If the output format is not supported.
+    """
+    if output_format not in SUPPORTED_FORMATS:
+        raise ValueError(
+            f"Unsupported output format '{output_format}'. "
+            f"Choose one of {SUPPORTED_FORMATS}."
+        )
+    if per_user:
+        output_format = "pdf"
+    if overlay_fields is None:
+        overlay_fields = DEFAULT_OVERLAY_FIELDS
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = _load_manifest(output_dir)
+
+    group_column = (
+        ColumnNames.USER_ID.value if per_user else ColumnNames.RESOURCE_ID.value
+    )
+    outputs = {}
+    for key, group in data.groupby(group_column, sort=False):
+        if per_user:
+            group = group.sort_values(EFFECTIVE_DATE_TIME_HHMM, kind="stable")
+        outputs[f"{key}.{output_format}"] = [
+            _recording_payload(row, overlay_fields) for _, row in group.iterrows()
+        ]
+
+    report = []
+    jobs = []
+    fingerprints = {}
+    for filename, payloads in outputs.items():
+        path = os.path.join(output_dir, filename)
+        fingerprints[filename] = _fingerprint(payloads, output_format)
+        if (
+            not force
+            and os.path.exists(path)
+            and manifest.get(filename) == fingerprints[filename]
+        ):
+            report.append({"Path": path, "Status": "skipped"})
+        else:
+            jobs.append((path, payloads, output_format))
+
+    if jobs:
+        workers = max_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, len(jobs) // (workers * 4))
+            for path, status in executor.map(_render_job, jobs, chunksize=chunksize):
+                filename = os.path.basename(path)
+                if status == "rendered":
+                    manifest[filename] = fingerprints[filename]
+                else:
+                    manifest.pop(filename, None)
+                report.append({"Path": path, "Status": status})
+
+        _save_manifest(output_dir, manifest)
+
+    return pd.DataFrame(report, columns=["Path", "Status"])
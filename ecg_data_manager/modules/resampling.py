@@ -0,0 +1,125 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Resampling of ECG recordings from heterogeneous watch models and firmware versions to one
+canonical sampling rate.
+
+Recordings are grouped by their source rate, and every group is resampled in one polyphase
+filter call (with anti-aliasing) by the rational factor between the canonical and the source
+rate. Afterwards all recordings share one sampling frequency, so the 10-second parts of the
+whole cohort form one rectangular array.
+"""
+
+# Standard library imports
+from fractions import Fraction
+
+# Related third-party imports
+import numpy as np
+import pandas as pd
+
+# Local application/library specific imports
+from spezi_data_pipeline.data_flattening.fhir_resources_flattener import ColumnNames
+from .waveforms import DEFAULT_CHUNK_SIZE, fill_nan_padding, iter_waveform_batches
+
+DEFAULT_SAMPLING_RATE = 512.0
+MAX_RATIO_DENOMINATOR = 1000
+SOURCE_SAMPLING_FREQUENCY = "SourceSamplingFrequency"
+
+
+def resampling_factors(source_rate: float, target_rate: float) -> tuple[int, int]:
+    """
+    Approximate the ratio between two sampling rates by a fraction of small integers.
+
+    Args:
+        source_rate (float): Sampling frequency of the recordings in Hz.
+        target_rate (float): Sampling frequency to resample to in Hz.
+
+    Returns:
+        tuple[int, int]: The upsampling and downsampling factors.
+    """
+    ratio = Fraction(target_rate / source_rate).limit_denominator(MAX_RATIO_DENOMINATOR)
+    return ratio.numerator, ratio.denominator
+
+
+def resample_waveforms(
+    matrix: np.ndarray, source_rate: float, target_rate: float
+) -> np.ndarray:
+    """
+    Resample a batch of NaN-padded recordings sharing a sampling frequency in a single call.
+
+    The NaN padding is replaced with the last valid sample of each recording before resampling
+    and restored afterwards, at the resampled length of each recording.
+
+    Args:
+        matrix (np.ndarray): Recordings of shape (n_recordings, n_samples), NaN-padded.
+        source_rate (float): Sampling frequency of all recordings in Hz.
+        target_rate (float): Sampling frequency to resample to in Hz.
+
+    Returns:
+        np.ndarray: The resampled recordings, NaN-padded, with the dtype of the input.
+    """
+    up, down = resampling_factors(source_rate, target_rate)
+    if up == down or matrix.size == 0:
+        return matrix.copy()
+
+    # pylint: disable-next=import-outside-toplevel
+    from scipy.signal import resample_poly
+
+    valid = ~np.isnan(matrix)
+    lengths = np.where(
+        valid.any(axis=1), matrix.shape[1] - np.argmax(valid[:, ::-1], axis=1), 0
+    )
+    resampled = resample_poly(fill_nan_padding(matrix), up, down, axis=1).astype(
+        matrix.dtype
+    )
+    resampled_lengths = -(-lengths * up // down)
+    resampled[np.arange(resampled.shape[1]) >= resampled_lengths[:, np.newaxis]] = (
+        np.nan
+    )
+    return resampled
+
+
+def resample_recordings(
+    df: pd.DataFrame,
+    sampling_rate: float = DEFAULT_SAMPLING_RATE,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> pd.DataFrame:
+    """
+    Resample all recordings to a canonical sampling rate, one batch per source rate.
+
+    The source rate of every recording is kept in a 'SourceSamplingFrequency' column, and the
+    'SamplingFrequency' column is set to the canonical rate.
+
+    Args:
+        df (pd.DataFrame): DataFrame with ECG data whose 'ECGRecording' column holds lists of
+            samples.
+        sampling_rate (float): The canonical sampling rate in Hz (default is 512).
+        chunk_size (int): Maximum number of recordings resampled at once (default is 2048).
+
+    Returns:
+        pd.DataFrame: The DataFrame with the resampled recordings as lists of samples.
+    """
+    source_rates = df[ColumnNames.SAMPLING_FREQUENCY.value].astype(float)
+    recordings = df[ColumnNames.ECG_RECORDING.value].copy()
+
+    for source_rate, index, matrix in iter_waveform_batches(
+        df[source_rates != sampling_rate], chunk_size=chunk_size, dtype=np.float64
+    ):
+        resampled = resample_waveforms(matrix, source_rate, sampling_rate)
+        valid_lengths = (~np.isnan(resampled)).sum(axis=1)
+        recordings.loc[index] = pd.Series(
+            [row[:n].tolist() for row, n in zip(resampled, valid_lengths)],
+            index=index,
+            dtype=object,
+        )
+
+    df[ColumnNames.ECG_RECORDING.value] = recordings
+    df[SOURCE_SAMPLING_FREQUENCY] = source_rates
+    df[ColumnNames.SAMPLING_FREQUENCY.value] = float(sampling_rate)
+    return df
@@ -0,0 +1,284 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Offline review journal that records diagnoses in a local SQLite database and synchronizes them
+to Firestore in bulk once connectivity returns.
+
+Every entry gets its Firestore document ID when it is recorded, so a sync that is interrupted
+after a commit can be repeated without creating duplicate reviews. The existing reviews of every
+recording are read in the transaction that writes its entries, and entries that would exceed the
+review limit or repeat a reviewer's review are marked as conflicts instead of being written.
+"""
+
+# Standard library imports
+import datetime
+import json
+import secrets
+import sqlite3
+from contextlib import closing, contextmanager
+from enum import Enum
+
+# Related third-party imports
+import pandas as pd
+from google.api_core.exceptions import GoogleAPIError
+from google.cloud import firestore
+from google.cloud.firestore import Client
+
+# Local application/library specific imports
+from .utils import (
+    DIAGNOSIS_DATA_SUBCOLLECTION,
+    ECG_DATA_SUBCOLLECTION,
+    USERS_COLLECTION,
+)
+
+DEFAULT_JOURNAL_PATH = "review_journal.sqlite3"
+MAX_REVIEWS = 3
+MAX_BATCH_SIZE = 500
+PHYSICIAN_INITIALS = "physicianInitials"
+DOCUMENT_ID_LENGTH = 20
+
+
+class JournalStatus(Enum):
+    """
+    Enumerates the states of a journal entry.
+    """
+
+    PENDING = "pending"
+    SYNCED = "synced"
+    CONFLICT = "conflict"
+
+
+class ReviewJournal:
+    """
+    Durable local journal of diagnoses with bulk synchronization to Firestore.
+
+    Attributes:
+        path (str): Path of the SQLite database file.
+    """
+
+    def __init__(self, path: str = DEFAULT_JOURNAL_PATH):
+        """
+        Initializes the journal and creates the database file if needed.
+
+        Args:
+            path (str): Path of the SQLite database file (default is
+                'review_journal.sqlite3').
+        """
+        self.path = path
+        with self._transaction() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS reviews (
+                    diagnosis_id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    document_id TEXT NOT NULL,
+                    diagnosis TEXT NOT NULL,
+                    recorded_at TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    message TEXT
+                )
+                """)
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS reviews_status ON reviews (status)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    @contextmanager
+    def _transaction(self):
+        with closing(self._connect()) as connection:
+            with connection:
+                yield connection
+
+    def record(self, user_id: str, document_id: str, diagnosis_data: dict) -> str:
+        """
+        Record a diagnosis locally.
+
+        Args:
+            user_id (str): The user ID associated with the ECG recording.
+            document_id (str): The document ID of the ECG recording.
+            diagnosis_data (dict): The diagnosis document to store.
+
+        Returns:
+            str: The Firestore document ID the diagnosis will be stored under.
+        """
+        diagnosis_id = secrets.token_hex(DOCUMENT_ID_LENGTH // 2)
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT INTO reviews VALUES (?, ?, ?, ?, ?, ?, NULL)",
+                (
+                    diagnosis_id,
+                    user_id,
+                    document_id,
+                    json.dumps(diagnosis_data),
+                    datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                    JournalStatus.PENDING.value,
+                ),
+            )
+        return diagnosis_id
+
+    def entries(self, status: JournalStatus | None = None) -> pd.DataFrame:
+        """
+        List the journal entries, e.g., to inspect conflicts.
+
+        Args:
+            status (JournalStatus | None): Only list entries in this state (default is all).
+
+        Returns:
+            pd.DataFrame: One row per entry in the order they were recorded.
+        """
+        query = "SELECT * FROM reviews"
+        parameters = ()
+        if status is not None:
+            query += " WHERE status = ?"
+            parameters = (status.value,)
+        with closing(self._connect()) as connection:
+            return pd.read_sql_query(
+                query + " ORDER BY recorded_at, rowid", connection, params=parameters
+            )
+
+    def diagnoses_of(self, document_id: str) -> list[dict]:
+        """
+        List the diagnoses of an ECG recording that are pending or synced, e.g., to show the
+        review status of the recording without a connection.
+
+        Args:
+            document_id (str): The document ID of the ECG recording.
+
+        Returns:
+            list[dict]: The diagnosis documents in the order they were recorded.
+        """
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT diagnosis FROM reviews WHERE document_id = ? AND status != ? "
+                "ORDER BY recorded_at, rowid",
+                (document_id, JournalStatus.CONFLICT.value),
+            ).fetchall()
+        return [json.loads(diagnosis) for (diagnosis,) in rows]
+
+    def _set_status(self, diagnosis_ids: list, status: JournalStatus, message=None):
+        with self._transaction() as connection:
+            connection.executemany(
+                "UPDATE reviews SET status = ?, message = ? WHERE diagnosis_id = ?",
+                [
+                    (status.value, message, diagnosis_id)
+                    for diagnosis_id in diagnosis_ids
+                ],
+            )
+
+    def sync(self, db: Client, batch_size: int = MAX_BATCH_SIZE) -> dict[str, int]:
+        """
+        Write all pending entries to their Diagnosis subcollections in batched transactions.
+
+        Entries of a recording are written in the order they were recorded until the recording
+        has MAX_REVIEWS reviews. Remaining entries, and entries of reviewers who already
+        reviewed the recording, are marked as conflicts. The existing reviews are read in the
+        transaction that writes the entries, so a review saved concurrently, e.g., by another
+        journal or the DiagnosisWriteQueue, makes the transaction retry with the new reviews.
+        If a commit fails, e.g., because the connection is lost again, the entries of that and
+        all later batches stay pending.
+
+        Args:
+            db (Client): Firestore database client.
+            batch_size (int): Maximum number of writes per transaction (default and maximum is
+                500).
+
+        Returns:
+            dict[str, int]: Number of entries synced, marked as conflicts, and still pending.
+        """
+        summary = {status.value: 0 for status in JournalStatus}
+        batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+
+        chunk, chunk_writes = [], 0
+        chunks = [chunk]
+        for recording, group in self.entries(JournalStatus.PENDING).groupby(
+            ["user_id", "document_id"], sort=False
+        ):
+            # At most MAX_REVIEWS entries of a recording can be written
+            writes = min(len(group), MAX_REVIEWS)
+            if chunk and chunk_writes + writes > batch_size:
+                chunk, chunk_writes = [], 0
+                chunks.append(chunk)
+            chunk.append((recording, group))
+            chunk_writes += writes
+
+        try:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                synced, conflicts = self._sync_chunk(db, chunk)
+                self._set_status(synced, JournalStatus.SYNCED)
+                self._set_status(
+                    conflicts,
+                    JournalStatus.CONFLICT,
+                    f"Recording already has {MAX_REVIEWS} reviews or a review by this "
+                    "reviewer.",
+                )
+                summary[JournalStatus.SYNCED.value] += len(synced)
+                summary[JournalStatus.CONFLICT.value] += len(conflicts)
+        except GoogleAPIError as error:
+            print(f"Sync interrupted, remaining reviews stay pending: {error}")
+
+        summary[JournalStatus.PENDING.value] = len(self.entries(JournalStatus.PENDING))
+        return summary
+
+    @staticmethod
+    def _sync_chunk(db: Client, chunk: list) -> tuple[list, list]:
+        """
+        Write the entries of some recordings in one transaction.
+
+        Returns:
+            tuple[list, list]: The IDs of the synced entries and of the conflicts.
+        """
+        diagnosis_refs = [
+            db.collection(USERS_COLLECTION)
+            .document(user_id)
+            .collection(ECG_DATA_SUBCOLLECTION)
+            .document(document_id)
+            .collection(DIAGNOSIS_DATA_SUBCOLLECTION)
+            for (user_id, document_id), _ in chunk
+        ]
+
+        @firestore.transactional
+        def create_in_transaction(transaction) -> tuple[list, list]:
+            # Firestore transactions must read all documents before the first write
+            existing_reviews = [
+                {
+                    doc.id: doc.to_dict().get(PHYSICIAN_INITIALS)
+                    for doc in diagnosis_ref.stream(transaction=transaction)
+                }
+                for diagnosis_ref in diagnosis_refs
+            ]
+
+            synced, conflicts = [], []
+            for diagnosis_ref, existing, (_, group) in zip(
+                diagnosis_refs, existing_reviews, chunk
+            ):
+                reviewers = set(existing.values())
+                review_count = len(existing)
+                for entry in group.itertuples():
+                    diagnosis = json.loads(entry.diagnosis)
+                    if entry.diagnosis_id in existing:
+                        # An earlier sync committed the entry
+                        synced.append(entry.diagnosis_id)
+                    elif review_count >= MAX_REVIEWS or (
+                        diagnosis.get(PHYSICIAN_INITIALS) in reviewers
+                    ):
+                        conflicts.append(entry.diagnosis_id)
+                    else:
+                        reviewers.add(diagnosis.get(PHYSICIAN_INITIALS))
+                        review_count += 1
+                        transaction.create(
+                            diagnosis_ref.document(entry.diagnosis_id), diagnosis
+                        )
+                        synced.append(entry.diagnosis_id)
+            return synced, conflicts
+
+        return create_in_transaction(db.transaction())
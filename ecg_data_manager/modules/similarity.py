@@ -0,0 +1,228 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Search index to find ECG recordings with a similar beat morphology across the cohort.
+
+Every recording is summarized by a fixed-length embedding: a window around each detected R-peak
+is resampled to a fixed number of points, the beats are averaged, and the average beat is
+normalized to zero mean and unit length. Because the windows are defined in seconds, recordings
+with different sampling frequencies share one embedding space. Queries are an exact cosine
+similarity search, i.e., a single matrix-vector product followed by a partial sort, which returns
+in milliseconds for tens of thousands of recordings.
+"""
+
+# Standard library imports
+from enum import Enum
+
+# Related third-party imports
+import numpy as np
+import pandas as pd
+
+# Local application/library specific imports
+from spezi_data_pipeline.data_flattening.fhir_resources_flattener import ColumnNames
+from .duplicates import DuplicateColumns
+from .features import RhythmFeatures, detect_r_peaks
+from .waveforms import DEFAULT_CHUNK_SIZE, iter_waveform_batches
+
+BEAT_WINDOW_SEC = (-0.25, 0.45)
+EMBEDDING_LENGTH = 64
+DEFAULT_TOP_K = 10
+
+
+class SimilarityColumns(Enum):
+    """
+    Enumerates the columns of the query results.
+    """
+
+    RESOURCE_ID = ColumnNames.RESOURCE_ID.value
+    SIMILARITY = "Similarity"
+
+
+def beat_embeddings(  # pylint: disable=too-many-locals
+    matrix: np.ndarray,
+    sampling_frequency: float,
+    r_peaks: list[np.ndarray] | None = None,
+    length: int = EMBEDDING_LENGTH,
+) -> np.ndarray:
+    """
+    Compute the beat-averaged embeddings of a batch of recordings.
+
+    Args:
+        matrix (np.ndarray): Recordings of shape (n_recordings, n_samples), NaN-padded.
+        sampling_frequency (float): Sampling frequency of all recordings in Hz.
+        r_peaks (list[np.ndarray] | None): R-peak sample indices per recording, e.g., from the
+            'RPeakIndices' column. Detected with `detect_r_peaks` if None.
+        length (int): Number of points of the embedding (default is 64).
+
+    Returns:
+        np.ndarray: Unit-length float32 embeddings of shape (n_recordings, length). Recordings
+            without a complete beat get a row of NaN values.
+    """
+    n_rows, n_samples = matrix.shape
+    if r_peaks is None:
+        rows, peaks = np.nonzero(detect_r_peaks(matrix, sampling_frequency))
+    else:
+        rows = np.repeat(np.arange(n_rows), [len(p) for p in r_peaks])
+        peaks = (
+            np.concatenate(r_peaks).astype(float) if len(rows) else np.empty(0, float)
+        )
+
+    # Fractional sample positions of the beat windows, linearly interpolated
+    offsets = np.linspace(*BEAT_WINDOW_SEC, length) * sampling_frequency
+    positions = peaks[:, np.newaxis] + offsets
+    complete = (positions[:, 0] >= 0) & (positions[:, -1] <= n_samples - 1)
+    rows, positions = rows[complete], positions[complete]
+
+    lower = np.floor(positions).astype(np.intp)
+    upper = np.minimum(lower + 1, n_samples - 1)
+    fraction = positions - lower
+    beats = (1 - fraction) * matrix[rows[:, np.newaxis], lower] + fraction * matrix[
+        rows[:, np.newaxis], upper
+    ]
+    beats -= beats.mean(axis=1, keepdims=True)
+
+    # Beats with NaN samples, e.g., at the end of shorter recordings, are ignored
+    usable = ~np.isnan(beats).any(axis=1)
+    rows, beats = rows[usable], beats[usable]
+
+    counts = np.bincount(rows, minlength=n_rows)
+    sums = np.zeros((n_rows, length))
+    if len(rows):
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        sums[rows[starts]] = np.add.reduceat(beats, starts, axis=0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        average = sums / counts[:, np.newaxis]
+        average -= average.mean(axis=1, keepdims=True)
+        embeddings = average / np.linalg.norm(average, axis=1, keepdims=True)
+    return embeddings.astype(np.float32)
+
+
+class SimilarityIndex:
+    """
+    Exact nearest-neighbour index over the beat-averaged embeddings of ECG recordings.
+
+    Attributes:
+        resource_ids (np.ndarray): The ResourceId of every indexed recording.
+        embeddings (np.ndarray): Unit-length embeddings of shape (n_recordings, length).
+    """
+
+    def __init__(self, resource_ids, embeddings: np.ndarray):
+        """
+        Initializes the index from precomputed embeddings.
+
+        Args:
+            resource_ids (array-like): The ResourceId of every embedding.
+            embeddings (np.ndarray): Unit-length embeddings of shape (n_recordings, length).
+                Rows with NaN values are not indexed.
+        """
+        indexable = ~np.isnan(embeddings).any(axis=1)
+        self.resource_ids = np.asarray(resource_ids, dtype=object)[indexable]
+        self.embeddings = np.ascontiguousarray(embeddings[indexable], dtype=np.float32)
+        self._positions = {
+            resource_id: position
+            for position, resource_id in enumerate(self.resource_ids)
+        }
+
+    @classmethod
+    def from_dataframe(
+        cls, df: pd.DataFrame, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> "SimilarityIndex":
+        """
+        Build the index from the recordings of a DataFrame.
+
+        The R-peaks of the 'RPeakIndices' column are reused if `add_rhythm_features` has run,
+        otherwise they are detected. Duplicate uploads flagged by `add_duplicate_detection` are
+        not indexed.
+
+        Args:
+            df (pd.DataFrame): DataFrame with ECG data whose 'ECGRecording' column holds lists of
+                samples, e.g., as returned by `process_ecg_data`.
+            chunk_size (int): Maximum number of recordings processed at once (default is 2048).
+
+        Returns:
+            SimilarityIndex: The index over all recordings with at least one complete beat.
+        """
+        if DuplicateColumns.IS_DUPLICATE.value in df.columns:
+            df = df[~df[DuplicateColumns.IS_DUPLICATE.value].fillna(False).astype(bool)]
+
+        resource_ids, embeddings = [], []
+        has_peaks = RhythmFeatures.R_PEAKS.value in df.columns
+        for sampling_frequency, index, matrix in iter_waveform_batches(
+            df, chunk_size=chunk_size
+        ):
+            r_peaks = (
+                [
+                    np.asarray(
+                        p if isinstance(p, (list, np.ndarray)) else [], dtype=np.intp
+                    )
+                    for p in df.loc[index, RhythmFeatures.R_PEAKS.value]
+                ]
+                if has_peaks
+                else None
+            )
+            embeddings.append(beat_embeddings(matrix, sampling_frequency, r_peaks))
+            resource_ids.append(df.loc[index, ColumnNames.RESOURCE_ID.value].to_numpy())
+
+        if not embeddings:
+            return cls(np.empty(0, dtype=object), np.empty((0, EMBEDDING_LENGTH)))
+        return cls(np.concatenate(resource_ids), np.concatenate(embeddings))
+
+    def __len__(self) -> int:
+        return len(self.resource_ids)
+
+    def __contains__(self, resource_id) -> bool:
+        return resource_id in self._positions
+
+    def query_embedding(
+        self, embedding: np.ndarray, k: int = DEFAULT_TOP_K
+    ) -> pd.DataFrame:
+        """
+        Find the recordings most similar to an embedding.
+
+        Args:
+            embedding (np.ndarray): A unit-length embedding as returned by `beat_embeddings`.
+            k (int): Number of recordings to return (default is 10).
+
+        Returns:
+            pd.DataFrame: 'ResourceId' and cosine 'Similarity' of the top-k recordings, most
+                similar first.
+        """
+        similarities = self.embeddings @ np.asarray(embedding, dtype=np.float32)
+        k = min(k, len(similarities))
+        top = np.argpartition(-similarities, k - 1)[:k] if k > 0 else np.empty(0, int)
+        top = top[np.argsort(-similarities[top], kind="stable")]
+        return pd.DataFrame(
+            {
+                SimilarityColumns.RESOURCE_ID.value: self.resource_ids[top],
+                SimilarityColumns.SIMILARITY.value: similarities[top],
+            }
+        )
+
+    def query(self, resource_id, k: int = DEFAULT_TOP_K) -> pd.DataFrame:
+        """
+        Find the recordings most similar to an indexed recording, excluding the recording itself.
+
+        Args:
+            resource_id (str): The ResourceId of the query recording.
+            k (int): Number of recordings to return (default is 10).
+
+        Returns:
+            pd.DataFrame: 'ResourceId' and cosine 'Similarity' of the top-k recordings, most
+                similar first.
+
+        Raises:
+            KeyError: If the recording is not indexed, e.g., because no complete beat was found.
+        """
+        position = self._positions[resource_id]
+        results = self.query_embedding(self.embeddings[position], k + 1)
+        results = results[
+            results[SimilarityColumns.RESOURCE_ID.value] != resource_id
+        ].head(k)
+        return results.reset_index(drop=True)
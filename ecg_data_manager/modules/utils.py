@@ -12,22 +12,70 @@ the PediatricAppleWatchStudy.
 """
 
 # Standard library imports
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime
+from enum import Enum
+from typing import TYPE_CHECKING
 
 # Related third-party imports
 import numpy as np
 import pandas as pd
-from google.cloud.firestore import Client
-from google.cloud.firestore_v1.base_query import FieldFilter
 
 # Local application/library specific imports
-from spezi_data_pipeline.data_access.firebase_fhir_data_access import get_code_mappings
 from spezi_data_pipeline.data_flattening.fhir_resources_flattener import ColumnNames
+from .compaction import REVIEWERS, compact_dtypes, reviewer_list
+from .diagnoses import attach_diagnoses, build_diagnoses_table, diagnosis_records
+from .duplicates import add_duplicate_detection
+from .features import RhythmFeatures, add_rhythm_features
+from .filtering import FilteredColumns, add_filtered_waveforms
+from .priority import PriorityKeys, prioritize_recordings
+from .quality import NUMBER_OF_PARTS, SignalQuality, add_signal_quality
+from .resampling import resample_recordings
+from .waveforms import (
+    DEFAULT_CHUNK_SIZE,
+    ECG_PART_COLUMNS,
+    TEN_SECOND_PARTS,
+    iter_waveform_batches,
+    window_waveforms,
+)
+
+if TYPE_CHECKING:
+    from google.cloud.firestore import Client
+    from google.cloud.firestore_v1.query import Query
 
 USERS_COLLECTION = "users"
 ECG_DATA_SUBCOLLECTION = "HealthKit"
 DIAGNOSIS_DATA_SUBCOLLECTION = "Diagnosis"
 
+# Columns computed from the waveform alone, which never changes after upload
+WAVEFORM_FEATURE_COLUMNS = (
+    [feature.value for feature in RhythmFeatures]
+    + [
+        column.value
+        for column in SignalQuality
+        if column is not SignalQuality.PART_SCORES
+    ]
+    + [
+        f"{SignalQuality.PART_SCORES.value}{part + 1}"
+        for part in range(NUMBER_OF_PARTS)
+    ]
+)
+FILTERED_WAVEFORM_COLUMNS = [column.value for column in FilteredColumns]
+
+
+class ExportFormat(Enum):
+    """
+    Enumerates the file formats of the exported database by file extension.
+    """
+
+    CSV = "csv"
+    PARQUET = "parquet"
+    PICKLE = "pkl"
+
 
 class ColumnMismatchError(Exception):
     """
@@ -45,44 +93,239 @@ class ColumnMismatchError(Exception):
         super().__init__(self.message)
 
 
-def process_ecg_data(db: Client, data: pd.DataFrame) -> pd.DataFrame:
+@dataclass
+class StageTimings:
+    """
+    Wall-clock durations of the processing stages.
+
+    Attributes:
+        seconds (dict[str, float]): The duration of every stage in seconds, in execution order.
+        verbose (bool): If True, every stage is printed when it finishes.
+    """
+
+    seconds: dict[str, float] = field(default_factory=dict)
+    verbose: bool = False
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Time the enclosed block as the stage `name`, adding to a previous duration of the stage.
+
+        Args:
+            name (str): The name of the stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+            if self.verbose:
+                print(f"{name} finished in {seconds:.2f} s", flush=True)
+
+    @property
+    def total(self) -> float:
+        """
+        The total duration of all stages in seconds.
+        """
+        return sum(self.seconds.values())
+
+
+def process_ecg_data(  # pylint: disable=too-many-arguments, too-many-positional-arguments, too-many-locals
+    db: "Client",
+    data: pd.DataFrame,
+    filter_waveforms: bool = False,
+    return_diagnoses: bool = False,
+    compact: bool = False,
+    priority_weights: dict[str, float] | None = None,
+    fetch_workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cached: pd.DataFrame | None = None,
+    timings: StageTimings | None = None,
+    failed_users: list[str] | None = None,
+    sampling_rate: float | None = None,
+    reused_ids: list[str] | None = None,
+) -> pd.DataFrame | tuple[pd.DataFrame, pd.DataFrame]:
     """
     Prepare ECG data by fetching diagnosis data, creating a diagnosis dataframe,
     concatenating it with the provided dataframe, splitting the ECG recordings into
-    10-second parts, and prioritizing abnormal recordings.
+    10-second parts, detecting duplicate uploads, computing rhythm and signal-quality features,
+    ordering the recordings by review priority, and converting the columns to compact dtypes.
 
     Args:
         db (Client): Firestore database client.
         flattened_df (pd.DataFrame): Flattened DataFrame with ECG data.
+        filter_waveforms (bool): If True, filtered copies of the waveforms (baseline removal,
+            band-pass and notch filter) are added next to the raw waveforms (default is False).
+        return_diagnoses (bool): If True, the reviews are returned as a separate diagnoses
+            table indexed by (ResourceId, ReviewIndex) instead of 'Diagnosis{i}_{key}' columns
+            on every row (default is False).
+        compact (bool): If True, repeated strings are stored as categoricals, numeric metadata
+            as nullable integers, dates as datetime64, and the reviewers as encoded strings,
+            and the memory usage before and after is printed (default is False).
+        priority_weights (dict[str, float] | None): Weights of the review priority keys by
+            PriorityKeys value, overriding the defaults of `modules.priority` (default is None).
+        fetch_workers (int): Number of users whose reviews are fetched concurrently (default
+            is 1).
+        chunk_size (int): Maximum number of recordings processed at once by the waveform stages
+            (default is 2048).
+        cached (pd.DataFrame | None): Processed ECG data of a previous run. The waveform
+            features of recordings it contains are reused by ResourceId instead of being
+            recomputed (default is None).
+        timings (StageTimings | None): If given, the duration of every stage is recorded in it
+            (default is None).
+        failed_users (list[str] | None): If given, the IDs of the users whose reviews could not
+            be fetched are appended to it (default is None).
+        sampling_rate (float | None): If given, all recordings are resampled to this sampling
+            rate in Hz before they are split, so that the waveform stages see one rectangular
+            array; the source rate is kept in 'SourceSamplingFrequency' (default is None).
+        reused_ids (list[str] | None): If given, the ResourceIds of the recordings whose
+            waveform features were reused from `cached` are appended to it (default is None).
 
     Returns:
-        pd.DataFrame: Processed ECG data.
+        pd.DataFrame | tuple[pd.DataFrame, pd.DataFrame]: Processed ECG data, and the diagnoses
+            table if return_diagnoses is True.
     """
+    timings = timings if timings is not None else StageTimings()
 
     # Get diagnosis-related data from Firestore
-    data_diagnosis_enhanced = fetch_diagnosis_data(db, data)
+    with timings.stage("fetch_reviews"):
+        data_diagnosis_enhanced, diagnoses = fetch_diagnosis_data(
+            db,
+            data,
+            return_diagnoses=True,
+            max_workers=fetch_workers,
+            failed_users=failed_users,
+        )
+    if not return_diagnoses:
+        data_diagnosis_enhanced = attach_diagnoses(data_diagnosis_enhanced, diagnoses)
 
     # Split the 30-sec ECG recording into 10-sec parts for better visualization
-    data_after_splits = split_ecg_recording_in_10sec_parts(data_diagnosis_enhanced)
+    with timings.stage("split_recordings"):
+        data_after_splits = split_ecg_recording_in_10sec_parts(
+            data_diagnosis_enhanced, sampling_rate, chunk_size
+        )
 
-    # Get the user information data from Firestore and store it in pd.DataFrame format
-    users_data = fetch_users_list(db)
+    # Collapse re-synced copies of the same waveform to one canonical recording
+    with timings.stage("duplicate_detection"):
+        data_after_splits = add_duplicate_detection(data_after_splits)
 
-    # Add the user information data to the processed data
-    data_diagnosis_users_enhanced = merge_dataframes_on_userid(
-        data_after_splits, users_data
+    # Compute rhythm features, signal quality, and optionally filtered waveforms
+    data_after_splits = add_waveform_features(
+        data_after_splits, filter_waveforms, chunk_size, cached, timings, reused_ids
     )
 
-    # Add a column based on the user's age
-    data_diagnosis_users_enhanced_age = add_age_group_column(
-        data_diagnosis_users_enhanced
-    )
+    # Get the user information data from Firestore and store it in pd.DataFrame format
+    with timings.stage("fetch_users"):
+        users_data = fetch_users_list(db)
 
-    processed_data = prioritize_abnormal_recordings(data_diagnosis_users_enhanced_age)
+    with timings.stage("merge_users"):
+        # Add the user information data to the processed data
+        data_diagnosis_users_enhanced = merge_dataframes_on_userid(
+            data_after_splits, users_data
+        )
 
+        # Add a column based on the user's age
+        data_diagnosis_users_enhanced_age = add_age_group_column(
+            data_diagnosis_users_enhanced
+        )
+
+    # Order the recordings by severity, symptoms, age group, reviews, and signal quality
+    with timings.stage("prioritization"):
+        processed_data = prioritize_recordings(
+            data_diagnosis_users_enhanced_age, priority_weights
+        )
+
+    # Store repeated strings and numeric metadata compactly to speed up filters and sorts
+    if compact:
+        with timings.stage("compaction"):
+            processed_data = compact_dtypes(processed_data)
+
+    if return_diagnoses:
+        return processed_data, diagnoses
     return processed_data
 
 
+def add_waveform_features(  # pylint: disable=too-many-arguments, too-many-positional-arguments
+    df: pd.DataFrame,
+    filter_waveforms: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cached: pd.DataFrame | None = None,
+    timings: StageTimings | None = None,
+    reused_ids: list[str] | None = None,
+) -> pd.DataFrame:
+    """
+    Add the rhythm features, the signal quality, and optionally the filtered waveforms of every
+    recording, reusing the values of previously processed recordings.
+
+    Args:
+        df (pd.DataFrame): DataFrame with ECG data after `split_ecg_recording_in_10sec_parts`.
+        filter_waveforms (bool): If True, the filtered waveforms are added (default is False).
+        chunk_size (int): Maximum number of recordings processed at once (default is 2048).
+        cached (pd.DataFrame | None): Processed ECG data of a previous run. Recordings with a
+            ResourceId and sampling frequency in it are not recomputed if it holds all the
+            columns to add (default is None).
+        timings (StageTimings | None): If given, the duration of every stage is recorded in it
+            (default is None).
+        reused_ids (list[str] | None): If given, the ResourceIds of the reused recordings are
+            appended to it (default is None).
+
+    Returns:
+        pd.DataFrame: The DataFrame with the WAVEFORM_FEATURE_COLUMNS, and the
+            FILTERED_WAVEFORM_COLUMNS if filter_waveforms is True, added.
+    """
+    timings = timings if timings is not None else StageTimings()
+    columns = WAVEFORM_FEATURE_COLUMNS + (
+        FILTERED_WAVEFORM_COLUMNS if filter_waveforms else []
+    )
+    resource_ids = df[ColumnNames.RESOURCE_ID.value]
+
+    sampling_frequency = ColumnNames.SAMPLING_FREQUENCY.value
+    cached_by_id = pd.DataFrame(columns=columns + [sampling_frequency])
+    if cached is not None and set(columns + [sampling_frequency]) <= set(
+        cached.columns
+    ):
+        cached_by_id = cached.drop_duplicates(
+            subset=ColumnNames.RESOURCE_ID.value
+        ).set_index(ColumnNames.RESOURCE_ID.value)[columns + [sampling_frequency]]
+    # The features depend on the sampling rate the recordings were processed at
+    reused = pd.Series(
+        cached_by_id[sampling_frequency].reindex(resource_ids).to_numpy()
+        == df[sampling_frequency].to_numpy(),
+        index=df.index,
+    )
+    if reused_ids is not None:
+        reused_ids.extend(resource_ids[reused].tolist())
+
+    # Detect R-peaks and compute RR interval statistics over all recordings at once
+    computed = df.loc[~reused].copy()
+    with timings.stage("rhythm_features"):
+        computed = add_rhythm_features(computed, chunk_size=chunk_size)
+
+    # Score the signal quality of every recording and 10-sec part to pre-triage bad tracings
+    with timings.stage("signal_quality"):
+        computed = add_signal_quality(computed, chunk_size=chunk_size)
+
+    # Optionally filter all waveforms in one batched pass so viewers can toggle them instantly
+    if filter_waveforms:
+        with timings.stage("filtering"):
+            computed = add_filtered_waveforms(computed, chunk_size=chunk_size)
+
+    if not reused.any():
+        return computed
+
+    # Waveforms never change after upload, so the features of known recordings are reused
+    with timings.stage("reuse_cached_features"):
+        for column in columns:
+            reused_values = cached_by_id[column].reindex(resource_ids[reused])
+            reused_values.index = df.index[reused]
+            parts = [reused_values]
+            if column in computed.columns and not computed.empty:
+                parts.append(computed[column])
+            df[column] = pd.concat(parts).reindex(df.index)
+    return df
+
+
 def fetch_symptoms_single(observation_data: dict) -> dict:
     """
     Extracts symptoms information from the components array of a single observation data
@@ -140,96 +383,170 @@ def fetch_symptoms_single(observation_data: dict) -> dict:
     }
 
 
-def fetch_diagnosis_data(  # pylint: disable=too-many-locals, too-many-branches
-    db: Client,
-    input_df: pd.DataFrame,
-    collection_name=USERS_COLLECTION,
-    subcollection_name=ECG_DATA_SUBCOLLECTION,
-) -> pd.DataFrame:
+def ecg_observations_query(
+    db: "Client",
+    user_id: str,
+    collection_name: str = USERS_COLLECTION,
+    subcollection_name: str = ECG_DATA_SUBCOLLECTION,
+) -> "Query":
     """
-    Fetch diagnosis data from the Firestore database and extend the input DataFrame with new
-    columns, including a 'Symptoms' column.
+    Build the query for the ECG observations of one user.
 
     Args:
         db (Client): Firestore database client.
-        input_df (pd.DataFrame): Input DataFrame to be extended.
+        user_id (str): The ID of the user document.
         collection_name (str, optional): Name of the main collection. Defaults to USERS_COLLECTION.
         subcollection_name (str, optional): Name of the subcollection. Defaults to
             ECG_DATA_SUBCOLLECTION.
 
     Returns:
-        pd.DataFrame: Extended DataFrame containing the fetched diagnosis data and symptoms.
+        Query: The documents of the user's subcollection coded as ECG recordings.
     """
-    collection_ref = db.collection(collection_name)
-    resources = []
-    new_columns = set()
+    # pylint: disable=import-outside-toplevel
+    from google.cloud.firestore_v1.base_query import FieldFilter
+    from spezi_data_pipeline.data_access.firebase_fhir_data_access import (
+        get_code_mappings,
+    )
 
-    for user_doc in collection_ref.stream():  # pylint: disable=too-many-nested-blocks
-        try:
-            user_id = user_doc.id
-            query = (
-                db.collection(collection_name)
-                .document(user_id)
-                .collection(subcollection_name)
+    # pylint: enable=import-outside-toplevel
+
+    display_str, code_str, system_str = get_code_mappings("131328")
+    return (
+        db.collection(collection_name)
+        .document(user_id)
+        .collection(subcollection_name)
+        .where(
+            filter=FieldFilter(
+                "code.coding",
+                "array_contains",
+                {"display": display_str, "system": system_str, "code": code_str},
             )
+        )
+    )
 
-            display_str, code_str, system_str = get_code_mappings("131328")
 
-            fhir_docs = query.where(
-                filter=FieldFilter(
-                    "code.coding",
-                    "array_contains",
-                    {"display": display_str, "system": system_str, "code": code_str},
-                )
-            ).stream()
+def _fetch_user_ecg_reviews(
+    db: "Client",
+    user_id: str,
+    collection_name: str = USERS_COLLECTION,
+    subcollection_name: str = ECG_DATA_SUBCOLLECTION,
+) -> tuple[list[dict], list[dict]]:
+    """
+    Fetch the ECG observations of one user with their symptoms and reviews.
 
-            # Process the FHIR documents and store observation data
-            for doc in fhir_docs:
-                observation_data = doc.to_dict()
-                observation_data[ColumnNames.USER_ID.value] = user_id
-                observation_data[ColumnNames.RESOURCE_ID.value] = doc.id
+    Args:
+        db (Client): Firestore database client.
+        user_id (str): The ID of the user document.
+        collection_name (str, optional): Name of the main collection. Defaults to USERS_COLLECTION.
+        subcollection_name (str, optional): Name of the subcollection. Defaults to
+            ECG_DATA_SUBCOLLECTION.
 
-                # Extract effective period start time
-                effective_start = observation_data.get("effectivePeriod", {}).get(
-                    "start", ""
-                )
-                if effective_start:
-                    observation_data["EffectiveDateTimeHHMM"] = effective_start
+    Returns:
+        tuple[list[dict], list[dict]]: The observation data of the user's recordings and the
+            rows of the diagnoses table.
+    """
+    resources = []
+    diagnoses = []
+    fhir_docs = ecg_observations_query(
+        db, user_id, collection_name, subcollection_name
+    ).stream()
+
+    # Process the FHIR documents and store observation data
+    for doc in fhir_docs:
+        observation_data = doc.to_dict()
+        observation_data[ColumnNames.USER_ID.value] = user_id
+        observation_data[ColumnNames.RESOURCE_ID.value] = doc.id
+
+        # Extract effective period start time
+        effective_start = observation_data.get("effectivePeriod", {}).get("start", "")
+        if effective_start:
+            observation_data["EffectiveDateTimeHHMM"] = effective_start
+
+        # Extract symptoms information HERE
+        symptoms_info = fetch_symptoms_single(observation_data)
+        if symptoms_info:
+            observation_data.update(symptoms_info)
+
+        # Extract diagnosis information from diagnosis subcollection
+        diagnosis_docs = list(
+            doc.reference.collection(DIAGNOSIS_DATA_SUBCOLLECTION).stream()
+        )
+
+        physician_initials_list = [
+            diagnosis_doc.to_dict().get("physicianInitials", "")
+            for diagnosis_doc in diagnosis_docs
+        ]
+        observation_data["NumberOfReviewers"] = len(physician_initials_list)
+        observation_data["Reviewers"] = physician_initials_list
+        observation_data["ReviewStatus"] = (
+            "Incomplete review"
+            if observation_data["NumberOfReviewers"] < 3
+            else "Complete review"
+        )
 
-                # Extract symptoms information HERE
-                symptoms_info = fetch_symptoms_single(observation_data)
-                if symptoms_info:
-                    observation_data.update(symptoms_info)
+        # Add one row per diagnosis document to the diagnoses table
+        diagnoses.extend(diagnosis_records(doc.id, diagnosis_docs))
 
-                # Extract diagnosis information from diagnosis subcollection
-                diagnosis_docs = list(
-                    doc.reference.collection(DIAGNOSIS_DATA_SUBCOLLECTION).stream()
-                )
+        resources.append(observation_data)
+
+    return resources, diagnoses
 
-                physician_initials_list = [
-                    diagnosis_doc.to_dict().get("physicianInitials", "")
-                    for diagnosis_doc in diagnosis_docs
-                ]
-                observation_data["NumberOfReviewers"] = len(physician_initials_list)
-                observation_data["Reviewers"] = physician_initials_list
-                observation_data["ReviewStatus"] = (
-                    "Incomplete review"
-                    if observation_data["NumberOfReviewers"] < 3
-                    else "Complete review"
-                )
 
-                # Add new columns from diagnosis documents
-                for i, diagnosis_doc in enumerate(diagnosis_docs):
-                    doc_data = diagnosis_doc.to_dict()
-                    for key, value in doc_data.items():
-                        col_name = f"Diagnosis{i+1}_{key}"
-                        new_columns.add(col_name)
-                        observation_data[col_name] = value
+def fetch_diagnosis_data(  # pylint: disable=too-many-arguments, too-many-positional-arguments, too-many-locals
+    db: "Client",
+    input_df: pd.DataFrame,
+    collection_name=USERS_COLLECTION,
+    subcollection_name=ECG_DATA_SUBCOLLECTION,
+    return_diagnoses: bool = False,
+    max_workers: int = 1,
+    failed_users: list[str] | None = None,
+) -> pd.DataFrame | tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Fetch diagnosis data from the Firestore database and extend the input DataFrame with new
+    columns, including a 'Symptoms' column.
 
-                resources.append(observation_data)
+    The reviews are collected in a diagnoses table indexed by (ResourceId, ReviewIndex). Unless
+    the table is returned, it is joined onto the DataFrame as 'Diagnosis{i}_{key}' columns in a
+    deterministic order.
 
+    Args:
+        db (Client): Firestore database client.
+        input_df (pd.DataFrame): Input DataFrame to be extended.
+        collection_name (str, optional): Name of the main collection. Defaults to USERS_COLLECTION.
+        subcollection_name (str, optional): Name of the subcollection. Defaults to
+            ECG_DATA_SUBCOLLECTION.
+        return_diagnoses (bool, optional): If True, the diagnoses table is returned instead of
+            being joined onto the DataFrame. Defaults to False.
+        max_workers (int, optional): Number of users fetched concurrently. Defaults to 1.
+        failed_users (list[str] | None, optional): If given, the IDs of the users whose data
+            could not be fetched are appended to it. Defaults to None.
+
+    Returns:
+        pd.DataFrame | tuple[pd.DataFrame, pd.DataFrame]: Extended DataFrame containing the
+            fetched review status and symptoms, and the diagnoses table if return_diagnoses is
+            True.
+    """
+    user_ids = [user_doc.id for user_doc in db.collection(collection_name).stream()]
+
+    def fetch_user(user_id: str) -> tuple[list[dict], list[dict]] | Exception:
+        try:
+            return _fetch_user_ecg_reviews(
+                db, user_id, collection_name, subcollection_name
+            )
         except Exception as e:  # pylint: disable=broad-exception-caught
-            print(f"An error occurred while processing user {user_id}: {str(e)}")
+            return e
+
+    resources = []
+    diagnoses = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for user_id, result in zip(user_ids, executor.map(fetch_user, user_ids)):
+            if isinstance(result, Exception):
+                print(f"An error occurred while processing user {user_id}: {result}")
+                if failed_users is not None:
+                    failed_users.append(user_id)
+                continue
+            resources.extend(result[0])
+            diagnoses.extend(result[1])
 
     fetched_df = pd.DataFrame(resources)
 
@@ -243,7 +560,7 @@ def fetch_diagnosis_data(  # pylint: disable=too-many-locals, too-many-branches
         "Reviewers",
         "ReviewStatus",
         "Symptoms",
-    ] + list(new_columns)
+    ]
 
     fetched_df = fetched_df.reindex(
         columns=columns, fill_value=None
@@ -258,23 +575,27 @@ def fetch_diagnosis_data(  # pylint: disable=too-many-locals, too-many-branches
         "ReviewStatus",
         "EffectiveDateTimeHHMM",
         "Symptoms",
-    ] + list(new_columns)
+    ]
 
     for col in additional_columns:
         if col not in extended_df.columns:
             extended_df[col] = None
 
-    for index, row in extended_df.iterrows():
-        resource_id = row[ColumnNames.RESOURCE_ID.value]
-        fetched_row = fetched_df[
-            fetched_df[ColumnNames.RESOURCE_ID.value] == resource_id
-        ]
-        if not fetched_row.empty:
+    # Look up the fetched rows through an index on ResourceId, keeping the first match
+    fetched_by_id = fetched_df.drop_duplicates(
+        subset=ColumnNames.RESOURCE_ID.value
+    ).set_index(ColumnNames.RESOURCE_ID.value, drop=False)
+
+    for index, resource_id in extended_df[ColumnNames.RESOURCE_ID.value].items():
+        if resource_id in fetched_by_id.index:
+            fetched_row = fetched_by_id.loc[resource_id]
             for col in additional_columns:
-                if col in fetched_row.columns:
-                    extended_df.at[index, col] = fetched_row[col].values[0]
+                extended_df.at[index, col] = fetched_row[col]
 
-    return extended_df
+    diagnoses_df = build_diagnoses_table(diagnoses)
+    if return_diagnoses:
+        return extended_df, diagnoses_df
+    return attach_diagnoses(extended_df, diagnoses_df)
 
 
 def convert_string_to_list_of_floats(s: str) -> list[float]:
@@ -304,12 +625,19 @@ def divide_list_by_1000(float_list):
     return [x / 1000 for x in float_list]
 
 
-def split_ecg_recording_in_10sec_parts(df: pd.DataFrame) -> pd.DataFrame:
+def split_ecg_recording_in_10sec_parts(
+    df: pd.DataFrame,
+    sampling_rate: float | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> pd.DataFrame:
     """
     Split ECG recordings into three parts of 10 seconds each.
 
     Args:
         df (pd.DataFrame): DataFrame with ECG data.
+        sampling_rate (float | None): If given, all recordings are first resampled to this
+            sampling rate in Hz, see `modules.resampling` (default is None).
+        chunk_size (int): Maximum number of recordings split at once (default is 2048).
 
     Returns:
         pd.DataFrame: DataFrame with split ECG recordings.
@@ -324,30 +652,26 @@ def split_ecg_recording_in_10sec_parts(df: pd.DataFrame) -> pd.DataFrame:
         ColumnNames.SAMPLING_FREQUENCY.value
     ].astype(float)
 
-    def split_into_three_parts(recording, sampling_frequency):
-        samples_per_10s = int(sampling_frequency * 10)
-
-        part1 = recording[:samples_per_10s] + [np.nan] * (
-            samples_per_10s - len(recording[:samples_per_10s])
-        )
-        part2 = recording[samples_per_10s : samples_per_10s * 2] + [np.nan] * (
-            samples_per_10s - len(recording[samples_per_10s : samples_per_10s * 2])
-        )
-        part3 = recording[samples_per_10s * 2 : samples_per_10s * 3] + [np.nan] * (
-            samples_per_10s - len(recording[samples_per_10s * 2 : samples_per_10s * 3])
-        )
-
-        return part1, part2, part3
+    # Resample recordings of different watch models and firmware to one canonical rate
+    if sampling_rate is not None:
+        df = resample_recordings(df, sampling_rate, chunk_size=chunk_size)
 
-    df[["ECGDataRecording1", "ECGDataRecording2", "ECGDataRecording3"]] = df.apply(
-        lambda row: pd.Series(
-            split_into_three_parts(
-                row[ColumnNames.ECG_RECORDING.value],
-                row[ColumnNames.SAMPLING_FREQUENCY.value],
+    # Window every batch of recordings into the three NaN-padded 10-second parts
+    parts = {
+        column: pd.Series(None, index=df.index, dtype=object)
+        for column in ECG_PART_COLUMNS
+    }
+    for sampling_frequency, index, matrix in iter_waveform_batches(
+        df, chunk_size=chunk_size, dtype=np.float64
+    ):
+        windows = window_waveforms(matrix, sampling_frequency, TEN_SECOND_PARTS)
+        for part, column in enumerate(ECG_PART_COLUMNS):
+            parts[column].loc[index] = pd.Series(
+                windows[:, part].tolist(), index=index, dtype=object
             )
-        ),
-        axis=1,
-    )
+
+    for column in ECG_PART_COLUMNS:
+        df[column] = parts[column]
 
     return df
 
@@ -356,23 +680,23 @@ def prioritize_abnormal_recordings(df: pd.DataFrame) -> pd.DataFrame:
     """
     Prioritize abnormal ECG recordings by placing them at the top of the DataFrame.
 
+    Only the classification severity is weighted; `prioritize_recordings` in
+    `modules.priority` also weights the symptoms, age group, reviews, and signal quality.
+
     Args:
         df (pd.DataFrame): DataFrame with ECG data.
 
     Returns:
         pd.DataFrame: Sorted DataFrame with abnormal recordings at the top.
     """
-    df["Priority"] = (
-        df[ColumnNames.APPLE_ELECTROCARDIOGRAM_CLASSIFICATION.value] != "sinusRhythm"
-    ).astype(int)
-
-    sorted_df = df.sort_values(by="Priority", ascending=False)
-    sorted_df = sorted_df.drop(columns=["Priority"])
-    return sorted_df
+    return prioritize_recordings(
+        df,
+        {key.value: 0.0 for key in PriorityKeys if key != PriorityKeys.SEVERITY},
+    )
 
 
 def fetch_users_list(
-    db: Client, collection_name: str = USERS_COLLECTION
+    db: "Client", collection_name: str = USERS_COLLECTION
 ) -> pd.DataFrame:
     """
     Fetches the list of users from the Firestore database and returns it as a DataFrame.
@@ -437,6 +761,51 @@ def merge_dataframes_on_userid(df1: pd.DataFrame, df2: pd.DataFrame) -> pd.DataF
     return merged_df
 
 
+def export_database(
+    data: pd.DataFrame,
+    filename: str = "database",
+    output_format: ExportFormat = ExportFormat.CSV,
+) -> str:
+    """
+    Exports the processed data to a timestamped file.
+
+    Parameters:
+    data : pd.DataFrame
+        The processed data DataFrame.
+    filename : str, optional
+        The base filename for the exported file (default is "database").
+    output_format : ExportFormat, optional
+        The file format (default is ExportFormat.CSV). Parquet requires pyarrow or fastparquet,
+        and pickle keeps the waveform arrays and dtypes for later processing in Python.
+
+    Returns:
+    str
+        The path of the exported file.
+    """
+    if REVIEWERS in data.columns:
+        # Export the reviewers as lists of initials, also if they were compacted
+        data = data.assign(
+            **{
+                REVIEWERS: pd.Series(
+                    [reviewer_list(value) for value in data[REVIEWERS]],
+                    index=data.index,
+                    dtype=object,
+                )
+            }
+        )
+
+    datetime_str = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    path = f"{filename}_{datetime_str}.{output_format.value}"
+
+    if output_format is ExportFormat.PARQUET:
+        data.to_parquet(path, index=False)
+    elif output_format is ExportFormat.PICKLE:
+        data.to_pickle(path)
+    else:
+        data.to_csv(path, index=False)
+    return path
+
+
 def export_database_in_csv(
     data: pd.DataFrame,
     filename: str = "database",
@@ -459,12 +828,8 @@ def export_database_in_csv(
         The final merged DataFrame with user and diagnosis details.
     """
 
-    current_datetime = datetime.now()
-    datetime_str = current_datetime.strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"{filename}_{datetime_str}.csv"
-
     output_database = add_age_group_column(data)
-    output_database.to_csv(filename, index=False)
+    export_database(output_database, filename, ExportFormat.CSV)
 
 
 def add_age_group_column(users_df: pd.DataFrame) -> pd.DataFrame:
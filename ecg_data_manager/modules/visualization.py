@@ -6,6 +6,8 @@
 # SPDX-License-Identifier: MIT
 #
 
+# pylint: disable=too-many-lines
+
 """
 This module provides classes and functions for viewing, filtering, and analyzing ECG data. The
 primary class, ECGDataViewer, allows users to interact with  ECG data through a graphical interface,
@@ -14,29 +16,49 @@ enabling the review, diagnosis, and visualization of ECG recordings.
 
 # Standard library imports
 from enum import Enum
-from math import ceil
 import datetime
 from functools import partial
+import threading
+from itertools import count
 
 # Related third-party imports
 import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
 import ipywidgets as widgets
 from ipywidgets import Layout
 from IPython.display import display, clear_output
-from matplotlib.ticker import AutoMinorLocator
+from google.api_core.exceptions import GoogleAPIError
 from google.cloud.firestore_v1.client import Client
-from google.cloud.exceptions import GoogleCloudError
 
 # Local application/library specific imports
 from spezi_data_pipeline.data_flattening.fhir_resources_flattener import ColumnNames
+from .assignment import ReviewScheduler
+from .compaction import has_reviewer, reviewer_list, set_reviewers
+from .diagnoses import DiagnosisFields, reviews_of
+from .duplicates import DuplicateColumns
+from .features import RhythmFeatures
+from .figure_cache import FigureCache
+from .filtering import FILTERED_PART_COLUMNS, with_filtered_parts
+from .live_updates import ADDED, ReviewStatusListener
+from .priority import PriorityEngine
+from .quality import SignalQuality
+from .review_journal import ReviewJournal
+from .similarity import SimilarityColumns, SimilarityIndex
+from .waveforms import WindowSpec
+from .write_queue import DiagnosisWriteQueue, WriteResult, WriteStatus
+from .plotting import (  # pylint: disable=unused-import
+    EFFECTIVE_DATE_TIME_HHMM,
+    PlotParams,
+    plot_ecg_parts,
+    plot_single_lead_ecg,
+)
 
 USERS_COLLECTION = "users"
 ECG_DATA_SUBCOLLECTION = "HealthKit"
 DIAGNOSIS_DATA_SUBCOLLECTION = "Diagnosis"
 AGE_GROUP_STRING = "AgeGroup"
 SINUS_RHYTHM = "sinusRhythm"
+SIMILAR_RECORDINGS_COUNT = 5
 
 
 class DiagnosisKeyNames(Enum):
@@ -74,6 +96,11 @@ class WidgetStrings(Enum):
         "Please select valid initials from the list or enter your initials."
     )
     USER_NOT_FOUND = "User not found"
+    SHOW_FILTERED = "Show filtered waveforms"
+    SYNC_REVIEWS = "SYNC REVIEWS"
+    FIND_SIMILAR = "FIND SIMILAR"
+    NO_SIMILAR = "No complete beat found to search for similar recordings."
+    DUPLICATE_OF = "Duplicate upload of {}, showing the recordings similar to it."
 
 
 class TracingQuality(Enum):
@@ -103,57 +130,135 @@ class Diagnoses(Enum):
     OTHER = "Other"
 
 
-class PlotParams(Enum):
+def display_ecg_parts(
+    row: pd.Series,
+    date_column: str = EFFECTIVE_DATE_TIME_HHMM,
+    figure_cache: FigureCache | None = None,
+    filtered: bool = False,
+    window: WindowSpec | None = None,
+):
     """
-    Enumerates parameters for plotting ECG signals."""
+    Display the panel figure of an ECG recording, served from the cache if available.
 
-    LWIDTH = 0.5
-    AMPLITUTE_ECG = 1.8
-    TIME_TICKS = 0.2
-    ECG_UNIT = "uV"
-    TIME_UNIT = "sec"
-    FIG_WIDTH = 15
-    FIG_HEIGHT = 2
+    Args:
+        row (pd.Series): The row of the DataFrame containing the ECG data.
+        date_column (str): Column used for the recording date in the panel titles.
+        figure_cache (FigureCache | None): Cache to serve the figure from (default is None).
+        filtered (bool): If True, the filtered waveforms are shown if they are available
+            (default is False).
+        window (WindowSpec | None): Windows of the recording shown as panels (default is None,
+            which shows the three 10-second parts).
+    """
+    if filtered and all(column in row.index for column in FILTERED_PART_COLUMNS):
+        row = with_filtered_parts(row)
+
+    if figure_cache is None:
+        plot_ecg_parts(row, date_column=date_column, window=window)
+        plt.show()
+    else:
+        display(
+            widgets.Image(
+                value=figure_cache.get_or_render(
+                    row, date_column=date_column, window=window
+                ),
+                format="png",
+            )
+        )
 
 
-class ECGDataViewer:  # pylint: disable=too-many-instance-attributes
+class ECGDataViewer:  # pylint: disable=too-many-instance-attributes, too-many-public-methods
     """
     A class to view and interact with ECG data.
 
     Attributes:
         df_ecg (pd.DataFrame): DataFrame containing the ECG data.
         db: Database connection instance.
+        figure_cache (FigureCache | None): Optional cache serving previously rendered figures.
+        write_queue (DiagnosisWriteQueue): Queue committing diagnoses in the background.
+        review_journal (ReviewJournal | None): Local journal recording diagnoses in offline
+            mode.
+        review_listener (ReviewStatusListener | None): Listener applying reviews saved by
+            others to `df_ecg` in live mode.
+        scheduler (ReviewScheduler | None): Scheduler leasing recordings to reviewers.
+        priority_engine (PriorityEngine | None): Engine ranking the recordings of `df_ecg`,
+            re-ranked as reviews land.
+        window (WindowSpec | None): Windows of the recordings shown as panels.
     """
 
-    def __init__(self, df_ecg: pd.DataFrame, db: Client):
+    def __init__(  # pylint: disable=too-many-arguments, too-many-positional-arguments
+        self,
+        df_ecg: pd.DataFrame,
+        db: Client,
+        figure_cache: FigureCache | None = None,
+        write_queue: DiagnosisWriteQueue | None = None,
+        review_journal: ReviewJournal | None = None,
+        live_updates: bool = False,
+        scheduler: ReviewScheduler | None = None,
+        priority_engine: PriorityEngine | None = None,
+        window: WindowSpec | None = None,
+    ):
         """
         Initialize the ECGDataViewer with the given ECG DataFrame and database connection.
 
         Args:
             df_ecg (pd.DataFrame): DataFrame containing the ECG data.
             db: Database connection instance.
+            figure_cache (FigureCache | None): Optional cache serving previously rendered
+                figures (default is None, which renders every figure).
+            write_queue (DiagnosisWriteQueue | None): Queue committing diagnoses in the
+                background (default is None, which creates one for `db`).
+            review_journal (ReviewJournal | None): If given, diagnoses are recorded in this
+                local journal and written to Firestore with the sync button (default is None,
+                which writes every diagnosis directly).
+            live_updates (bool): If True, reviews saved by other physicians are applied to the
+                ECG data as they happen (default is False).
+            scheduler (ReviewScheduler | None): If given, recordings are leased to reviewers by
+                the scheduler instead of every reviewer going through the same list (default is
+                None).
+            priority_engine (PriorityEngine | None): If given, recordings are shown in the
+                order of this engine created from `df_ecg`, which re-ranks a recording when a
+                review lands (default is None, which keeps the order of `df_ecg`).
+            window (WindowSpec | None): Windows of the recordings shown as panels, e.g.,
+                WindowSpec(5.0) for 5-second panels (default is None, which shows the three
+                10-second parts).
         """
         self.db = db
         self.df_ecg = df_ecg
+        self.figure_cache = figure_cache
+        self.write_queue = write_queue or DiagnosisWriteQueue(db)
+        self.review_journal = review_journal
+        self.current_resource_id = None
+        self.scheduler = scheduler
+        self.priority_engine = priority_engine
+        self.window = window
+        self.current_lease = None
         self.filtered_data = pd.DataFrame()
         self.plot_counter = 0
         self.ecg_output = widgets.Output()
         self.message_output = widgets.Output()
         self.error_output = widgets.Output()
         self.unreviewed_message_widget = widgets.HTML()
+        # Held by every change of df_ecg and the widgets, which the write queue and the
+        # listener make from their threads
+        self._lock = threading.RLock()
         self.setup_widgets()
         self.display_widgets()
 
+        self.review_listener = None
+        if live_updates:
+            self.review_listener = ReviewStatusListener(
+                db, df_ecg, on_change=self.on_reviews_changed, lock=self._lock
+            ).start()
+
     def setup_widgets(self):
         """
         Set up the initial widgets for the viewer.
         """
-        unique_initials = (
-            pd.Series(self.df_ecg[DiagnosisKeyNames.REVIEWERS.value].explode())
-            .dropna()
-            .astype(str)
-            .unique()
-        )
+        unique_initials = {
+            initials
+            for reviewers in self.df_ecg[DiagnosisKeyNames.REVIEWERS.value]
+            for initials in reviewer_list(reviewers)
+        }
         initials_options = (
             [WidgetStrings.SELECT.value]
             + sorted(unique_initials)
@@ -178,6 +283,88 @@ class ECGDataViewer:  # pylint: disable=too-many-instance-attributes
         )
         self.load_more_button.on_click(self.load_more_ecg)
 
+        self.sync_button = widgets.Button(
+            description=WidgetStrings.SYNC_REVIEWS.value,
+            button_style="warning",
+            icon="refresh",
+            layout=Layout(width="200px", height="50px"),
+        )
+        if self.review_journal is None:
+            self.sync_button.layout.visibility = "hidden"
+        self.sync_button.on_click(self.sync_reviews)
+
+        self.filtered_checkbox = widgets.Checkbox(
+            value=False, description=WidgetStrings.SHOW_FILTERED.value
+        )
+        if not all(column in self.df_ecg.columns for column in FILTERED_PART_COLUMNS):
+            self.filtered_checkbox.layout.visibility = "hidden"
+        self.filtered_checkbox.observe(self.on_filtered_change, names="value")
+
+    def on_filtered_change(self, change):  # pylint: disable=unused-argument
+        """
+        Redraw the current ECG recording when switching between raw and filtered waveforms.
+
+        Args:
+            change: The change event from the checkbox widget.
+        """
+        with self._lock:
+            if self.current_lease is not None:
+                self.plot_recording(self.current_lease[0])
+            elif self.plot_counter > 0:
+                self.plot_counter -= 1
+                self.plot_ecg_data()
+
+    def on_reviews_changed(self, resource_ids):
+        """
+        Refresh the reviewer queue after reviews changed in live mode.
+
+        Args:
+            resource_ids (set): The ResourceIds of the recordings whose reviews changed.
+        """
+        with self._lock:
+            for resource_id in resource_ids:
+                reviewers = self.df_ecg.loc[
+                    self.df_ecg[ColumnNames.RESOURCE_ID.value] == resource_id,
+                    DiagnosisKeyNames.REVIEWERS.value,
+                ]
+                if reviewers.empty:
+                    continue
+                if self.scheduler is not None:
+                    self.scheduler.update_reviews(
+                        resource_id, reviewer_list(reviewers.iloc[0])
+                    )
+                if self.priority_engine is not None:
+                    self.priority_engine.update_reviews(
+                        resource_id, len(reviewer_list(reviewers.iloc[0]))
+                    )
+
+            if self.initials_dropdown.value != WidgetStrings.SELECT.value:
+                self.update_unreviewed_message()
+
+            if self.current_resource_id in resource_ids:
+                status = self.df_ecg.loc[
+                    self.df_ecg[ColumnNames.RESOURCE_ID.value]
+                    == self.current_resource_id,
+                    DiagnosisKeyNames.REVIEW_STATUS.value,
+                ]
+                if (status == "Complete review").any():
+                    with self.message_output:
+                        clear_output()
+                        display(
+                            widgets.HTML(
+                                value="<b style='color: orange; font-size: large;'>This ECG "
+                                "has been reviewed three times in the meantime.</b>"
+                            )
+                        )
+
+    def stop_live_updates(self):
+        """
+        Stop applying reviews saved by others to the ECG data.
+        """
+        if self.review_listener is not None:
+            self.review_listener.stop()
+            self.review_listener = None
+
     def on_initials_change(self, change):
         """
         Handle changes in the initials dropdown widget.
@@ -206,11 +393,12 @@ class ECGDataViewer:  # pylint: disable=too-many-instance-attributes
         display(
             self.initials_dropdown,
             self.initials_textarea,
+            self.filtered_checkbox,
             self.unreviewed_message_widget,
             self.ecg_output,
             self.message_output,
             self.error_output,
-            self.load_more_button,
+            widgets.HBox([self.load_more_button, self.sync_button]),
         )
 
     def clear_outputs(self):
@@ -226,20 +414,21 @@ class ECGDataViewer:  # pylint: disable=too-many-instance-attributes
         """
         Update the message widget with the number of unreviewed ECGs.
         """
-        initials = (
-            self.initials_textarea.value.strip()
-            if self.initials_dropdown.value == WidgetStrings.OTHER.value
-            else self.initials_dropdown.value
-        )
-        self.apply_filters(
-            initials
-        )  # Apply filters to determine the number of unreviewed ECGs
-        total_unreviewed = len(self.filtered_data)
-        message = (
-            f"<b style='font-size: large;'>Total unreviewed recordings for "
-            f"{initials}: {total_unreviewed}</b>"
-        )
-        self.unreviewed_message_widget.value = message
+        with self._lock:
+            initials = (
+                self.initials_textarea.value.strip()
+                if self.initials_dropdown.value == WidgetStrings.OTHER.value
+                else self.initials_dropdown.value
+            )
+            self.apply_filters(
+                initials
+            )  # Apply filters to determine the number of unreviewed ECGs
+            total_unreviewed = len(self.filtered_data)
+            message = (
+                f"<b style='font-size: large;'>Total unreviewed recordings for "
+                f"{initials}: {total_unreviewed}</b>"
+            )
+            self.unreviewed_message_widget.value = message
 
     def load_more_ecg(self, b=None):  # pylint: disable=unused-argument
         """
@@ -248,53 +437,103 @@ class ECGDataViewer:  # pylint: disable=too-many-instance-attributes
         Args:
             b: Button click event (default is None).
         """
-        initials = (
-            self.initials_textarea.value.strip()
-            if self.initials_dropdown.value == WidgetStrings.OTHER.value
-            else self.initials_dropdown.value
-        )
-        if initials == WidgetStrings.SELECT.value:
-            with self.error_output:
-                clear_output()
-                print(WidgetStrings.MISSING_INITIALS.value)
-            return
+        with self._lock:
+            initials = (
+                self.initials_textarea.value.strip()
+                if self.initials_dropdown.value == WidgetStrings.OTHER.value
+                else self.initials_dropdown.value
+            )
+            if initials == WidgetStrings.SELECT.value:
+                with self.error_output:
+                    clear_output()
+                    print(WidgetStrings.MISSING_INITIALS.value)
+                return
 
-        self.update_unreviewed_message()
-        if self.plot_counter < len(self.filtered_data):
-            self.plot_ecg_data()
-        else:
-            with self.message_output:
-                clear_output()
-                display(
-                    widgets.HTML(
-                        value="<b style='color: green; font-size: 22px;'>No more ECG data "
-                        "to review.✓</b>"
-                    )
+            self.update_unreviewed_message()
+            if self.scheduler is not None:
+                self.plot_next_scheduled_ecg(initials)
+            elif self.plot_counter < len(self.filtered_data):
+                self.plot_ecg_data()
+            else:
+                self.display_no_more_ecg()
+
+    def display_no_more_ecg(self):
+        """
+        Display that there are no more ECG recordings to review.
+        """
+        with self.message_output:
+            clear_output()
+            display(
+                widgets.HTML(
+                    value="<b style='color: green; font-size: 22px;'>No more ECG data "
+                    "to review.✓</b>"
                 )
+            )
+
+    def plot_next_scheduled_ecg(self, initials):
+        """
+        Return the current lease and plot the next recording leased by the scheduler.
+
+        Args:
+            initials (str): The initials of the reviewer.
+        """
+        if self.current_lease is not None:
+            self.scheduler.release(*self.current_lease)
+            self.current_lease = None
+
+        resource_id = self.scheduler.next_for(initials)
+        if resource_id is None:
+            self.ecg_output.clear_output()
+            self.display_no_more_ecg()
+            return
+
+        self.current_lease = (resource_id, initials)
+        self.plot_recording(resource_id)
+
+    def plot_recording(self, resource_id):
+        """
+        Plot a recording and its diagnosis widgets by ResourceId.
+
+        Args:
+            resource_id (str): The ResourceId of the recording.
+        """
+        row = self.df_ecg[
+            self.df_ecg[ColumnNames.RESOURCE_ID.value] == resource_id
+        ].iloc[0]
+        with self.ecg_output:
+            clear_output(wait=True)
+            self.current_resource_id = resource_id
+            self.plot_single_ecg(row)
+            self.create_diagnosis_widgets(row[ColumnNames.USER_ID.value], resource_id)
 
     def apply_filters(self, initials):
         """
-        Apply filters to the ECG data based on the review status and initials.
+        Apply filters to the ECG data based on the review status and initials. Duplicate
+        uploads are skipped, so only their canonical recording is reviewed.
 
         Args:
             initials (str): The initials to filter by.
         """
+        df_ecg = self.df_ecg
+        if DuplicateColumns.IS_DUPLICATE.value in df_ecg.columns:
+            df_ecg = df_ecg[
+                ~df_ecg[DuplicateColumns.IS_DUPLICATE.value].fillna(False).astype(bool)
+            ]
+
         if self.initials_dropdown.value == WidgetStrings.OTHER.value:
-            self.filtered_data = self.df_ecg[
-                self.df_ecg[DiagnosisKeyNames.REVIEW_STATUS.value]
-                == "Incomplete review"
+            self.filtered_data = df_ecg[
+                df_ecg[DiagnosisKeyNames.REVIEW_STATUS.value] == "Incomplete review"
             ]
         else:
-            self.filtered_data = self.df_ecg[
-                (
-                    self.df_ecg[DiagnosisKeyNames.REVIEW_STATUS.value]
-                    == "Incomplete review"
-                )
-                & (
-                    self.df_ecg[DiagnosisKeyNames.REVIEWERS.value].apply(
-                        lambda x: initials not in x
-                    )
-                )
+            self.filtered_data = df_ecg[
+                (df_ecg[DiagnosisKeyNames.REVIEW_STATUS.value] == "Incomplete review")
+                & ~has_reviewer(df_ecg[DiagnosisKeyNames.REVIEWERS.value], initials)
+            ]
+
+        if self.priority_engine is not None:
+            ranks = self.priority_engine.ranks().reindex(self.filtered_data.index)
+            self.filtered_data = self.filtered_data.iloc[
+                ranks.to_numpy().argsort(kind="stable")
             ]
 
     def plot_ecg_data(self):
@@ -307,6 +546,7 @@ class ECGDataViewer:  # pylint: disable=too-many-instance-attributes
             for _, row in self.filtered_data.iloc[
                 self.plot_counter : self.plot_counter + onscreen_plots
             ].iterrows():
+                self.current_resource_id = row[ColumnNames.RESOURCE_ID.value]
                 self.plot_single_ecg(row)
                 self.create_diagnosis_widgets(
                     row[ColumnNames.USER_ID.value], row[ColumnNames.RESOURCE_ID.value]
@@ -320,32 +560,19 @@ class ECGDataViewer:  # pylint: disable=too-many-instance-attributes
         Args:
             row (pd.Series): The row of the DataFrame containing the ECG data.
         """
-        _, axs = plt.subplots(3, 1, figsize=(14, 5), constrained_layout=True)
-
-        for i, key in enumerate(
-            ["ECGDataRecording1", "ECGDataRecording2", "ECGDataRecording3"]
-        ):
-            title = f"ECG part {i+1} recorded on {row['EffectiveDateTimeHHMM']}"
-            plot_single_lead_ecg(
-                row[key],
-                sample_rate=row[ColumnNames.SAMPLING_FREQUENCY.value],
-                title=title,
-                ax=axs[i],
-            )
-
         user_id = (
             row[ColumnNames.USER_ID.value]
-            if row[ColumnNames.USER_ID.value] is not None
+            if pd.notna(row[ColumnNames.USER_ID.value])
             else "Unknown"
         )
         heart_rate = (
             int(row[ColumnNames.HEART_RATE.value])
-            if row[ColumnNames.HEART_RATE.value] is not None
+            if pd.notna(row[ColumnNames.HEART_RATE.value])
             else "Unknown"
         )
         ecg_interpretation = (
             row[ColumnNames.APPLE_ELECTROCARDIOGRAM_CLASSIFICATION.value]
-            if row[ColumnNames.APPLE_ELECTROCARDIOGRAM_CLASSIFICATION.value] is not None
+            if pd.notna(row[ColumnNames.APPLE_ELECTROCARDIOGRAM_CLASSIFICATION.value])
             else "Unknown"
         )
 
@@ -380,39 +607,91 @@ class ECGDataViewer:  # pylint: disable=too-many-instance-attributes
 
         display(user_id_html, heart_rate_html, symptoms_html, interpretation_html)
 
-        # Add review status
-        diagnosis_collection_ref = (
-            self.db.collection(USERS_COLLECTION)
-            .document(user_id)
-            .collection(ECG_DATA_SUBCOLLECTION)
-            .document(row[ColumnNames.RESOURCE_ID.value])
-            .collection(DIAGNOSIS_DATA_SUBCOLLECTION)
-        )
-        diagnosis_docs = list(diagnosis_collection_ref.stream())
-        num_diagnosis_docs = len(diagnosis_docs)
+        # Add review status, in offline mode without reading Firestore
+        if self.review_journal is not None:
+            reviews = self.local_reviews(row)
+        else:
+            diagnosis_collection_ref = (
+                self.db.collection(USERS_COLLECTION)
+                .document(user_id)
+                .collection(ECG_DATA_SUBCOLLECTION)
+                .document(row[ColumnNames.RESOURCE_ID.value])
+                .collection(DIAGNOSIS_DATA_SUBCOLLECTION)
+            )
+            try:
+                reviews = [
+                    (
+                        doc.to_dict().get(
+                            DiagnosisKeyNames.PHYSICIAN_INITIALS.value, "N/A"
+                        ),
+                        doc.to_dict().get(
+                            DiagnosisKeyNames.DIAGNOSIS_DATE.value, "N/A"
+                        ),
+                    )
+                    for doc in diagnosis_collection_ref.stream()
+                ]
+            except GoogleAPIError:
+                reviews = self.local_reviews(row)
 
         diagnosis_status_html = widgets.HTML(
             value="<b style='font-size: larger;'>This recording has been reviewed "
-            f"{num_diagnosis_docs} times:</b>"
+            f"{len(reviews)} times:</b>"
         )
         display(diagnosis_status_html)
 
-        if num_diagnosis_docs != 0:
-            for doc in diagnosis_docs:
-                doc_data = doc.to_dict()
-                physician_initial = doc_data.get(
-                    DiagnosisKeyNames.PHYSICIAN_INITIALS.value, "N/A"
-                )
-                diagnosis_date = doc_data.get(
-                    DiagnosisKeyNames.DIAGNOSIS_DATE.value, "N/A"
+        for physician_initial, diagnosis_date in reviews:
+            reviewers_html = widgets.HTML(
+                value=f"<span style='font-size: larger;'>Physician: "
+                f"{physician_initial}, Date: {diagnosis_date}</span>"
+            )
+            display(reviewers_html)
+
+        display_ecg_parts(
+            row,
+            figure_cache=self.figure_cache,
+            filtered=self.filtered_checkbox.value,
+            window=self.window,
+        )
+
+    def local_reviews(self, row) -> list[tuple[str, str]]:
+        """
+        Return the reviews of an ECG recording known without a connection to Firestore.
+
+        The reviews fetched by `process_ecg_data` are complemented by the diagnoses in the
+        review journal and the reviews saved in this session. A reviewer is listed once.
+
+        Args:
+            row (pd.Series): The row of the DataFrame containing the ECG data.
+
+        Returns:
+            list[tuple[str, str]]: The initials and the diagnosis date of every review.
+        """
+        reviews = {}
+        for index in count(1):
+            initials_column = (
+                f"Diagnosis{index}_{DiagnosisKeyNames.PHYSICIAN_INITIALS.value}"
+            )
+            if initials_column not in row.index:
+                break
+            if pd.notna(row[initials_column]):
+                reviews.setdefault(
+                    row[initials_column],
+                    row.get(
+                        f"Diagnosis{index}_{DiagnosisKeyNames.DIAGNOSIS_DATE.value}",
+                        "N/A",
+                    ),
                 )
-                reviewers_html = widgets.HTML(
-                    value=f"<span style='font-size: larger;'>Physician: "
-                    f"{physician_initial}, Date: {diagnosis_date}</span>"
+        if self.review_journal is not None:
+            for diagnosis in self.review_journal.diagnoses_of(
+                row[ColumnNames.RESOURCE_ID.value]
+            ):
+                reviews.setdefault(
+                    diagnosis.get(DiagnosisKeyNames.PHYSICIAN_INITIALS.value, "N/A"),
+                    diagnosis.get(DiagnosisKeyNames.DIAGNOSIS_DATE.value, "N/A"),
                 )
-                display(reviewers_html)
-
-        plt.show()
+        for initials in reviewer_list(row.get(DiagnosisKeyNames.REVIEWERS.value)):
+            reviews.setdefault(initials, "N/A")
+        return list(reviews.items())
 
     def create_diagnosis_widgets(self, user_id, document_id):
         """
@@ -507,7 +786,7 @@ class ECGDataViewer:  # pylint: disable=too-many-instance-attributes
 
         return widgets_box
 
-    def save_diagnosis(  # pylint: disable=too-many-locals, too-many-arguments, too-many-positional-arguments
+    def save_diagnosis(  # pylint: disable=too-many-arguments, too-many-positional-arguments
         self,
         user_id,
         document_id,
@@ -515,10 +794,14 @@ class ECGDataViewer:  # pylint: disable=too-many-instance-attributes
         tracing_quality_dropdown,
         notes_textarea,
         message_output_specific,
-        b=None,  # pylint: disable=unused-argument
+        b=None,
     ):
         """
-        Save the diagnosis for an ECG recording.
+        Queue the diagnosis for an ECG recording and return immediately.
+
+        The write is committed in the background by the write queue, and the status message
+        changes from pending to saved or failed once it completes, so the reviewer can move on
+        to the next ECG in the meantime.
 
         Args:
             user_id (str): The user ID associated with the ECG recording.
@@ -527,7 +810,7 @@ class ECGDataViewer:  # pylint: disable=too-many-instance-attributes
             tracing_quality_dropdown (widgets.Dropdown): The dropdown widget for tracing quality.
             notes_textarea (widgets.Textarea): The textarea widget for notes.
             message_output_specific (widgets.Output): The output widget for messages.
-            b: Button click event (default is None).
+            b: The save button, disabled while the write is pending (default is None).
         """
         with message_output_specific:
             clear_output(wait=True)
@@ -549,13 +832,6 @@ class ECGDataViewer:  # pylint: disable=too-many-instance-attributes
 
                 return
 
-            user_ref = self.db.collection(USERS_COLLECTION).document(user_id)
-            recording_ref = user_ref.collection(ECG_DATA_SUBCOLLECTION).document(
-                document_id
-            )
-            diagnosis_ref = recording_ref.collection(DIAGNOSIS_DATA_SUBCOLLECTION)
-            num_diagnosis_docs = len(list(diagnosis_ref.stream()))
-
             new_diagnosis_data = {
                 DiagnosisKeyNames.PHYSICIAN_INITIALS.value: initials,
                 DiagnosisKeyNames.PHYSICIAN_DIAGNOSIS.value: diagnosis,
@@ -566,132 +842,141 @@ class ECGDataViewer:  # pylint: disable=too-many-instance-attributes
                 ),
             }
 
-            try:  # pylint: disable=too-many-nested-blocks
-                if num_diagnosis_docs < 3:
-                    diagnosis_doc_ref = diagnosis_ref.document()
-                    diagnosis_doc_ref.set(new_diagnosis_data)
-
-                    # Update the ecg_df using the document_id as index
-                    index = self.df_ecg.index[
-                        self.df_ecg[ColumnNames.RESOURCE_ID.value] == document_id
-                    ].tolist()
-                    if index:
-                        for idx in index:
-                            if idx in self.df_ecg.index:
-                                self.df_ecg.at[
-                                    idx, DiagnosisKeyNames.NUMBER_OF_REVIEWERS.value
-                                ] += 1
-                                if isinstance(
-                                    self.df_ecg.at[
-                                        idx, DiagnosisKeyNames.REVIEWERS.value
-                                    ],
-                                    list,
-                                ):
-                                    self.df_ecg.at[
-                                        idx, DiagnosisKeyNames.REVIEWERS.value
-                                    ].append(initials)
-                                    self.df_ecg.at[
-                                        idx, DiagnosisKeyNames.REVIEW_STATUS.value
-                                    ] = (
-                                        "Incomplete review"
-                                        if self.df_ecg.at[
-                                            idx,
-                                            DiagnosisKeyNames.NUMBER_OF_REVIEWERS.value,
-                                        ]
-                                        < 3
-                                        else "Complete review"
-                                    )
-
-                    data_saved_html = widgets.HTML(
+            if self.review_journal is not None:
+                self.review_journal.record(user_id, document_id, new_diagnosis_data)
+                self.record_review(document_id, initials)
+                if self.scheduler is not None:
+                    self.scheduler.complete(document_id, initials)
+                display(
+                    widgets.HTML(
                         value="<span style='color: green; font-size: 20px;'>Diagnosis "
-                        "saved successfully.✓</span>"
+                        "saved offline. Sync reviews when you are online.✓</span>"
                     )
-                    display(data_saved_html)
-                else:
-                    print(
-                        "ECG has already been reviewed. No further review is required."
-                    )
-
-            except GoogleCloudError as gce:
-                error_html = widgets.HTML(
-                    value="<span style='color: red; font-size: 20px;'>Error saving "
-                    f"diagnosis: {gce}</span>"
-                )
-                display(error_html)
-            except KeyError as ke:
-                error_html = widgets.HTML(
-                    value=f"<span style='color: red; font-size: 20px;'>Key error: {ke}</span>"
-                )
-                display(error_html)
-            except TypeError as te:
-                error_html = widgets.HTML(
-                    value=f"<span style='color: red; font-size: 20px;'>Type error: {te}</span>"
                 )
-                display(error_html)
+                return
 
+            status_html = widgets.HTML(
+                value="<span style='color: orange; font-size: 20px;'>Saving "
+                "diagnosis…</span>"
+            )
+            display(status_html)
 
-def _ax_plot(ax, x, y, secs):
-    """
-    Plot the ECG data on the given axis.
+        if b is not None:
+            b.disabled = True
 
-    Args:
-        ax (plt.Axes): The axis to plot on.
-        x (np.ndarray): The x values of the plot.
-        y (np.ndarray): The y values of the plot.
-        secs (float): The duration of the ECG recording in seconds.
-    """
-    ax.set_xticks(
-        np.arange(
-            0,
-            secs + PlotParams.TIME_TICKS.value,
-            PlotParams.TIME_TICKS.value,
-        )
-    )
-    ax.set_yticks(
-        np.arange(
-            -ceil(PlotParams.AMPLITUTE_ECG.value),
-            ceil(PlotParams.AMPLITUTE_ECG.value),
-            1.0,
+        self.write_queue.submit(
+            user_id,
+            document_id,
+            new_diagnosis_data,
+            on_done=partial(
+                self.on_diagnosis_saved, document_id, initials, status_html, b
+            ),
         )
-    )
 
-    ax.minorticks_on()
-    ax.xaxis.set_minor_locator(AutoMinorLocator(5))
-    ax.set_ylim(-PlotParams.AMPLITUTE_ECG.value, PlotParams.AMPLITUTE_ECG.value)
-    ax.set_xlim(0, secs)
+    def on_diagnosis_saved(  # pylint: disable=too-many-arguments, too-many-positional-arguments
+        self, document_id, initials, status_html, button, result: WriteResult
+    ):
+        """
+        Update the status message and the ECG data once a queued diagnosis write has completed.
 
-    ax.grid(which="major", linestyle="-", linewidth="0.5", color="red")
-    ax.grid(which="minor", linestyle="-", linewidth="0.5", color=(1, 0.7, 0.7))
+        Args:
+            document_id (str): The document ID of the ECG recording.
+            initials (str): The initials of the reviewer.
+            status_html (widgets.HTML): The status message of the write.
+            button (widgets.Button | None): The save button, re-enabled if the write failed.
+            result (WriteResult): The outcome of the write.
+        """
+        with self._lock:
+            if self.scheduler is not None:
+                if result.status == WriteStatus.SAVED:
+                    self.scheduler.complete(document_id, initials)
+                elif result.status == WriteStatus.ALREADY_REVIEWED:
+                    self.scheduler.close(document_id)
+
+            if result.status == WriteStatus.SAVED:
+                try:
+                    self.record_review(document_id, initials, result.diagnosis_id)
+                except (KeyError, TypeError) as error:
+                    status_html.value = (
+                        "<span style='color: red; font-size: 20px;'>Diagnosis saved, but the "
+                        f"review status could not be updated: {error!r}</span>"
+                    )
+                    return
+                status_html.value = (
+                    "<span style='color: green; font-size: 20px;'>Diagnosis "
+                    "saved successfully.✓</span>"
+                )
+            elif result.status == WriteStatus.ALREADY_REVIEWED:
+                status_html.value = (
+                    "<span style='font-size: 20px;'>ECG has already been reviewed. No further "
+                    "review is required.</span>"
+                )
+            else:
+                status_html.value = (
+                    "<span style='color: red; font-size: 20px;'>Error saving "
+                    f"diagnosis after {result.attempts} attempts: {result.error}</span>"
+                )
+                if button is not None:
+                    button.disabled = False
 
-    ax.plot(x, y, linewidth=PlotParams.LWIDTH.value)
+    def sync_reviews(self, b=None):  # pylint: disable=unused-argument
+        """
+        Write the diagnoses recorded offline to Firestore and report the outcome.
 
+        Args:
+            b: Button click event (default is None).
+        """
+        with self.message_output:
+            clear_output()
+            summary = self.review_journal.sync(self.db)
+            display(
+                widgets.HTML(
+                    value="<b style='font-size: large;'>Reviews synced: "
+                    f"{summary['synced']}, conflicts: {summary['conflict']}, "
+                    f"still pending: {summary['pending']}</b>"
+                )
+            )
 
-def plot_single_lead_ecg(
-    ecg: list | np.ndarray,
-    sample_rate: int = 500,
-    title: str = "ECG",
-    ax: plt.Axes | None = None,
-) -> None:
-    """
-    Plot a single lead ECG chart.
+    def record_review(self, document_id, initials, diagnosis_id=None):
+        """
+        Add a saved review to the number of reviewers, reviewers, and review status of an ECG.
 
-    Args:
-        ecg (list | np.ndarray): ECG signal data.
-        sample_rate (int): Sample rate of the signal.
-        title (str): Title to be shown on the chart.
-        ax (plt.Axes | None): The axis to plot on (default is None).
-    """
-    if ax is None:
-        plt.figure(figsize=(PlotParams.FIG_WIDTH.value, PlotParams.FIG_HEIGHT.value))
-        ax = plt.gca()
+        In live mode, the review is applied through the listener, keyed on its diagnosis ID,
+        so that the snapshot of the same review does not count it again. Otherwise, a reviewer
+        who is already listed is not added a second time.
 
-    ax.set_title(title)
-    ax.set_ylabel(PlotParams.ECG_UNIT.value)
-    ax.set_xlabel(PlotParams.TIME_UNIT.value)
-    seconds = len(ecg) / sample_rate
+        Args:
+            document_id (str): The document ID of the ECG recording.
+            initials (str): The initials of the reviewer.
+            diagnosis_id (str | None): The ID of the saved Diagnosis document (default is
+                None, e.g., for reviews recorded offline).
+        """
+        with self._lock:
+            if self.review_listener is not None and diagnosis_id is not None:
+                self.review_listener.apply_changes(
+                    [(document_id, diagnosis_id, initials, ADDED)]
+                )
+                return
 
-    step = 1.0 / sample_rate
-    _ax_plot(ax, np.arange(0, len(ecg) * step, step), ecg, seconds)
+            index = self.df_ecg.index[
+                self.df_ecg[ColumnNames.RESOURCE_ID.value] == document_id
+            ].tolist()
+            for idx in index:
+                reviewers = reviewer_list(
+                    self.df_ecg.at[idx, DiagnosisKeyNames.REVIEWERS.value]
+                )
+                if initials in reviewers:
+                    continue
+                reviewers.append(initials)
+                set_reviewers(self.df_ecg, idx, reviewers)
+                self.df_ecg.at[idx, DiagnosisKeyNames.NUMBER_OF_REVIEWERS.value] = len(
+                    reviewers
+                )
+                self.df_ecg.at[idx, DiagnosisKeyNames.REVIEW_STATUS.value] = (
+                    "Incomplete review" if len(reviewers) < 3 else "Complete review"
+                )
+                if self.priority_engine is not None:
+                    self.priority_engine.update_reviews(document_id, len(reviewers))
 
 
 class ECGDataExplorer:  # pylint: disable=too-many-instance-attributes
@@ -703,20 +988,50 @@ class ECGDataExplorer:  # pylint: disable=too-many-instance-attributes
         filtered_data (pd.DataFrame): The filtered ECG data.
         age_group_dropdown (widgets.Dropdown): Dropdown widget for selecting the age group.
         ecg_class_dropdown (widgets.Dropdown): Dropdown widget for selecting the ECG classification.
+        rhythm_dropdown (widgets.Dropdown): Dropdown widget for selecting the rhythm regularity.
+        quality_dropdown (widgets.Dropdown): Dropdown widget for selecting the signal quality.
         user_id_dropdown (widgets.Dropdown): Dropdown widget for selecting the user ID.
         date_time_dropdown (widgets.Dropdown): Dropdown widget for selecting the date and time.
+        filtered_checkbox (widgets.Checkbox): Checkbox widget for showing filtered waveforms.
         load_data_button (widgets.Button): Button widget for loading and plotting the data.
+        find_similar_button (widgets.Button): Button widget for plotting the recordings most
+            similar to the first selected recording.
         output (widgets.Output): Output widget for displaying the plots and information.
+        figure_cache (FigureCache | None): Optional cache serving previously rendered figures.
+        similarity_index (SimilarityIndex | None): Morphology search index, built on first use.
+        diagnoses (pd.DataFrame | None): Optional diagnoses table the reviews are looked up in.
+        window (WindowSpec | None): Windows of the recordings shown as panels.
+        redraw (Callable | None): Redraws the plots currently shown, e.g., when switching
+            between raw and filtered waveforms.
     """
 
-    def __init__(self, data):
+    def __init__(
+        self,
+        data,
+        figure_cache: FigureCache | None = None,
+        diagnoses: pd.DataFrame | None = None,
+        window: WindowSpec | None = None,
+    ):
         """
         Initializes the ECGDataExplorer with the given data and sets up the interactive widgets.
 
         Args:
             data (pd.DataFrame): The ECG data to be explored.
+            figure_cache (FigureCache | None): Optional cache serving previously rendered
+                figures (default is None, which renders every figure).
+            diagnoses (pd.DataFrame | None): Diagnoses table indexed by (ResourceId,
+                ReviewIndex), as returned by `process_ecg_data(..., return_diagnoses=True)`
+                (default is None, which reads the 'Diagnosis{i}_{key}' columns of the data).
+            window (WindowSpec | None): Windows of the recordings shown as panels, e.g.,
+                WindowSpec(2.0, hop_sec=1.0) for overlapping 2-second panels (default is None,
+                which shows the three 10-second parts).
         """
         self.data = data
+        self.figure_cache = figure_cache
+        self.diagnoses = diagnoses
+        self.window = window
+        self.similarity_index = None
+        self.redraw = None
         self.filtered_data = data.copy()
 
         self.age_group_dropdown = widgets.Dropdown(
@@ -735,6 +1050,22 @@ class ECGDataExplorer:  # pylint: disable=too-many-instance-attributes
             layout=widgets.Layout(padding="10px 0px 30px 40px"),
         )
 
+        self.rhythm_dropdown = widgets.Dropdown(
+            options=self.get_unique_values_with_all(
+                RhythmFeatures.RHYTHM_REGULARITY.value
+            ),
+            description="Rhythm",
+            value="All",
+            layout=widgets.Layout(padding="10px 0px 30px 40px"),
+        )
+
+        self.quality_dropdown = widgets.Dropdown(
+            options=self.get_unique_values_with_all(SignalQuality.LABEL.value),
+            description="Quality",
+            value="All",
+            layout=widgets.Layout(padding="10px 0px 30px 40px"),
+        )
+
         self.user_id_dropdown = widgets.Dropdown(
             options=self.get_unique_values_with_all(ColumnNames.USER_ID.value),
             description="User ID",
@@ -749,6 +1080,15 @@ class ECGDataExplorer:  # pylint: disable=too-many-instance-attributes
             layout=widgets.Layout(padding="10px 0px 40px 40px"),
         )
 
+        self.filtered_checkbox = widgets.Checkbox(
+            value=False,
+            description=WidgetStrings.SHOW_FILTERED.value,
+            layout=widgets.Layout(padding="0px 0px 20px 40px"),
+        )
+        if not all(column in self.data.columns for column in FILTERED_PART_COLUMNS):
+            self.filtered_checkbox.layout.visibility = "hidden"
+        self.filtered_checkbox.observe(self.on_filtered_change, names="value")
+
         self.load_data_button = widgets.Button(
             description="LOAD DATA+",
             button_style="success",
@@ -757,18 +1097,32 @@ class ECGDataExplorer:  # pylint: disable=too-many-instance-attributes
             ),
         )
 
+        self.find_similar_button = widgets.Button(
+            description=WidgetStrings.FIND_SIMILAR.value,
+            button_style="info",
+            layout=widgets.Layout(
+                width="200px", height="50px", padding="10px 40px 10px 40px"
+            ),
+        )
+
         self.age_group_dropdown.observe(self.filter_data, names="value")
         self.ecg_class_dropdown.observe(self.filter_data, names="value")
+        self.rhythm_dropdown.observe(self.filter_data, names="value")
+        self.quality_dropdown.observe(self.filter_data, names="value")
         self.user_id_dropdown.observe(self.filter_data, names="value")
         self.date_time_dropdown.observe(self.filter_data, names="value")
         self.load_data_button.on_click(self.plot_ecg_recording)
+        self.find_similar_button.on_click(self.plot_similar_recordings)
 
         display(
             self.age_group_dropdown,
             self.ecg_class_dropdown,
+            self.rhythm_dropdown,
+            self.quality_dropdown,
             self.user_id_dropdown,
             self.date_time_dropdown,
-            self.load_data_button,
+            self.filtered_checkbox,
+            widgets.HBox([self.load_data_button, self.find_similar_button]),
         )
 
         self.output = widgets.Output()
@@ -784,32 +1138,52 @@ class ECGDataExplorer:  # pylint: disable=too-many-instance-attributes
         Returns:
             list: A list of unique values with "All" as the first option.
         """
+        if column not in self.data.columns:
+            return ["All"]
         unique_values = self.data[column].astype(str).unique().tolist()
         unique_values.insert(0, "All")
         return unique_values
 
-    def filter_data(self, change=None):  # pylint: disable=unused-argument
+    def apply_category_filters(self, data):
         """
-        Filters the data based on the selected dropdown values and updates the dropdown options.
+        Filters the data by the selected age group, ECG classification, rhythm regularity, and
+        signal quality.
 
         Args:
-            change (dict, optional): The change event from the dropdown widgets. Defaults to None.
-        """
-        self.filtered_data = self.data.copy()
+            data (pd.DataFrame): The data to be filtered.
 
+        Returns:
+            pd.DataFrame: The rows matching all selected categories.
+        """
         if self.age_group_dropdown.value != "All":
-            self.filtered_data = self.filtered_data[
-                self.filtered_data[AGE_GROUP_STRING] == self.age_group_dropdown.value
-            ]
+            data = data[data[AGE_GROUP_STRING] == self.age_group_dropdown.value]
 
         if self.ecg_class_dropdown.value != "All":
-            self.filtered_data = self.filtered_data[
-                self.filtered_data[
-                    ColumnNames.APPLE_ELECTROCARDIOGRAM_CLASSIFICATION.value
-                ]
+            data = data[
+                data[ColumnNames.APPLE_ELECTROCARDIOGRAM_CLASSIFICATION.value]
                 == self.ecg_class_dropdown.value
             ]
 
+        if self.rhythm_dropdown.value != "All":
+            data = data[
+                data[RhythmFeatures.RHYTHM_REGULARITY.value]
+                == self.rhythm_dropdown.value
+            ]
+
+        if self.quality_dropdown.value != "All":
+            data = data[data[SignalQuality.LABEL.value] == self.quality_dropdown.value]
+
+        return data
+
+    def filter_data(self, change=None):  # pylint: disable=unused-argument
+        """
+        Filters the data based on the selected dropdown values and updates the dropdown options.
+
+        Args:
+            change (dict, optional): The change event from the dropdown widgets. Defaults to None.
+        """
+        self.filtered_data = self.apply_category_filters(self.data.copy())
+
         self.update_user_id_dropdown_options()
 
         if self.user_id_dropdown.value != "All":
@@ -843,20 +1217,7 @@ class ECGDataExplorer:  # pylint: disable=too-many-instance-attributes
         """
         Updates the options for the user ID dropdown based on the filtered data.
         """
-        filtered_for_user_ids = self.data.copy()
-
-        if self.age_group_dropdown.value != "All":
-            filtered_for_user_ids = filtered_for_user_ids[
-                filtered_for_user_ids[AGE_GROUP_STRING] == self.age_group_dropdown.value
-            ]
-
-        if self.ecg_class_dropdown.value != "All":
-            filtered_for_user_ids = filtered_for_user_ids[
-                filtered_for_user_ids[
-                    ColumnNames.APPLE_ELECTROCARDIOGRAM_CLASSIFICATION.value
-                ]
-                == self.ecg_class_dropdown.value
-            ]
+        filtered_for_user_ids = self.apply_category_filters(self.data.copy())
 
         self.user_id_dropdown.options = self.get_unique_values_with_all_column(
             filtered_for_user_ids, ColumnNames.USER_ID.value
@@ -866,20 +1227,7 @@ class ECGDataExplorer:  # pylint: disable=too-many-instance-attributes
         """
         Updates the options for the date and time dropdown based on the filtered data.
         """
-        filtered_for_dates = self.data.copy()
-
-        if self.age_group_dropdown.value != "All":
-            filtered_for_dates = filtered_for_dates[
-                filtered_for_dates[AGE_GROUP_STRING] == self.age_group_dropdown.value
-            ]
-
-        if self.ecg_class_dropdown.value != "All":
-            filtered_for_dates = filtered_for_dates[
-                filtered_for_dates[
-                    ColumnNames.APPLE_ELECTROCARDIOGRAM_CLASSIFICATION.value
-                ]
-                == self.ecg_class_dropdown.value
-            ]
+        filtered_for_dates = self.apply_category_filters(self.data.copy())
 
         if self.user_id_dropdown.value != "All":
             filtered_for_dates = filtered_for_dates[
@@ -906,6 +1254,16 @@ class ECGDataExplorer:  # pylint: disable=too-many-instance-attributes
         unique_values.insert(0, "All")
         return unique_values
 
+    def on_filtered_change(self, change):  # pylint: disable=unused-argument
+        """
+        Redraw the current plots when switching between raw and filtered waveforms.
+
+        Args:
+            change: The change event from the checkbox widget.
+        """
+        if self.redraw is not None:
+            self.redraw()
+
     def plot_ecg_recording(self, change=None):  # pylint: disable=unused-argument
         """
         Plots the filtered ECG recordings.
@@ -913,12 +1271,85 @@ class ECGDataExplorer:  # pylint: disable=too-many-instance-attributes
         Args:
             change (dict, optional): The change event from the load data button. Defaults to None.
         """
+        self.redraw = partial(self.plot_recordings, self.filtered_data)
+        self.redraw()
+
+    def plot_recordings(self, data):
+        """
+        Plots ECG recordings in place of the current plots.
+
+        Args:
+            data (pd.DataFrame): The ECG recordings to plot.
+        """
         with self.output:
             clear_output(wait=True)
-            if not self.filtered_data.empty:
-                for _, row in self.filtered_data.iterrows():
+            if not data.empty:
+                for _, row in data.iterrows():
                     self.plot_single_ecg(row)
 
+    def plot_similar_recordings(self, change=None):  # pylint: disable=unused-argument
+        """
+        Plots the first selected ECG recording followed by the recordings with the most similar
+        beat morphology across all data.
+
+        Args:
+            change (dict, optional): The change event from the find similar button. Defaults to
+                None.
+        """
+        self.redraw = partial(self.plot_similar_to_first, self.filtered_data)
+        self.redraw()
+
+    def plot_similar_to_first(self, data):
+        """
+        Plots the first ECG recording of the data in place of the current plots, followed by
+        the recordings with the most similar beat morphology across all data.
+
+        Duplicate uploads are not part of the similarity index, so the recordings similar to
+        the upload they duplicate are shown instead.
+
+        Args:
+            data (pd.DataFrame): The ECG recordings, of which the first is searched for.
+        """
+        with self.output:
+            clear_output(wait=True)
+            if data.empty:
+                return
+
+            if self.similarity_index is None:
+                self.similarity_index = SimilarityIndex.from_dataframe(self.data)
+
+            row = data.iloc[0]
+            resource_id = row[ColumnNames.RESOURCE_ID.value]
+            self.plot_single_ecg(row)
+
+            is_duplicate = row.get(DuplicateColumns.IS_DUPLICATE.value)
+            if pd.notna(is_duplicate) and is_duplicate:
+                resource_id = row[DuplicateColumns.CANONICAL_RESOURCE_ID.value]
+                display(
+                    widgets.HTML(
+                        value=WidgetStrings.DUPLICATE_OF.value.format(resource_id)
+                    )
+                )
+
+            if resource_id not in self.similarity_index:
+                display(widgets.HTML(value=WidgetStrings.NO_SIMILAR.value))
+                return
+
+            similar = self.similarity_index.query(resource_id, SIMILAR_RECORDINGS_COUNT)
+            resource_ids = self.data[ColumnNames.RESOURCE_ID.value]
+            for _, match in similar.iterrows():
+                display(
+                    widgets.HTML(
+                        value="<b style='font-size: larger;'>Similarity: "
+                        f"{match[SimilarityColumns.SIMILARITY.value]:.3f}</b>"
+                    )
+                )
+                self.plot_single_ecg(
+                    self.data[
+                        resource_ids == match[SimilarityColumns.RESOURCE_ID.value]
+                    ].iloc[0]
+                )
+
     def plot_single_ecg(self, row):  # pylint: disable=too-many-locals
         """
         Plot a single ECG recording.
@@ -926,32 +1357,19 @@ class ECGDataExplorer:  # pylint: disable=too-many-instance-attributes
         Args:
             row (pd.Series): The row of the DataFrame containing the ECG data.
         """
-        _, axs = plt.subplots(3, 1, figsize=(14, 5), constrained_layout=True)
-
-        for i, key in enumerate(
-            ["ECGDataRecording1", "ECGDataRecording2", "ECGDataRecording3"]
-        ):
-            title = f"ECG part {i+1} recorded on {row[ColumnNames.EFFECTIVE_DATE_TIME.value]}"
-            plot_single_lead_ecg(
-                row[key],
-                sample_rate=row[ColumnNames.SAMPLING_FREQUENCY.value],
-                title=title,
-                ax=axs[i],
-            )
-
         user_id = (
             row[ColumnNames.USER_ID.value]
-            if row[ColumnNames.USER_ID.value] is not None
+            if pd.notna(row[ColumnNames.USER_ID.value])
             else "Unknown"
         )
         heart_rate = (
             int(row[ColumnNames.HEART_RATE.value])
-            if row[ColumnNames.HEART_RATE.value] is not None
+            if pd.notna(row[ColumnNames.HEART_RATE.value])
             else "Unknown"
         )
         ecg_interpretation = (
             row[ColumnNames.APPLE_ELECTROCARDIOGRAM_CLASSIFICATION.value]
-            if row[ColumnNames.APPLE_ELECTROCARDIOGRAM_CLASSIFICATION.value] is not None
+            if pd.notna(row[ColumnNames.APPLE_ELECTROCARDIOGRAM_CLASSIFICATION.value])
             else "Unknown"
         )
 
@@ -985,8 +1403,23 @@ class ECGDataExplorer:  # pylint: disable=too-many-instance-attributes
         )
         display(diagnosis_status_html)
 
-        if row.get(DiagnosisKeyNames.NUMBER_OF_REVIEWERS.value) != 0:
-            for index, _ in enumerate(row.get(DiagnosisKeyNames.REVIEWERS.value, [])):
+        if self.diagnoses is not None:
+            reviews = reviews_of(self.diagnoses, row[ColumnNames.RESOURCE_ID.value])
+            for reviewers_initials, diagnosis_date in reviews[
+                [
+                    DiagnosisFields.PHYSICIAN_INITIALS.value,
+                    DiagnosisFields.DIAGNOSIS_DATE.value,
+                ]
+            ].itertuples(index=False, name=None):
+                reviewers_html = widgets.HTML(
+                    value=f"<span style='font-size: larger;'><b>Physician: {reviewers_initials}, "
+                    f"Date: {diagnosis_date}</b></span>"
+                )
+                display(reviewers_html)
+        elif row.get(DiagnosisKeyNames.NUMBER_OF_REVIEWERS.value) != 0:
+            for index, _ in enumerate(
+                reviewer_list(row.get(DiagnosisKeyNames.REVIEWERS.value))
+            ):
                 reviewers_initials = row.get(
                     f"Diagnosis{index+1}_physicianInitials", ""
                 )
@@ -997,4 +1430,10 @@ class ECGDataExplorer:  # pylint: disable=too-many-instance-attributes
                 )
                 display(reviewers_html)
 
-        plt.show()
+        display_ecg_parts(
+            row,
+            date_column=ColumnNames.EFFECTIVE_DATE_TIME.value,
+            figure_cache=self.figure_cache,
+            filtered=self.filtered_checkbox.value,
+            window=self.window,
+        )
@@ -0,0 +1,272 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Helpers to move ECG waveforms between the per-row list representation of the processed
+DataFrame and rectangular NumPy arrays, so that signal processing can run on whole batches of
+recordings at once instead of row by row.
+
+Windows of recordings, e.g., the three 10-second parts, 5-second panels, or overlapping
+2-second analysis windows, are strided views into the waveform array that share its memory.
+"""
+
+# Standard library imports
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from enum import Enum
+from math import ceil
+
+# Related third-party imports
+import numpy as np
+import pandas as pd
+
+# Local application/library specific imports
+from spezi_data_pipeline.data_flattening.fhir_resources_flattener import ColumnNames
+
+DEFAULT_CHUNK_SIZE = 2048
+ECG_PART_COLUMNS = ["ECGDataRecording1", "ECGDataRecording2", "ECGDataRecording3"]
+NUMBER_OF_PARTS = len(ECG_PART_COLUMNS)
+PART_DURATION_SEC = 10.0
+
+
+class PaddingPolicy(Enum):
+    """
+    Enumerates how windows extending past the end of a recording are handled.
+    """
+
+    NAN = "nan"
+    TRUNCATE = "truncate"
+
+
+@dataclass(frozen=True)
+class WindowSpec:
+    """
+    Windows of a recording, e.g., for the panels of the ECG viewers or for analysis.
+
+    Attributes:
+        length_sec (float): Length of every window in seconds.
+        hop_sec (float | None): Offset between the starts of consecutive windows in seconds.
+            Shorter than the length for overlapping windows (default is None, the length).
+        padding (PaddingPolicy): With NAN, the last window is NaN-padded past the end of the
+            recording; with TRUNCATE, incomplete windows are dropped (default is NAN).
+        count (int | None): Fixed number of windows, e.g., 3 for the 10-second parts (default
+            is None, as many as the recording covers).
+
+    Raises:
+        ValueError: If the length or hop is not positive, or the count is less than one.
+    """
+
+    length_sec: float = PART_DURATION_SEC
+    hop_sec: float | None = None
+    padding: PaddingPolicy = PaddingPolicy.NAN
+    count: int | None = None
+
+    def __post_init__(self):
+        if not self.length_sec > 0:
+            raise ValueError(
+                f"The window length must be positive, not {self.length_sec}."
+            )
+        if self.hop_sec is not None and not self.hop_sec > 0:
+            raise ValueError(f"The window hop must be positive, not {self.hop_sec}.")
+        if self.count is not None and self.count < 1:
+            raise ValueError(f"The window count must be at least 1, not {self.count}.")
+
+    def samples(self, sampling_frequency: float) -> tuple[int, int]:
+        """
+        Convert the window length and hop to numbers of samples.
+
+        Args:
+            sampling_frequency (float): Sampling frequency in Hz.
+
+        Returns:
+            tuple[int, int]: The window length and hop in samples.
+        """
+        window = max(1, int(self.length_sec * sampling_frequency))
+        hop = (
+            window
+            if self.hop_sec is None
+            else max(1, int(self.hop_sec * sampling_frequency))
+        )
+        return window, hop
+
+    def starts_sec(self, n_windows: int) -> np.ndarray:
+        """
+        Return the start time of every window in seconds.
+
+        Args:
+            n_windows (int): The number of windows.
+
+        Returns:
+            np.ndarray: The start times.
+        """
+        hop_sec = self.length_sec if self.hop_sec is None else self.hop_sec
+        return np.arange(n_windows) * hop_sec
+
+
+# The three 10-second parts shown by the ECG viewers
+TEN_SECOND_PARTS = WindowSpec(PART_DURATION_SEC, count=NUMBER_OF_PARTS)
+
+
+def stack_waveforms(
+    recordings: Iterable, dtype: np.dtype = np.float32, length: int | None = None
+) -> np.ndarray:
+    """
+    Stack variable-length recordings into a NaN-padded two-dimensional array.
+
+    Args:
+        recordings (Iterable): Recordings as lists or arrays of samples.
+        dtype (np.dtype): Data type of the returned array (default is float32).
+        length (int | None): Number of columns. Defaults to the longest recording; longer
+            recordings are truncated.
+
+    Returns:
+        np.ndarray: Array of shape (number of recordings, length).
+    """
+    recordings = [np.asarray(r, dtype=dtype).ravel() for r in recordings]
+    if length is None:
+        length = max((r.size for r in recordings), default=0)
+
+    matrix = np.full((len(recordings), length), np.nan, dtype=dtype)
+    for i, recording in enumerate(recordings):
+        n = min(recording.size, length)
+        matrix[i, :n] = recording[:n]
+    return matrix
+
+
+def fill_nan_padding(matrix: np.ndarray) -> np.ndarray:
+    """
+    Replace the NaN padding of recordings with the last valid sample of each recording.
+
+    Filtering or resampling the padded array then does not ring at the end of shorter
+    recordings. Rows without any valid sample are filled with zeros.
+
+    Args:
+        matrix (np.ndarray): Recordings of shape (n_recordings, n_samples), NaN-padded.
+
+    Returns:
+        np.ndarray: The recordings without NaN values.
+    """
+    valid = ~np.isnan(matrix)
+    last_valid = np.maximum.accumulate(
+        np.where(valid, np.arange(matrix.shape[1]), 0), axis=1
+    )
+    return np.nan_to_num(np.take_along_axis(matrix, last_valid, axis=1))
+
+
+def filtfilt_padlen(sos: np.ndarray) -> int:
+    """
+    Return the number of samples `scipy.signal.sosfiltfilt` pads each side with by default.
+
+    Recordings must be longer than this to be filtered forward and backward.
+
+    Args:
+        sos (np.ndarray): The filter as second-order sections.
+
+    Returns:
+        int: The default padding length in samples.
+    """
+    taps = 2 * len(sos) + 1 - min(np.sum(sos[:, 2] == 0), np.sum(sos[:, 5] == 0))
+    return 3 * int(taps)
+
+
+def iter_waveform_batches(
+    df: pd.DataFrame,
+    column: str = ColumnNames.ECG_RECORDING.value,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    dtype: np.dtype = np.float32,
+) -> Iterator[tuple[float, pd.Index, np.ndarray]]:
+    """
+    Yield the recordings of a DataFrame as NaN-padded arrays, grouped by sampling frequency.
+
+    Recordings are grouped by their sampling frequency so that every batch can be processed with
+    a single set of filter coefficients, and split into chunks of at most `chunk_size` rows to
+    bound memory use.
+
+    Args:
+        df (pd.DataFrame): DataFrame with ECG data.
+        column (str): Column holding the recordings (default is 'ECGRecording').
+        chunk_size (int): Maximum number of recordings per batch (default is 2048).
+        dtype (np.dtype): Data type of the batches (default is float32).
+
+    Yields:
+        tuple[float, pd.Index, np.ndarray]: The sampling frequency, the DataFrame index of the
+            recordings in the batch, and the batch as an array.
+    """
+    sampling_frequencies = df[ColumnNames.SAMPLING_FREQUENCY.value].astype(float)
+    for sampling_frequency, group_index in df.groupby(
+        sampling_frequencies, sort=False
+    ).groups.items():
+        for start in range(0, len(group_index), chunk_size):
+            index = group_index[start : start + chunk_size]
+            yield sampling_frequency, index, stack_waveforms(
+                df.loc[index, column], dtype=dtype
+            )
+
+
+def split_per_row(
+    values: np.ndarray, rows: np.ndarray, n_rows: int
+) -> list[np.ndarray]:
+    """
+    Split a flat array of per-event values into one array per row.
+
+    Args:
+        values (np.ndarray): Values sorted by row, e.g., as produced from `np.nonzero`.
+        rows (np.ndarray): Row index of every value.
+        n_rows (int): Total number of rows.
+
+    Returns:
+        list[np.ndarray]: The values belonging to each row, in row order.
+    """
+    counts = np.bincount(rows, minlength=n_rows)
+    return np.split(values, np.cumsum(counts)[:-1])
+
+
+def window_waveforms(
+    waveforms: np.ndarray | list,
+    sampling_frequency: float,
+    spec: WindowSpec = TEN_SECOND_PARTS,
+) -> np.ndarray:
+    """
+    Return the windows of one recording or of a batch of recordings as strided views.
+
+    The windows share the memory of the waveform array and are read-only. Only if the windows
+    extend past the end of the array with NaN padding, or if the waveforms are not a float
+    array, is the array copied once.
+
+    Args:
+        waveforms (np.ndarray | list): One recording of shape (n_samples,), or recordings of
+            shape (n_recordings, n_samples), NaN-padded.
+        sampling_frequency (float): Sampling frequency of the recordings in Hz.
+        spec (WindowSpec): The windows (default is TEN_SECOND_PARTS).
+
+    Returns:
+        np.ndarray: The windows of shape (n_windows, window) for one recording, or
+            (n_recordings, n_windows, window) for a batch.
+    """
+    waveforms = np.asarray(waveforms)
+    if not np.issubdtype(waveforms.dtype, np.floating):
+        waveforms = waveforms.astype(np.float64)
+    window, hop = spec.samples(sampling_frequency)
+    n_samples = waveforms.shape[-1]
+
+    if spec.padding is PaddingPolicy.TRUNCATE:
+        n_windows = 0 if n_samples < window else (n_samples - window) // hop + 1
+        if spec.count is not None:
+            n_windows = min(n_windows, spec.count)
+    elif spec.count is not None:
+        n_windows = spec.count
+    else:
+        n_windows = max(1, ceil((n_samples - window) / hop) + 1)
+
+    needed = max(window, (n_windows - 1) * hop + window)
+    if needed > n_samples:
+        padding = [(0, 0)] * (waveforms.ndim - 1) + [(0, needed - n_samples)]
+        waveforms = np.pad(waveforms, padding, constant_values=np.nan)
+
+    windows = np.lib.stride_tricks.sliding_window_view(waveforms, window, axis=-1)
+    return windows[..., ::hop, :][..., :n_windows, :]
@@ -0,0 +1,241 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Background write queue for diagnoses, so saving a review does not block the notebook.
+
+Writes are submitted to a small pool of worker threads and return a future immediately. Each
+write counts the existing reviews and creates the diagnosis in one transaction, under a document
+ID that is fixed before the first attempt, so neither concurrent reviewers nor retries after
+transient Firestore errors, with exponential backoff, can exceed the review limit or create a
+second review.
+"""
+
+# Standard library imports
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import Enum
+from typing import Callable
+
+# Related third-party imports
+from google.api_core import exceptions as api_exceptions
+from google.cloud import firestore
+from google.cloud.firestore import Client
+
+# Local application/library specific imports
+from .utils import (
+    DIAGNOSIS_DATA_SUBCOLLECTION,
+    ECG_DATA_SUBCOLLECTION,
+    USERS_COLLECTION,
+)
+
+MAX_REVIEWS = 3
+DEFAULT_MAX_WORKERS = 2
+DEFAULT_MAX_ATTEMPTS = 5
+INITIAL_BACKOFF_SEC = 0.5
+MAX_BACKOFF_SEC = 8.0
+
+TRANSIENT_ERRORS = (
+    api_exceptions.Aborted,
+    api_exceptions.DeadlineExceeded,
+    api_exceptions.InternalServerError,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.TooManyRequests,
+)
+
+
+class WriteStatus(Enum):
+    """
+    Enumerates the states of a queued diagnosis write.
+    """
+
+    PENDING = "pending"
+    SAVED = "saved"
+    ALREADY_REVIEWED = "already reviewed"
+    FAILED = "failed"
+
+
+class WriteResult:  # pylint: disable=too-few-public-methods
+    """
+    The outcome of a queued diagnosis write.
+
+    Attributes:
+        status (WriteStatus): The final state of the write.
+        attempts (int): Number of attempts made.
+        error (Exception | None): The last error if the write failed.
+        diagnosis_id (str | None): The ID of the Diagnosis document written by the queue.
+    """
+
+    def __init__(
+        self,
+        status: WriteStatus,
+        attempts: int,
+        error: Exception | None = None,
+        diagnosis_id: str | None = None,
+    ):
+        self.status = status
+        self.attempts = attempts
+        self.error = error
+        self.diagnosis_id = diagnosis_id
+
+
+class DiagnosisWriteQueue:
+    """
+    Commits diagnosis documents to Firestore in background threads with retry and backoff.
+
+    Attributes:
+        db (Client): Firestore database client.
+        max_attempts (int): Maximum number of attempts per write.
+        initial_backoff (float): Delay before the first retry in seconds, doubled per retry.
+        max_backoff (float): Upper bound of the delay between retries in seconds.
+    """
+
+    def __init__(
+        self,
+        db: Client,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        initial_backoff: float = INITIAL_BACKOFF_SEC,
+        max_backoff: float = MAX_BACKOFF_SEC,
+    ):
+        """
+        Initializes the queue.
+
+        Args:
+            db (Client): Firestore database client.
+            max_workers (int): Number of writes committed concurrently (default is 2).
+            max_attempts (int): Maximum number of attempts per write (default is 5).
+            initial_backoff (float): Delay before the first retry in seconds (default is 0.5).
+            max_backoff (float): Upper bound of the delay between retries in seconds
+                (default is 8).
+        """
+        self.db = db
+        self.max_attempts = max_attempts
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="diagnosis-write"
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def pending_count(self) -> int:
+        """
+        Returns:
+            int: Number of writes that have not completed yet.
+        """
+        with self._lock:
+            return self._pending
+
+    def submit(
+        self,
+        user_id: str,
+        document_id: str,
+        diagnosis_data: dict,
+        on_done: Callable[[WriteResult], None] | None = None,
+    ) -> Future:
+        """
+        Queue a diagnosis for an ECG recording and return immediately.
+
+        Args:
+            user_id (str): The user ID associated with the ECG recording.
+            document_id (str): The document ID of the ECG recording.
+            diagnosis_data (dict): The diagnosis document to store.
+            on_done (Callable[[WriteResult], None] | None): Called from the worker thread with
+                the result once the write has completed. The write counts as pending until
+                the callback has returned.
+
+        Returns:
+            Future: Resolves to the WriteResult of the write.
+        """
+        diagnosis_ref = (
+            self.db.collection(USERS_COLLECTION)
+            .document(user_id)
+            .collection(ECG_DATA_SUBCOLLECTION)
+            .document(document_id)
+            .collection(DIAGNOSIS_DATA_SUBCOLLECTION)
+        )
+        # The document ID is fixed up front so that retries overwrite instead of duplicating
+        diagnosis_doc_ref = diagnosis_ref.document()
+
+        with self._lock:
+            self._pending += 1
+        future = self._executor.submit(
+            self._write, diagnosis_ref, diagnosis_doc_ref, diagnosis_data
+        )
+
+        def complete(done: Future):
+            try:
+                if on_done is not None:
+                    on_done(done.result())
+            finally:
+                with self._lock:
+                    self._pending -= 1
+
+        future.add_done_callback(complete)
+        return future
+
+    def _write(self, diagnosis_ref, diagnosis_doc_ref, diagnosis_data) -> WriteResult:
+        """
+        Store a diagnosis unless the review limit is reached, retrying transient errors.
+        """
+
+        @firestore.transactional
+        def create_in_transaction(transaction) -> WriteStatus:
+            if diagnosis_doc_ref.get(transaction=transaction).exists:
+                # An earlier attempt succeeded but its response was lost
+                return WriteStatus.SAVED
+            if len(list(diagnosis_ref.stream(transaction=transaction))) >= MAX_REVIEWS:
+                return WriteStatus.ALREADY_REVIEWED
+            transaction.create(diagnosis_doc_ref, diagnosis_data)
+            return WriteStatus.SAVED
+
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                status = create_in_transaction(self.db.transaction())
+                return WriteResult(status, attempt, diagnosis_id=diagnosis_doc_ref.id)
+            except TRANSIENT_ERRORS as error:
+                if attempt >= self.max_attempts:
+                    return WriteResult(WriteStatus.FAILED, attempt, error)
+                backoff = min(
+                    self.max_backoff, self.initial_backoff * 2 ** (attempt - 1)
+                )
+                time.sleep(backoff * random.uniform(0.5, 1.0))
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                return WriteResult(WriteStatus.FAILED, attempt, error)
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Block until all queued writes have completed, e.g., before closing the notebook.
+
+        Args:
+            timeout (float | None): Maximum time to wait in seconds (default is no limit).
+
+        Returns:
+            bool: True if no writes are pending anymore.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending_count:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop accepting writes and release the worker threads.
+
+        Args:
+            wait (bool): Whether to wait for queued writes to complete (default is True).
+        """
+        self._executor.shutdown(wait=wait)
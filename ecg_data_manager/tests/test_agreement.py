@@ -0,0 +1,109 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the inter-rater agreement statistics.
+"""
+
+# Related third-party imports
+import numpy as np
+import pandas as pd
+import pytest
+
+# Local application/library specific imports
+from ecg_data_manager.modules.agreement import (
+    ALL,
+    AgreementColumns,
+    agreement_summary,
+    category_counts,
+    cohen_kappa,
+    confusion_matrix,
+    fleiss_kappa,
+    rating_codes,
+)
+
+# The example of Fleiss (1971) as tabulated on Wikipedia, 14 raters and 5 categories
+FLEISS_EXAMPLE = np.array(
+    [
+        [0, 0, 0, 0, 14],
+        [0, 2, 6, 4, 2],
+        [0, 0, 3, 5, 6],
+        [0, 3, 9, 2, 0],
+        [2, 2, 8, 1, 1],
+        [7, 7, 0, 0, 0],
+        [3, 2, 6, 3, 0],
+        [2, 5, 3, 2, 2],
+        [6, 5, 2, 1, 0],
+        [0, 2, 2, 3, 7],
+    ]
+)
+
+
+def reviews_frame(reviews: list[list[str]]) -> pd.DataFrame:
+    """Create the processed ECG data with the given diagnoses per recording."""
+    return pd.DataFrame(
+        {
+            f"Diagnosis{i + 1}_physicianDiagnosis": [
+                row[i] if i < len(row) else None for row in reviews
+            ]
+            for i in range(3)
+        }
+        | {"AgeGroup": ["0-6" if i % 2 else "6-12" for i in range(len(reviews))]}
+    )
+
+
+def test_fleiss_kappa_of_reference_example():
+    """Fleiss' kappa matches the published value of the reference example."""
+    kappa, observed = fleiss_kappa(FLEISS_EXAMPLE)
+    assert kappa[0] == pytest.approx(0.210, abs=1e-3)
+    assert observed[0] == pytest.approx(0.378, abs=1e-3)
+
+
+def test_integer_weights_repeat_recordings():
+    """Weighting a recording by n equals including it n times."""
+    weights = np.arange(1, 11)
+    weighted, _ = fleiss_kappa(FLEISS_EXAMPLE, weights)
+    repeated, _ = fleiss_kappa(np.repeat(FLEISS_EXAMPLE, weights, axis=0))
+    assert weighted[0] == pytest.approx(repeated[0])
+
+
+def test_cohen_kappa_ignores_missing_third_review():
+    """Cohen's kappa of two reviews is 0.4 for the textbook table of 50 recordings."""
+    first = [0] * 25 + [1] * 25
+    second = [0] * 20 + [1] * 5 + [0] * 10 + [1] * 15
+    codes = np.column_stack([first, second, [-1] * 50])
+    assert cohen_kappa(codes, 2)[0] == pytest.approx(0.4)
+
+
+def test_rating_codes_and_counts():
+    """Missing and empty reviews are -1 and not counted."""
+    codes, categories = rating_codes(reviews_frame([["a", "b", ""], ["b"]]))
+    assert categories == ["a", "b"]
+    assert codes.tolist() == [[0, 1, -1], [1, -1, -1]]
+    assert category_counts(codes, 2).tolist() == [[1, 1], [0, 1]]
+
+
+def test_confusion_matrix_is_symmetric():
+    """Every pair of reviews is counted in both directions."""
+    matrix = confusion_matrix(reviews_frame([["a", "a", "b"]]))
+    assert matrix.loc["a", "a"] == 2
+    assert matrix.loc["a", "b"] == matrix.loc["b", "a"] == 2
+
+
+def test_summary_of_perfect_agreement():
+    """Perfect agreement has kappa 1 overall and per age group."""
+    df = reviews_frame(
+        [["a", "a", "a"], ["b", "b"], ["b", "b", "b"], ["a", "a"], ["a"]]
+    )
+    summary = agreement_summary(df, by=("AgeGroup",), n_bootstrap=20, max_workers=1)
+    overall = summary[summary[AgreementColumns.BREAKDOWN.value] == ALL].iloc[0]
+    assert overall[AgreementColumns.RECORDINGS.value] == 4
+    assert overall[AgreementColumns.PERCENT_AGREEMENT.value] == pytest.approx(100.0)
+    assert summary[AgreementColumns.FLEISS_KAPPA.value].tolist() == [1.0, 1.0, 1.0]
+    assert overall[AgreementColumns.COHEN_KAPPA.value] == pytest.approx(1.0)
+    assert overall[AgreementColumns.FLEISS_CI_LOW.value] <= 1.0
@@ -0,0 +1,110 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the lease-based reviewer assignment.
+"""
+
+# Related third-party imports
+import pandas as pd
+import pytest
+
+# Local application/library specific imports
+from ecg_data_manager.modules.assignment import (
+    BLOCKED_RETRY_SEC,
+    MAX_REVIEWS,
+    InMemoryLeaseStore,
+    ReviewScheduler,
+)
+
+
+class FakeClock:  # pylint: disable=too-few-public-methods
+    """A clock that only advances when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(name="clock")
+def fixture_clock():
+    """A fake clock."""
+    return FakeClock()
+
+
+def recordings(rows: list[tuple[str, str, list[str]]]) -> pd.DataFrame:
+    """Create a DataFrame from (ResourceId, classification, reviewers) tuples."""
+    return pd.DataFrame(
+        {
+            "ResourceId": [row[0] for row in rows],
+            "AppleElectrocardiogramClassification": [row[1] for row in rows],
+            "Reviewers": [row[2] for row in rows],
+        }
+    )
+
+
+def test_abnormal_and_least_reviewed_first(clock):
+    """Abnormal recordings come first, then the ones with the fewest reviews."""
+    scheduler = ReviewScheduler(
+        recordings(
+            [
+                ("sinus", "sinusRhythm", []),
+                ("afib_reviewed", "atrialFibrillation", ["AB"]),
+                ("afib", "atrialFibrillation", []),
+            ]
+        ),
+        clock=clock,
+    )
+    assert [scheduler.next_for(reviewer) for reviewer in ("R1", "R2", "R3")] == [
+        "afib",
+        "afib_reviewed",
+        "afib",
+    ]
+
+
+def test_reviewer_gets_each_recording_once(clock):
+    """A reviewer is never handed a recording they reviewed or have leased."""
+    scheduler = ReviewScheduler(
+        recordings([("a", "sinusRhythm", ["AB"]), ("b", "sinusRhythm", [])]),
+        clock=clock,
+    )
+    assert scheduler.next_for("AB") == "b"
+    assert scheduler.next_for("AB") is None
+    scheduler.complete("b", "AB")
+    assert scheduler.remaining_reviews() == 2 * MAX_REVIEWS - 2
+
+
+def test_leases_expire(clock):
+    """A recording leased up to capacity is handed out again once a lease expires."""
+    scheduler = ReviewScheduler(
+        recordings([("a", "sinusRhythm", [])]), lease_timeout=60, clock=clock
+    )
+    leased = [scheduler.next_for(f"R{i}") for i in range(MAX_REVIEWS + 1)]
+    assert leased == ["a"] * MAX_REVIEWS + [None]
+    clock.now += 61
+    assert scheduler.next_for("R9") == "a"
+
+
+def test_recording_blocked_by_other_session_is_retried_soon(clock):
+    """A recording leased by another session is retried after a short time, not a lease."""
+    store = InMemoryLeaseStore()
+    other = ReviewScheduler(
+        recordings([("a", "sinusRhythm", [])]), lease_store=store, clock=clock
+    )
+    scheduler = ReviewScheduler(
+        recordings([("a", "sinusRhythm", [])]), lease_store=store, clock=clock
+    )
+    leased = [other.next_for(f"R{i}") for i in range(MAX_REVIEWS)]
+    assert scheduler.next_for("X") is None
+
+    assert leased == ["a"] * MAX_REVIEWS
+    other.release("a", "R0")
+    clock.now += BLOCKED_RETRY_SEC + 1
+    assert scheduler.next_for("X") == "a"
@@ -0,0 +1,70 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the compact dtypes of the processed ECG data.
+"""
+
+# Related third-party imports
+import pandas as pd
+import pytest
+
+# Local application/library specific imports
+from ecg_data_manager.modules.compaction import (
+    compact_dtypes,
+    has_reviewer,
+    reviewer_list,
+    set_reviewers,
+)
+from ecg_data_manager.modules.utils import ExportFormat, export_database
+
+
+@pytest.fixture(name="df_ecg")
+def fixture_df_ecg():
+    """Processed ECG data with three recordings."""
+    return pd.DataFrame(
+        {
+            "ResourceId": ["a", "b", "c"],
+            "AgeGroup": ["6-12", "6-12", "0-6"],
+            "ReviewStatus": ["Incomplete review"] * 3,
+            "Reviewers": [["AB", "CD"], [], ["CD"]],
+            "NumberOfReviewers": [2.0, 0.0, 1.0],
+            "EffectiveDateTime": ["2024-01-01T10:00:00Z"] * 3,
+        }
+    )
+
+
+def test_round_trip_of_reviewers(df_ecg):
+    """The compacted reviewers decode to the original lists."""
+    compacted = compact_dtypes(df_ecg, report=False)
+    assert isinstance(compacted["Reviewers"].dtype, pd.CategoricalDtype)
+    assert isinstance(compacted["AgeGroup"].dtype, pd.CategoricalDtype)
+    assert compacted["NumberOfReviewers"].dtype == "Int8"
+    assert [reviewer_list(value) for value in compacted["Reviewers"]] == df_ecg[
+        "Reviewers"
+    ].tolist()
+    assert df_ecg["Reviewers"].tolist() == [["AB", "CD"], [], ["CD"]]
+
+
+def test_reviewer_helpers_work_on_both_encodings(df_ecg):
+    """has_reviewer and set_reviewers give the same result for lists and categoricals."""
+    for df in (df_ecg.copy(), compact_dtypes(df_ecg, report=False)):
+        assert has_reviewer(df["Reviewers"], "CD").tolist() == [True, False, True]
+        set_reviewers(df, 1, ["EF"])
+        assert reviewer_list(df.at[1, "Reviewers"]) == ["EF"]
+        assert has_reviewer(df["Reviewers"], "EF").tolist() == [False, True, False]
+
+
+def test_export_keeps_reviewer_lists(df_ecg, tmp_path):
+    """Compacted data is exported with the reviewers as lists of initials."""
+    path = export_database(
+        compact_dtypes(df_ecg, report=False),
+        str(tmp_path / "database"),
+        ExportFormat.PICKLE,
+    )
+    assert pd.read_pickle(path)["Reviewers"].tolist() == [["AB", "CD"], [], ["CD"]]
@@ -0,0 +1,80 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the long-format diagnoses table.
+"""
+
+# Standard library imports
+from unittest.mock import MagicMock
+
+# Related third-party imports
+import pandas as pd
+
+# Local application/library specific imports
+from ecg_data_manager.modules.diagnoses import (
+    attach_diagnoses,
+    build_diagnoses_table,
+    diagnoses_wide_view,
+    diagnosis_records,
+    is_diagnoses_table,
+    reviews_of,
+)
+
+
+def diagnosis_doc(doc_id: str, initials: str, **fields) -> MagicMock:
+    """A mock Diagnosis document snapshot."""
+    doc = MagicMock(id=doc_id)
+    doc.to_dict.return_value = {
+        "physicianInitials": initials,
+        "physicianDiagnosis": "sinusRhythm",
+        **fields,
+    }
+    return doc
+
+
+def diagnoses_table() -> pd.DataFrame:
+    """Two reviews of 'ecg1' and one of 'ecg2', one with an extra field."""
+    return build_diagnoses_table(
+        diagnosis_records(
+            "ecg1", [diagnosis_doc("d1", "AB"), diagnosis_doc("d2", "CD")]
+        )
+        + diagnosis_records("ecg2", [diagnosis_doc("d3", "AB", extra="x")])
+    )
+
+
+def test_table_layout():
+    """The table is indexed by recording and review with categorical known fields."""
+    table = diagnoses_table()
+    assert is_diagnoses_table(table)
+    assert table.index.tolist() == [("ecg1", 1), ("ecg1", 2), ("ecg2", 1)]
+    assert table.columns[0] == "DiagnosisId"
+    assert table.columns[-1] == "extra"
+    assert isinstance(table["physicianInitials"].dtype, pd.CategoricalDtype)
+
+
+def test_wide_view_and_attach():
+    """The wide view has one column per review and field, joined by ResourceId."""
+    table = diagnoses_table()
+    wide = diagnoses_wide_view(table)
+    assert "Diagnosis2_physicianInitials" in wide.columns
+    assert "DiagnosisId" not in "".join(wide.columns)
+
+    df = pd.DataFrame(
+        {"ResourceId": ["ecg2", "ecg1"], "Diagnosis1_physicianInitials": ["old", "old"]}
+    )
+    attached = attach_diagnoses(df, table)
+    assert attached["Diagnosis1_physicianInitials"].tolist() == ["AB", "AB"]
+    assert attached["Diagnosis2_physicianInitials"].isna().tolist() == [True, False]
+
+
+def test_reviews_of_unknown_recording_is_empty():
+    """Looking up a recording without reviews returns an empty table."""
+    table = diagnoses_table()
+    assert reviews_of(table, "ecg1")["physicianInitials"].tolist() == ["AB", "CD"]
+    assert reviews_of(table, "ecg3").empty
@@ -0,0 +1,119 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the duplicate upload detection.
+"""
+
+# Related third-party imports
+import numpy as np
+import pandas as pd
+
+# Local application/library specific imports
+from ecg_data_manager.modules.duplicates import (
+    DuplicateColumns,
+    DuplicateMatch,
+    add_duplicate_detection,
+    duplicate_report,
+    is_degenerate,
+    waveform_hash,
+)
+
+SAMPLING_FREQUENCY = 512.0
+
+
+def recording(seed: int, samples: int = 4096) -> list[float]:
+    """Create a random recording in mV."""
+    return np.random.default_rng(seed).normal(scale=0.5, size=samples).tolist()
+
+
+def recordings_frame(rows: list[tuple[str, str, list, int]]) -> pd.DataFrame:
+    """Create a DataFrame from (ResourceId, UserId, samples, NumberOfReviewers) tuples."""
+    return pd.DataFrame(
+        {
+            "ResourceId": [row[0] for row in rows],
+            "UserId": [row[1] for row in rows],
+            "ECGRecording": [row[2] for row in rows],
+            "NumberOfReviewers": [row[3] for row in rows],
+            "SamplingFrequency": SAMPLING_FREQUENCY,
+            "EffectiveDateTime": "2024-01-01",
+        }
+    )
+
+
+def test_hash_depends_on_samples_and_sampling_frequency():
+    """Sub-microvolt differences hash equally, other samples or rates do not."""
+    samples = np.rint(np.array(recording(0)) * 1000) / 1000
+    assert waveform_hash(samples, 512) == waveform_hash(samples + 1e-5, 512.0)
+    assert waveform_hash(samples, 512) != waveform_hash(samples + 0.01, 512)
+    assert waveform_hash(samples, 512) != waveform_hash(samples, 256)
+
+
+def test_degenerate_recordings():
+    """Empty, all-NaN, and flat recordings are degenerate."""
+    assert is_degenerate([])
+    assert is_degenerate([np.nan, np.nan])
+    assert is_degenerate([0.3, 0.3, np.nan])
+    assert not is_degenerate(recording(0))
+
+
+def test_exact_and_near_duplicates_of_one_user():
+    """Duplicates collapse onto the recording with the most reviews."""
+    near = (np.array(recording(1)[:-20]) + 0.001).tolist()
+    df = add_duplicate_detection(
+        recordings_frame(
+            [
+                ("a", "u1", recording(1), 0),
+                ("b", "u1", recording(1), 2),
+                ("c", "u1", near, 0),
+                ("d", "u1", recording(2), 0),
+            ]
+        )
+    )
+    assert df[DuplicateColumns.CANONICAL_RESOURCE_ID.value].tolist() == [
+        "b",
+        "b",
+        "b",
+        "d",
+    ]
+    assert df[DuplicateColumns.DUPLICATE_MATCH.value].fillna("").tolist() == [
+        DuplicateMatch.EXACT.value,
+        "",
+        DuplicateMatch.NEAR_EXACT.value,
+        "",
+    ]
+    assert duplicate_report(df)["ResourceId"].tolist() == ["a", "c"]
+
+
+def test_no_duplicates_across_users():
+    """The same waveform uploaded by different users is not a duplicate."""
+    df = add_duplicate_detection(
+        recordings_frame([("a", "u1", recording(1), 0), ("b", "u2", recording(1), 0)])
+    )
+    assert not df[DuplicateColumns.IS_DUPLICATE.value].any()
+
+
+def test_flat_recordings_are_never_grouped():
+    """Flat or empty uploads of the same user are kept as separate recordings."""
+    df = add_duplicate_detection(
+        recordings_frame(
+            [
+                ("a", "u1", [0.0] * 4096, 0),
+                ("b", "u1", [0.0] * 4096, 0),
+                ("c", "u1", [], 0),
+                ("d", "u1", [], 0),
+            ]
+        )
+    )
+    assert not df[DuplicateColumns.IS_DUPLICATE.value].any()
+    assert df[DuplicateColumns.CANONICAL_RESOURCE_ID.value].tolist() == [
+        "a",
+        "b",
+        "c",
+        "d",
+    ]
@@ -0,0 +1,110 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the vectorized R-peak detection and rhythm features.
+"""
+
+# Related third-party imports
+import numpy as np
+import pandas as pd
+import pytest
+
+# Local application/library specific imports
+from ecg_data_manager.modules import features
+from ecg_data_manager.modules.features import (
+    RhythmFeatures,
+    RhythmRegularity,
+    add_rhythm_features,
+    compute_rhythm_features,
+    detect_r_peaks,
+)
+
+SAMPLING_FREQUENCY = 512.0
+
+
+def pulse_train(rr_sec: float, duration_sec: float = 10.0) -> np.ndarray:
+    """Create a recording with narrow QRS-like pulses every `rr_sec` seconds."""
+    t = np.arange(int(duration_sec * SAMPLING_FREQUENCY)) / SAMPLING_FREQUENCY
+    beats = np.arange(rr_sec / 2, duration_sec, rr_sec)
+    return np.exp(-(((t[:, np.newaxis] - beats) / 0.01) ** 2)).sum(axis=1)
+
+
+def test_detects_one_peak_per_beat():
+    """Every pulse is detected once, in recordings with different heart rates."""
+    matrix = np.stack([pulse_train(1.0), pulse_train(0.5)])
+    peaks = detect_r_peaks(matrix, SAMPLING_FREQUENCY)
+    assert peaks.sum(axis=1).tolist() == [10, 20]
+
+
+def test_padding_is_never_a_peak():
+    """NaN padding of shorter recordings contains no peaks."""
+    short = np.full(int(10 * SAMPLING_FREQUENCY), np.nan)
+    short[: int(5 * SAMPLING_FREQUENCY)] = pulse_train(1.0, 5.0)
+    peaks = detect_r_peaks(np.stack([pulse_train(1.0), short]), SAMPLING_FREQUENCY)
+    assert peaks[1].sum() == 5
+    assert not peaks[1, int(5 * SAMPLING_FREQUENCY) :].any()
+
+
+def test_regular_rhythm_statistics():
+    """A constant heart rate has the expected mean and is labelled regular."""
+    result = compute_rhythm_features(pulse_train(0.75)[np.newaxis], SAMPLING_FREQUENCY)
+    assert result[RhythmFeatures.MEAN_HR.value][0] == pytest.approx(80.0, rel=0.01)
+    assert (
+        result[RhythmFeatures.RHYTHM_REGULARITY.value][0]
+        == RhythmRegularity.REGULAR.value
+    )
+
+
+def test_successive_differences_skip_excluded_intervals(monkeypatch):
+    """RMSSD and pNN50 only compare intervals adjacent in the original sequence."""
+    peaks = np.zeros((1, 600), dtype=bool)
+    # RR intervals of 1.0, 1.0, 0.1 (an artifact), 0.9, and 1.0 seconds at 100 Hz
+    peaks[0, [0, 100, 200, 210, 300, 400]] = True
+    monkeypatch.setattr(features, "detect_r_peaks", lambda matrix, fs: peaks)
+
+    result = compute_rhythm_features(np.zeros((1, 600)), 100.0)
+    assert result[RhythmFeatures.RR_MEAN.value][0] == pytest.approx(0.975)
+    assert result[RhythmFeatures.RR_RMSSD.value][0] == pytest.approx(np.sqrt(0.005))
+    assert result[RhythmFeatures.PNN50.value][0] == pytest.approx(0.5)
+
+
+def test_too_few_beats_are_unknown():
+    """Recordings without two valid intervals get NaN statistics."""
+    result = compute_rhythm_features(np.zeros((1, 1024)), SAMPLING_FREQUENCY)
+    assert np.isnan(result[RhythmFeatures.RR_MEAN.value][0])
+    assert (
+        result[RhythmFeatures.RHYTHM_REGULARITY.value][0]
+        == RhythmRegularity.UNKNOWN.value
+    )
+
+
+def test_add_rhythm_features_keeps_row_order():
+    """Recordings of different sampling frequencies are returned in their original rows."""
+    df = pd.DataFrame(
+        {
+            "ECGRecording": [pulse_train(0.5).tolist(), pulse_train(1.0)[::2].tolist()],
+            "SamplingFrequency": [SAMPLING_FREQUENCY, SAMPLING_FREQUENCY / 2],
+        },
+        index=[7, 3],
+    )
+    result = add_rhythm_features(df)
+    assert result.loc[[7, 3], RhythmFeatures.BEAT_COUNT.value].tolist() == [20, 10]
+
+
+def test_short_and_empty_recordings_have_no_peaks():
+    """Batches too short to filter, e.g., truncated uploads, do not stop the others."""
+    df = pd.DataFrame(
+        {
+            "ECGRecording": [pulse_train(0.5).tolist(), [0.1] * 10, []],
+            "SamplingFrequency": [SAMPLING_FREQUENCY, 256.0, 128.0],
+        }
+    )
+    result = add_rhythm_features(df)
+    assert result[RhythmFeatures.BEAT_COUNT.value].tolist() == [20, 0, 0]
+    assert not detect_r_peaks(np.zeros((2, 10)), 256.0).any()
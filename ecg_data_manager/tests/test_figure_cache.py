@@ -0,0 +1,61 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the content-addressed figure cache.
+"""
+
+# Related third-party imports
+import numpy as np
+
+# Local application/library specific imports
+from ecg_data_manager.modules.figure_cache import FigureCache, figure_cache_key
+from ecg_data_manager.modules.plotting import ECG_PART_COLUMNS
+
+
+def make_row(offset: float = 0.0) -> dict:
+    """Create a recording of three constant 10-second parts at 4 Hz."""
+    row = {
+        column: np.full(40, offset + part)
+        for part, column in enumerate(ECG_PART_COLUMNS)
+    }
+    row.update({"SamplingFrequency": 4.0, "EffectiveDateTimeHHMM": "2024-01-01 10:00"})
+    return row
+
+
+def test_key_depends_on_waveform_and_parameters():
+    """The key changes with the samples and the decimation, and only with them."""
+    assert figure_cache_key(make_row()) == figure_cache_key(make_row())
+    assert figure_cache_key(make_row()) != figure_cache_key(make_row(0.5))
+    assert figure_cache_key(make_row()) != figure_cache_key(make_row(), decimation=2)
+
+
+def test_get_returns_stored_figure(tmp_path):
+    """A stored figure is returned, and a missing one is a cache miss."""
+    cache = FigureCache(str(tmp_path))
+    cache.put("ab12", b"png")
+    assert cache.get("ab12") == b"png"
+    assert cache.get("cd34") is None
+
+
+def test_replacing_an_entry_keeps_the_total_size(tmp_path):
+    """Overwriting a key counts only the new figure towards the size bound."""
+    cache = FigureCache(str(tmp_path), max_bytes=100)
+    for _ in range(5):
+        cache.put("ab12", b"x" * 60)
+    assert cache.get("ab12") == b"x" * 60
+    assert cache._total_bytes == 60  # pylint: disable=protected-access
+
+
+def test_evicts_least_recently_used(tmp_path):
+    """Exceeding the size bound evicts the oldest entries first."""
+    cache = FigureCache(str(tmp_path), max_bytes=100)
+    cache.put("aa01", b"x" * 60)
+    cache.put("bb02", b"y" * 60)
+    assert cache.get("aa01") is None
+    assert cache.get("bb02") == b"y" * 60
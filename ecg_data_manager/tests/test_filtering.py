@@ -0,0 +1,103 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the batched zero-phase ECG filtering stage.
+"""
+
+# Related third-party imports
+import numpy as np
+import pandas as pd
+
+# Local application/library specific imports
+from ecg_data_manager.modules.filtering import (
+    FILTERED_PART_COLUMNS,
+    FilteredColumns,
+    add_filtered_waveforms,
+    filter_waveforms,
+    with_filtered_parts,
+)
+from ecg_data_manager.modules.waveforms import ECG_PART_COLUMNS
+
+SAMPLING_FREQUENCY = 512.0
+
+
+def amplitude(signal: np.ndarray, frequency: float) -> float:
+    """Return the amplitude of one frequency component of a signal."""
+    t = np.arange(signal.size) / SAMPLING_FREQUENCY
+    return 2 * abs(np.mean(signal * np.exp(-2j * np.pi * frequency * t)))
+
+
+def test_removes_baseline_and_mains_but_keeps_qrs_band():
+    """Baseline wander and 60 Hz mains are suppressed, 10 Hz passes unchanged."""
+    t = np.arange(int(20 * SAMPLING_FREQUENCY)) / SAMPLING_FREQUENCY
+    qrs, wander, mains = (np.sin(2 * np.pi * f * t) for f in (10.0, 0.1, 60.0))
+    filtered = filter_waveforms((qrs + wander + mains)[np.newaxis], SAMPLING_FREQUENCY)
+    assert amplitude(filtered[0], 10.0) > 0.95
+    assert amplitude(filtered[0], 0.1) < 0.05
+    assert amplitude(filtered[0], 60.0) < 0.05
+
+
+def test_keeps_nan_padding():
+    """The padding of shorter recordings stays NaN and the output is float32."""
+    matrix = np.random.default_rng(0).normal(size=(2, 2048))
+    matrix[1, 1024:] = np.nan
+    filtered = filter_waveforms(matrix, SAMPLING_FREQUENCY)
+    assert filtered.dtype == np.float32
+    assert np.isnan(filtered[1, 1024:]).all()
+    assert not np.isnan(filtered[1, :1024]).any()
+
+
+def test_filtered_parts_are_views_into_the_filtered_recording():
+    """The filtered parts share the memory of the filtered recording of their row."""
+    samples = int(30 * SAMPLING_FREQUENCY)
+    df = pd.DataFrame(
+        {
+            "ECGRecording": [np.sin(np.arange(samples) / 10.0).tolist()],
+            "SamplingFrequency": [SAMPLING_FREQUENCY],
+        }
+    )
+    df = add_filtered_waveforms(df)
+    recording = df[FilteredColumns.ECG_RECORDING.value].iloc[0]
+    assert recording.size == samples
+    for column in FILTERED_PART_COLUMNS:
+        assert np.shares_memory(df[column].iloc[0], recording)
+        assert df[column].iloc[0].size == samples // 3
+
+
+def test_with_filtered_parts_swaps_columns():
+    """The raw parts and recording of a row are replaced by the filtered ones."""
+    row = pd.Series(
+        {
+            **{column: "raw" for column in ECG_PART_COLUMNS},
+            **{column: "filtered" for column in FILTERED_PART_COLUMNS},
+            "ECGRecording": "raw",
+            FilteredColumns.ECG_RECORDING.value: "filtered",
+        }
+    )
+    swapped = with_filtered_parts(row)
+    assert swapped[ECG_PART_COLUMNS + ["ECGRecording"]].eq("filtered").all()
+    assert row["ECGRecording"] == "raw"
+
+
+def test_short_batches_are_left_unfiltered():
+    """Batches too short for the zero-phase filter are returned unchanged."""
+    matrix = np.array([[0.1] * 10, [0.2] * 5 + [np.nan] * 5])
+    filtered = filter_waveforms(matrix, 256.0)
+    np.testing.assert_array_equal(filtered, matrix.astype(np.float32))
+    assert filter_waveforms(np.zeros((1, 0)), 256.0).shape == (1, 0)
+
+    df = add_filtered_waveforms(
+        pd.DataFrame(
+            {
+                "ECGRecording": [[0.1] * 10, np.sin(np.arange(2048) / 10.0).tolist()],
+                "SamplingFrequency": [256.0, SAMPLING_FREQUENCY],
+            }
+        )
+    )
+    assert df[FilteredColumns.ECG_RECORDING.value].map(len).tolist() == [10, 2048]
@@ -0,0 +1,84 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the live review-status updates.
+"""
+
+# Standard library imports
+import threading
+from unittest.mock import MagicMock
+
+# Related third-party imports
+import pandas as pd
+import pytest
+
+# Local application/library specific imports
+from ecg_data_manager.modules.live_updates import (
+    ADDED,
+    COMPLETE_REVIEW,
+    INCOMPLETE_REVIEW,
+    MAX_REVIEWS,
+    REMOVED,
+    ReviewStatusListener,
+)
+
+
+@pytest.fixture(name="df_ecg")
+def fixture_df_ecg():
+    """Two recordings, the first one reviewed by 'AB'."""
+    return pd.DataFrame(
+        {
+            "ResourceId": ["ecg1", "ecg2"],
+            "NumberOfReviewers": [1, 0],
+            "Reviewers": [["AB"], []],
+            "ReviewStatus": [INCOMPLETE_REVIEW, INCOMPLETE_REVIEW],
+        }
+    )
+
+
+def test_repeated_change_is_counted_once(df_ecg):
+    """Applying the same diagnosis twice, e.g., locally and from the snapshot, is a no-op."""
+    on_change = MagicMock()
+    listener = ReviewStatusListener(MagicMock(), df_ecg, on_change=on_change)
+    listener.apply_changes([("ecg2", "diagnosis1", "CD", ADDED)])
+    listener.apply_changes([("ecg2", "diagnosis1", "CD", ADDED)])
+    assert df_ecg.at[1, "NumberOfReviewers"] == 1
+    assert df_ecg.at[1, "Reviewers"] == ["CD"]
+    on_change.assert_called_with({"ecg2"})
+
+
+def test_full_snapshot_resets_and_completes(df_ecg):
+    """The initial snapshot replaces all reviews and marks complete recordings."""
+    listener = ReviewStatusListener(MagicMock(), df_ecg)
+    listener.apply_changes(
+        [("ecg2", f"diagnosis{i}", f"R{i}", ADDED) for i in range(MAX_REVIEWS)],
+        full=True,
+    )
+    assert df_ecg["NumberOfReviewers"].tolist() == [0, MAX_REVIEWS]
+    assert df_ecg["ReviewStatus"].tolist() == [INCOMPLETE_REVIEW, COMPLETE_REVIEW]
+
+    listener.apply_changes([("ecg2", "diagnosis0", "R0", REMOVED)])
+    assert df_ecg.at[1, "Reviewers"] == ["R1", "R2"]
+    assert df_ecg.at[1, "ReviewStatus"] == INCOMPLETE_REVIEW
+
+
+def test_updates_hold_the_shared_lock(df_ecg):
+    """The DataFrame is only updated while the lock shared with the viewer is free."""
+    lock = threading.RLock()
+    listener = ReviewStatusListener(MagicMock(), df_ecg, lock=lock)
+    with lock:
+        thread = threading.Thread(
+            target=listener.apply_changes, args=([("ecg2", "d", "CD", ADDED)],)
+        )
+        thread.start()
+        thread.join(timeout=0.2)
+        assert thread.is_alive()
+        assert df_ecg.at[1, "NumberOfReviewers"] == 0
+    thread.join(timeout=5)
+    assert df_ecg.at[1, "NumberOfReviewers"] == 1
@@ -0,0 +1,63 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the reuse of cached waveform features in incremental runs.
+"""
+
+# Related third-party imports
+import numpy as np
+import pandas as pd
+
+# Local application/library specific imports
+from ecg_data_manager.modules.utils import (
+    WAVEFORM_FEATURE_COLUMNS,
+    add_waveform_features,
+    split_ecg_recording_in_10sec_parts,
+)
+
+SAMPLING_FREQUENCY = 512.0
+
+
+def recordings(resource_ids: list[str]) -> pd.DataFrame:
+    """Create flattened 30-second recordings in µV with a beat every second, split into parts."""
+    t = np.arange(int(30 * SAMPLING_FREQUENCY)) / SAMPLING_FREQUENCY
+    samples = 1000 * (np.sin(2 * np.pi * t) ** 63 + 0.1 * np.sin(2 * np.pi * 7 * t))
+    return split_ecg_recording_in_10sec_parts(
+        pd.DataFrame(
+            {
+                "ResourceId": resource_ids,
+                "ECGRecording": [" ".join(map(str, samples)) for _ in resource_ids],
+                "SamplingFrequency": SAMPLING_FREQUENCY,
+            }
+        )
+    )
+
+
+def test_reuses_only_rows_with_the_same_sampling_frequency():
+    """Cached rows are reused by ResourceId if their sampling frequency matches."""
+    cached = add_waveform_features(recordings(["same", "resampled"]))
+    cached.loc[cached["ResourceId"] == "resampled", "SamplingFrequency"] = 256.0
+    cached["MeanHR"] = -1.0
+
+    reused_ids = []
+    df = add_waveform_features(
+        recordings(["same", "resampled", "new"]), cached=cached, reused_ids=reused_ids
+    )
+    assert reused_ids == ["same"]
+    assert df["MeanHR"].eq(-1.0).tolist() == [True, False, False]
+
+
+def test_nothing_is_reused_without_all_feature_columns():
+    """A cache without some feature column is not used at all."""
+    cached = add_waveform_features(recordings(["same"])).drop(
+        columns=WAVEFORM_FEATURE_COLUMNS[-1]
+    )
+    reused_ids = []
+    add_waveform_features(recordings(["same"]), cached=cached, reused_ids=reused_ids)
+    assert not reused_ids
@@ -0,0 +1,84 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the review priority engine.
+"""
+
+# Related third-party imports
+import pandas as pd
+import pytest
+
+# Local application/library specific imports
+from ecg_data_manager.modules.priority import (
+    PriorityEngine,
+    PriorityKeys,
+    prioritize_recordings,
+)
+
+
+@pytest.fixture(name="df_ecg")
+def fixture_df_ecg():
+    """Recordings that differ in one priority key at a time."""
+    return pd.DataFrame(
+        {
+            "ResourceId": ["sinus", "afib", "symptoms", "child", "started", "older"],
+            "AppleElectrocardiogramClassification": [
+                "sinusRhythm",
+                "atrialFibrillation",
+            ]
+            + ["sinusRhythm"] * 4,
+            "Symptoms": ["No symptoms.", "No symptoms.", "Palpitations"]
+            + ["No symptoms."] * 3,
+            "AgeGroup": ["Adult", "Adult", "Adult", "Child", "Adult", "Adult"],
+            "NumberOfReviewers": [0, 0, 0, 0, 2, 0],
+            "EffectiveDateTime": ["2024-01-02"] * 5 + ["2024-01-01"],
+        },
+        index=[10, 11, 12, 13, 14, 15],
+    )
+
+
+def test_keys_order_recordings(df_ecg):
+    """Severity, symptoms, age group, reviews, and date rank in that order."""
+    ranked = prioritize_recordings(df_ecg)
+    assert ranked["ResourceId"].tolist() == [
+        "afib",
+        "symptoms",
+        "child",
+        "started",
+        "older",
+        "sinus",
+    ]
+
+
+def test_ranks_keep_the_index(df_ecg):
+    """Ranks and priorities are indexed like the data."""
+    engine = PriorityEngine(df_ecg)
+    assert engine.ranks().loc[11] == 0
+    assert engine.priorities().index.equals(df_ecg.index)
+
+
+def test_update_reviews_reranks_one_recording(df_ecg):
+    """A recording moves up when started and drops to the end when complete."""
+    engine = PriorityEngine(df_ecg)
+    assert engine.update_reviews("sinus", 2) == 3
+    assert engine.update_reviews("started", 3) == 5
+    assert engine.sort(df_ecg)["ResourceId"].tolist()[3:] == [
+        "sinus",
+        "older",
+        "started",
+    ]
+    assert engine.update_reviews("unknown", 1) is None
+
+
+def test_weights_override_defaults(df_ecg):
+    """Custom weights change the order, and unknown keys are rejected."""
+    engine = PriorityEngine(df_ecg, {PriorityKeys.SEVERITY.value: 0.0})
+    assert engine.sort(df_ecg)["ResourceId"].iloc[0] == "symptoms"
+    with pytest.raises(ValueError):
+        PriorityEngine(df_ecg, {"unknown": 1.0})
@@ -0,0 +1,60 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the batch signal-quality index.
+"""
+
+# Related third-party imports
+import numpy as np
+
+# Local application/library specific imports
+from ecg_data_manager.modules.quality import (
+    SignalQuality,
+    SignalQualityLabel,
+    compute_signal_quality,
+)
+from ecg_data_manager.modules.waveforms import NUMBER_OF_PARTS, PART_DURATION_SEC
+
+SAMPLING_FREQUENCY = 512.0
+
+
+def clean_recording() -> np.ndarray:
+    """Create 30 seconds of a noisy 1 Hz pulse train on a slow oscillation in mV."""
+    t = np.arange(int(NUMBER_OF_PARTS * PART_DURATION_SEC * SAMPLING_FREQUENCY))
+    t = t / SAMPLING_FREQUENCY
+    noise = np.random.default_rng(0).normal(scale=0.02, size=t.size)
+    pulses = np.exp(-(((t % 1.0 - 0.5) / 0.02) ** 2))
+    return 0.2 * np.sin(2 * np.pi * 1.3 * t) + pulses + noise
+
+
+def test_clean_recording_is_good():
+    """A clean tracing scores close to 1 in every part."""
+    results = compute_signal_quality(clean_recording()[np.newaxis], SAMPLING_FREQUENCY)
+    assert results[SignalQuality.LABEL.value][0] == SignalQualityLabel.GOOD.value
+    for part in range(NUMBER_OF_PARTS):
+        assert results[f"{SignalQuality.PART_SCORES.value}{part + 1}"][0] > 0.8
+
+
+def test_flatline_is_poor():
+    """A flat tracing is unusable."""
+    results = compute_signal_quality(
+        np.zeros((1, clean_recording().size)), SAMPLING_FREQUENCY
+    )
+    assert results[SignalQuality.FLATLINE.value][0] > 0.9
+    assert results[SignalQuality.LABEL.value][0] == SignalQualityLabel.POOR.value
+
+
+def test_missing_part_scores_only_that_part():
+    """A recording that ends after 20 seconds loses only the score of the third part."""
+    recording = clean_recording()
+    recording[int(2 * PART_DURATION_SEC * SAMPLING_FREQUENCY) :] = np.nan
+    results = compute_signal_quality(recording[np.newaxis], SAMPLING_FREQUENCY)
+    assert results[f"{SignalQuality.PART_SCORES.value}1"][0] > 0.8
+    assert results[f"{SignalQuality.PART_SCORES.value}3"][0] < 0.5
+    assert results[SignalQuality.NAN_RATIO.value][0] > 0.3
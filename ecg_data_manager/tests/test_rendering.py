@@ -0,0 +1,78 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the headless batch rendering.
+"""
+
+# Standard library imports
+import os
+
+# Related third-party imports
+import numpy as np
+import pandas as pd
+import pytest
+
+# Local application/library specific imports
+from ecg_data_manager.modules.rendering import render_ecg_batch
+
+SAMPLING_FREQUENCY = 128.0
+
+
+@pytest.fixture(name="data")
+def fixture_data():
+    """Three short recordings of two users."""
+    part = np.sin(np.arange(int(10 * SAMPLING_FREQUENCY)) / 10.0).tolist()
+    return pd.DataFrame(
+        {
+            "UserId": ["u1", "u1", "u2"],
+            "ResourceId": ["a", "b", "c"],
+            "SamplingFrequency": SAMPLING_FREQUENCY,
+            "EffectiveDateTimeHHMM": ["2024-01-02 10:00", "2024-01-01 10:00", "x"],
+            "ECGDataRecording1": [part] * 3,
+            "ECGDataRecording2": [part] * 3,
+            "ECGDataRecording3": [part] * 3,
+        }
+    )
+
+
+def statuses(report: pd.DataFrame) -> dict[str, str]:
+    """Map the file names of a report to their status."""
+    return dict(zip(report["Path"].map(os.path.basename), report["Status"]))
+
+
+def test_outputs_are_skipped_until_their_content_changes(data, tmp_path):
+    """Up-to-date outputs are skipped, and changed recordings are rendered again."""
+    first = render_ecg_batch(data, str(tmp_path), max_workers=1)
+    assert statuses(first) == {
+        "a.png": "rendered",
+        "b.png": "rendered",
+        "c.png": "rendered",
+    }
+    assert (tmp_path / "a.png").read_bytes().startswith(b"\x89PNG")
+
+    data.loc[data["ResourceId"] == "b", "EffectiveDateTimeHHMM"] = "2024-02-01 10:00"
+    second = render_ecg_batch(data, str(tmp_path), max_workers=1)
+    assert statuses(second) == {
+        "a.png": "skipped",
+        "b.png": "rendered",
+        "c.png": "skipped",
+    }
+
+
+def test_one_pdf_per_user(data, tmp_path):
+    """Per-user output writes one multi-page PDF per user."""
+    report = render_ecg_batch(data, str(tmp_path), per_user=True, max_workers=1)
+    assert statuses(report) == {"u1.pdf": "rendered", "u2.pdf": "rendered"}
+    assert (tmp_path / "u1.pdf").read_bytes().count(b"/Type /Page ") == 2
+
+
+def test_rejects_unknown_formats(data, tmp_path):
+    """Only PNG and PDF outputs are supported."""
+    with pytest.raises(ValueError):
+        render_ecg_batch(data, str(tmp_path), output_format="svg")
@@ -0,0 +1,76 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the resampling to a canonical sampling rate.
+"""
+
+# Related third-party imports
+import numpy as np
+import pandas as pd
+import pytest
+
+# Local application/library specific imports
+from ecg_data_manager.modules.resampling import (
+    SOURCE_SAMPLING_FREQUENCY,
+    resample_recordings,
+    resample_waveforms,
+    resampling_factors,
+)
+
+
+def sine(frequency: float, sampling_rate: float, seconds: float) -> np.ndarray:
+    """Create a sine wave."""
+    t = np.arange(int(seconds * sampling_rate)) / sampling_rate
+    return np.sin(2 * np.pi * frequency * t)
+
+
+def test_factors_are_reduced_fractions():
+    """The rate ratio is expressed by the smallest integer factors."""
+    assert resampling_factors(256.0, 512.0) == (2, 1)
+    assert resampling_factors(500.0, 512.0) == (128, 125)
+    assert resampling_factors(512.0, 512.0) == (1, 1)
+
+
+def test_resampling_keeps_the_signal_and_nan_padding():
+    """A sine keeps its shape, and every row keeps its own NaN-padded length."""
+    matrix = np.stack([sine(5.0, 256.0, 4.0), sine(5.0, 256.0, 4.0)])
+    matrix[1, 512:] = np.nan
+    resampled = resample_waveforms(matrix, 256.0, 512.0)
+
+    assert resampled.shape == (2, 2048)
+    assert np.isnan(resampled[1, 1024:]).all()
+    assert not np.isnan(resampled[1, :1024]).any()
+    expected = sine(5.0, 512.0, 4.0)
+    # The edges are affected by the anti-aliasing filter
+    assert np.abs(resampled[0, 100:-100] - expected[100:-100]).max() < 0.01
+
+
+def test_same_rate_is_copied():
+    """Recordings at the target rate are returned unchanged as a copy."""
+    matrix = np.ones((1, 10))
+    resampled = resample_waveforms(matrix, 512.0, 512.0)
+    assert resampled is not matrix
+    assert np.array_equal(resampled, matrix)
+
+
+def test_recordings_of_mixed_rates_share_one_rate():
+    """Recordings of all source rates end up at the canonical rate and length."""
+    df = pd.DataFrame(
+        {
+            "ECGRecording": [
+                sine(5.0, rate, 30.0).tolist() for rate in (512.0, 500.0, 256.0)
+            ],
+            "SamplingFrequency": [512, 500, 256],
+        }
+    )
+    df = resample_recordings(df, 512.0)
+    assert df["ECGRecording"].map(len).tolist() == [15360] * 3
+    assert df["SamplingFrequency"].eq(512.0).all()
+    assert df[SOURCE_SAMPLING_FREQUENCY].tolist() == [512.0, 500.0, 256.0]
+    assert np.mean(df["ECGRecording"].iloc[1]) == pytest.approx(0.0, abs=0.01)
@@ -0,0 +1,127 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the offline review journal.
+"""
+
+# Standard library imports
+from unittest.mock import MagicMock
+
+# Related third-party imports
+import pytest
+from google.api_core.exceptions import Aborted, ServiceUnavailable
+
+# Local application/library specific imports
+from ecg_data_manager.modules import review_journal
+from ecg_data_manager.modules.review_journal import (
+    MAX_REVIEWS,
+    PHYSICIAN_INITIALS,
+    JournalStatus,
+    ReviewJournal,
+)
+
+
+@pytest.fixture(name="journal")
+def fixture_journal(tmp_path):
+    """An empty journal in a temporary directory."""
+    return ReviewJournal(str(tmp_path / "journal.sqlite3"))
+
+
+@pytest.fixture(autouse=True, name="transactional")
+def fixture_transactional(monkeypatch):
+    """Run transactions like Firestore: commit after the function, retry if aborted."""
+
+    def transactional(function):
+        def run(transaction):
+            while True:
+                result = function(transaction)
+                try:
+                    transaction.commit()
+                    return result
+                except Aborted:
+                    continue
+
+        return run
+
+    monkeypatch.setattr(review_journal.firestore, "transactional", transactional)
+
+
+def reviews(initials: list[str]) -> list[MagicMock]:
+    """Diagnosis documents with reviews by the given initials."""
+    docs = []
+    for index, reviewer in enumerate(initials):
+        doc = MagicMock(id=f"existing{index}")
+        doc.to_dict.return_value = {PHYSICIAN_INITIALS: reviewer}
+        docs.append(doc)
+    return docs
+
+
+def mock_db(existing_reviews: list[str] | None = None) -> MagicMock:
+    """A mock Firestore client whose recordings have reviews by the given initials."""
+    db = MagicMock()
+    diagnosis_ref = db.collection().document().collection().document().collection()
+    diagnosis_ref.stream.return_value = reviews(existing_reviews or [])
+    return db
+
+
+def test_records_pending_entries(journal):
+    """Recorded diagnoses are pending and listed per recording."""
+    journal.record("user", "ecg1", {PHYSICIAN_INITIALS: "AB"})
+    journal.record("user", "ecg2", {PHYSICIAN_INITIALS: "CD"})
+    assert journal.entries(JournalStatus.PENDING)["document_id"].tolist() == [
+        "ecg1",
+        "ecg2",
+    ]
+    assert journal.diagnoses_of("ecg1") == [{PHYSICIAN_INITIALS: "AB"}]
+    assert not journal.diagnoses_of("ecg3")
+
+
+def test_sync_writes_pending_entries_in_batches(journal):
+    """Pending entries are created in batched transactions and marked as synced."""
+    for initials in ("AB", "CD", "EF"):
+        journal.record("user", f"ecg-{initials}", {PHYSICIAN_INITIALS: initials})
+    db = mock_db()
+    summary = journal.sync(db, batch_size=2)
+    assert summary == {"pending": 0, "synced": 3, "conflict": 0}
+    assert db.transaction().commit.call_count == 2
+    assert db.transaction().create.call_count == 3
+    assert len(journal.diagnoses_of("ecg-AB")) == 1
+
+
+def test_sync_marks_conflicts(journal):
+    """Reviews beyond the limit or by a repeated reviewer are conflicts, not writes."""
+    journal.record("user", "ecg", {PHYSICIAN_INITIALS: "AB"})
+    journal.record("user", "ecg", {PHYSICIAN_INITIALS: "CD"})
+    summary = journal.sync(mock_db(["AB"] + ["XY"] * (MAX_REVIEWS - 2)))
+    assert summary == {"pending": 0, "synced": 1, "conflict": 1}
+    assert journal.diagnoses_of("ecg") == [{PHYSICIAN_INITIALS: "CD"}]
+
+
+def test_interrupted_sync_keeps_entries_pending(journal):
+    """Entries stay pending if the connection is lost during the sync."""
+    journal.record("user", "ecg", {PHYSICIAN_INITIALS: "AB"})
+    db = mock_db()
+    db.transaction().commit.side_effect = ServiceUnavailable("offline")
+    assert journal.sync(db)["pending"] == 1
+    assert journal.diagnoses_of("ecg") == [{PHYSICIAN_INITIALS: "AB"}]
+
+
+def test_review_saved_during_sync_is_a_conflict(journal):
+    """A review saved between the read and the commit makes the entry a conflict."""
+    journal.record("user", "ecg", {PHYSICIAN_INITIALS: "AB"})
+    db = mock_db()
+    diagnosis_ref = db.collection().document().collection().document().collection()
+    diagnosis_ref.stream.side_effect = [
+        reviews(["XY", "ZW"]),
+        reviews(["XY", "ZW", "UV"]),
+    ]
+    db.transaction().commit.side_effect = [Aborted("contention"), None]
+    summary = journal.sync(db)
+    assert summary == {"pending": 0, "synced": 0, "conflict": 1}
+    assert not journal.diagnoses_of("ecg")
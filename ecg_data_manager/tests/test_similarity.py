@@ -0,0 +1,82 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the beat-morphology similarity index.
+"""
+
+# Related third-party imports
+import numpy as np
+import pandas as pd
+import pytest
+
+# Local application/library specific imports
+from ecg_data_manager.modules.duplicates import DuplicateColumns
+from ecg_data_manager.modules.similarity import (
+    EMBEDDING_LENGTH,
+    SimilarityColumns,
+    SimilarityIndex,
+    beat_embeddings,
+)
+
+SAMPLING_FREQUENCY = 512.0
+R_PEAKS = np.arange(256, 5120, 512)
+
+
+def beats(width: float, inverted: bool = False, seed: int = 0) -> np.ndarray:
+    """Create 10 seconds of beats of a given QRS width at the R_PEAKS, with some noise."""
+    t = np.arange(int(10 * SAMPLING_FREQUENCY))
+    signal = np.exp(-(((t[:, np.newaxis] - R_PEAKS) / width) ** 2)).sum(axis=1)
+    noise = np.random.default_rng(seed).normal(scale=0.01, size=t.size)
+    return (-signal if inverted else signal) + noise
+
+
+def test_embeddings_are_unit_length():
+    """Every recording with a complete beat gets a unit-length embedding."""
+    matrix = np.stack([beats(5.0), beats(20.0)])
+    embeddings = beat_embeddings(matrix, SAMPLING_FREQUENCY, [R_PEAKS, R_PEAKS])
+    assert embeddings.shape == (2, EMBEDDING_LENGTH)
+    assert np.linalg.norm(embeddings, axis=1) == pytest.approx([1.0, 1.0], rel=1e-5)
+
+
+def test_recordings_without_complete_beat_are_nan():
+    """A recording whose only R-peak is at the border has no embedding."""
+    embeddings = beat_embeddings(
+        beats(5.0)[np.newaxis], SAMPLING_FREQUENCY, [np.array([10])]
+    )
+    assert np.isnan(embeddings).all()
+
+
+def test_query_ranks_similar_morphology_first():
+    """Recordings with the same beat shape are more similar than inverted beats."""
+    df = pd.DataFrame(
+        {
+            "ResourceId": ["narrow", "narrow2", "wide", "inverted", "duplicate"],
+            "ECGRecording": [
+                beats(5.0).tolist(),
+                beats(5.0, seed=1).tolist(),
+                beats(20.0).tolist(),
+                beats(5.0, inverted=True).tolist(),
+                beats(5.0).tolist(),
+            ],
+            "SamplingFrequency": SAMPLING_FREQUENCY,
+            DuplicateColumns.IS_DUPLICATE.value: [False, False, False, False, True],
+        }
+    )
+    index = SimilarityIndex.from_dataframe(df)
+
+    assert len(index) == 4 and "duplicate" not in index
+    results = index.query("narrow", k=3)
+    assert results[SimilarityColumns.RESOURCE_ID.value].tolist() == [
+        "narrow2",
+        "wide",
+        "inverted",
+    ]
+    assert results[SimilarityColumns.SIMILARITY.value].iloc[0] > 0.99
+    with pytest.raises(KeyError):
+        index.query("duplicate")
@@ -0,0 +1,129 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the interactive ECG data explorer.
+"""
+
+# Standard library imports
+from unittest.mock import MagicMock
+
+# Related third-party imports
+import pandas as pd
+import pytest
+
+# Local application/library specific imports
+from ecg_data_manager.modules import visualization
+from ecg_data_manager.modules.similarity import SimilarityColumns
+from ecg_data_manager.modules.visualization import ECGDataExplorer, WidgetStrings
+
+
+@pytest.fixture(name="explorer")
+def fixture_explorer(monkeypatch):
+    """An explorer of three recordings that records the plotted recordings."""
+    data = pd.DataFrame(
+        {
+            "ResourceId": ["a", "b", "c"],
+            "UserId": ["u1", "u1", "u2"],
+            "EffectiveDateTimeHHMM": ["2024-01-01 10:00"] * 3,
+            "AgeGroup": ["6-11", "6-11", "12-17"],
+            "AppleElectrocardiogramClassification": ["sinusRhythm"] * 3,
+            "IsDuplicate": [False, True, False],
+            "CanonicalResourceId": ["a", "a", "c"],
+        }
+    )
+    explorer = ECGDataExplorer(data)
+    plotted = MagicMock()
+    monkeypatch.setattr(
+        explorer, "plot_single_ecg", lambda row: plotted(row["ResourceId"])
+    )
+    explorer.plotted = plotted
+    return explorer
+
+
+def plotted_ids(explorer) -> list[str]:
+    """Return and reset the IDs of the recordings plotted since the last call."""
+    resource_ids = [call.args[0] for call in explorer.plotted.call_args_list]
+    explorer.plotted.reset_mock()
+    return resource_ids
+
+
+def test_toggling_filtered_waveforms_redraws_the_plots(explorer):
+    """The shown recordings are redrawn at once, even if the selection changed since."""
+    explorer.filtered_checkbox.value = True
+    assert not plotted_ids(explorer)
+
+    explorer.user_id_dropdown.value = "u1"
+    explorer.plot_ecg_recording()
+    assert plotted_ids(explorer) == ["a", "b"]
+
+    explorer.user_id_dropdown.value = "u2"
+    explorer.filtered_checkbox.value = False
+    assert plotted_ids(explorer) == ["a", "b"]
+
+
+@pytest.fixture(name="messages")
+def fixture_messages(monkeypatch):
+    """The texts of the HTML widgets the explorer displays."""
+    messages = []
+    monkeypatch.setattr(
+        visualization,
+        "display",
+        lambda *shown: messages.extend(getattr(item, "value", "") for item in shown),
+    )
+    return messages
+
+
+def mock_index(indexed: list[str]) -> MagicMock:
+    """A similarity index of the given recordings that finds recording 'c' as similar."""
+    index = MagicMock()
+    index.__contains__.side_effect = indexed.__contains__
+    index.query.return_value = pd.DataFrame(
+        {
+            SimilarityColumns.RESOURCE_ID.value: ["c"],
+            SimilarityColumns.SIMILARITY.value: [0.9],
+        }
+    )
+    return index
+
+
+def test_toggling_filtered_waveforms_redraws_similar_recordings(explorer, messages):
+    """The searched recording and its similar recordings are redrawn at once."""
+    explorer.similarity_index = mock_index(["a", "c"])
+    explorer.plot_similar_recordings()
+    assert plotted_ids(explorer) == ["a", "c"]
+    assert WidgetStrings.NO_SIMILAR.value not in messages
+
+    explorer.filtered_checkbox.value = True
+    assert plotted_ids(explorer) == ["a", "c"]
+
+
+def test_duplicates_are_searched_by_their_canonical_recording(explorer, messages):
+    """A duplicate upload shows the recordings similar to the upload it duplicates."""
+    explorer.similarity_index = mock_index(["a", "c"])
+    explorer.filtered_data = explorer.data.iloc[[1]]
+    explorer.plot_similar_recordings()
+
+    explorer.similarity_index.query.assert_called_once()
+    assert explorer.similarity_index.query.call_args.args[0] == "a"
+    assert plotted_ids(explorer) == ["b", "c"]
+    assert WidgetStrings.DUPLICATE_OF.value.format("a") in messages
+    assert WidgetStrings.NO_SIMILAR.value not in messages
+
+    explorer.filtered_checkbox.value = True
+    assert plotted_ids(explorer) == ["b", "c"]
+
+
+def test_recordings_without_complete_beat_have_no_similar(explorer, messages):
+    """A recording missing from the index is reported as having no complete beat."""
+    explorer.similarity_index = mock_index(["c"])
+    explorer.plot_similar_recordings()
+
+    explorer.similarity_index.query.assert_not_called()
+    assert plotted_ids(explorer) == ["a"]
+    assert WidgetStrings.NO_SIMILAR.value in messages
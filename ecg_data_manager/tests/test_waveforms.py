@@ -0,0 +1,114 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the waveform windowing and batching helpers.
+"""
+
+# Related third-party imports
+import numpy as np
+import pytest
+
+# Local application/library specific imports
+from ecg_data_manager.modules.waveforms import (
+    TEN_SECOND_PARTS,
+    PaddingPolicy,
+    WindowSpec,
+    fill_nan_padding,
+    stack_waveforms,
+    window_waveforms,
+)
+
+SAMPLING_FREQUENCY = 512.0
+
+
+def test_window_spec_samples_and_starts():
+    """Lengths and hops are converted to samples, and the hop defaults to the length."""
+    assert TEN_SECOND_PARTS.samples(SAMPLING_FREQUENCY) == (5120, 5120)
+    spec = WindowSpec(5.0, hop_sec=2.5)
+    assert spec.samples(SAMPLING_FREQUENCY) == (2560, 1280)
+    assert spec.starts_sec(3).tolist() == [0.0, 2.5, 5.0]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"length_sec": 0.0},
+        {"length_sec": -1.0},
+        {"length_sec": float("nan")},
+        {"hop_sec": 0.0},
+        {"hop_sec": -1.0},
+        {"count": 0},
+    ],
+)
+def test_window_spec_rejects_invalid_windows(kwargs):
+    """Windows need a positive length and hop and at least one window."""
+    with pytest.raises(ValueError):
+        WindowSpec(**kwargs)
+
+
+def test_windows_have_at_least_one_sample():
+    """Windows shorter than a sample are one sample long."""
+    assert WindowSpec(0.001).samples(SAMPLING_FREQUENCY) == (1, 1)
+    windows = window_waveforms(np.zeros(4), SAMPLING_FREQUENCY, WindowSpec(0.001))
+    assert windows.shape == (4, 1)
+
+
+def test_ten_second_parts_are_views():
+    """The three 10-second parts of a recording share its memory and are read-only."""
+    recording = np.arange(int(30 * SAMPLING_FREQUENCY), dtype=np.float64)
+    windows = window_waveforms(recording, SAMPLING_FREQUENCY)
+    assert windows.shape == (3, 5120)
+    assert np.shares_memory(windows, recording)
+    assert windows[1, 0] == 5120
+    with pytest.raises(ValueError):
+        windows[0, 0] = 1.0
+
+
+def test_short_recordings_are_nan_padded():
+    """Windows past the end are NaN-padded, and a fixed count is always returned."""
+    recording = np.ones(int(25 * SAMPLING_FREQUENCY))
+    windows = window_waveforms(recording, SAMPLING_FREQUENCY)
+    assert windows.shape == (3, 5120)
+    assert np.isnan(windows[2, 2560:]).all()
+    assert not np.isnan(windows[2, :2560]).any()
+
+
+def test_overlapping_and_truncated_windows():
+    """Overlapping windows cover the recording; TRUNCATE drops the incomplete ones."""
+    recording = np.zeros(int(12 * SAMPLING_FREQUENCY))
+    overlapping = window_waveforms(recording, SAMPLING_FREQUENCY, WindowSpec(5.0, 2.5))
+    assert overlapping.shape == (4, 2560)
+    truncated = window_waveforms(
+        recording,
+        SAMPLING_FREQUENCY,
+        WindowSpec(5.0, 2.5, padding=PaddingPolicy.TRUNCATE),
+    )
+    assert truncated.shape == (3, 2560)
+    too_short = window_waveforms(
+        recording[:100],
+        SAMPLING_FREQUENCY,
+        WindowSpec(5.0, padding=PaddingPolicy.TRUNCATE),
+    )
+    assert too_short.shape == (0, 2560)
+
+
+def test_batches_and_integer_input():
+    """Batches of recordings are windowed per row, and integer samples become floats."""
+    batch = np.arange(2 * 3 * 512).reshape(2, 3 * 512)
+    windows = window_waveforms(batch, SAMPLING_FREQUENCY, WindowSpec(1.0))
+    assert windows.shape == (2, 3, 512)
+    assert windows.dtype == np.float64
+    assert windows[1, 2, -1] == batch[1, -1]
+
+
+def test_stack_and_fill_nan_padding():
+    """Recordings are NaN-padded to one length and the padding repeats the last sample."""
+    matrix = stack_waveforms([[1, 2, 3], [4], []])
+    assert matrix.shape == (3, 3) and matrix.dtype == np.float32
+    assert fill_nan_padding(matrix).tolist() == [[1, 2, 3], [4, 4, 4], [0, 0, 0]]
@@ -0,0 +1,105 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the background diagnosis write queue.
+"""
+
+# Standard library imports
+import threading
+import time
+from unittest.mock import MagicMock
+
+# Related third-party imports
+import pytest
+from google.api_core import exceptions as api_exceptions
+
+# Local application/library specific imports
+from ecg_data_manager.modules import write_queue
+from ecg_data_manager.modules.write_queue import (
+    MAX_REVIEWS,
+    DiagnosisWriteQueue,
+    WriteResult,
+    WriteStatus,
+)
+
+
+@pytest.fixture(name="db")
+def fixture_db(monkeypatch):
+    """A mock Firestore client whose transactions run the function once."""
+    monkeypatch.setattr(
+        write_queue.firestore, "transactional", lambda function: function
+    )
+    db = MagicMock()
+    diagnosis_ref = db.collection().document().collection().document().collection()
+    diagnosis_ref.document().get.return_value.exists = False
+    diagnosis_ref.stream.return_value = []
+    return db
+
+
+def diagnosis_ref_of(db: MagicMock) -> MagicMock:
+    """Return the mocked Diagnosis subcollection."""
+    return db.collection().document().collection().document().collection()
+
+
+def test_creates_review_in_transaction(db):
+    """A review is created with the transaction of the write."""
+    queue = DiagnosisWriteQueue(db)
+    result = queue.submit("user", "ecg", {"physicianInitials": "AB"}).result()
+    assert result.status == WriteStatus.SAVED
+    db.transaction().create.assert_called_once()
+
+
+def test_refuses_review_beyond_limit(db):
+    """No review is created once the recording has MAX_REVIEWS reviews."""
+    diagnosis_ref_of(db).stream.return_value = [object()] * MAX_REVIEWS
+    queue = DiagnosisWriteQueue(db)
+    result = queue.submit("user", "ecg", {}).result()
+    assert result.status == WriteStatus.ALREADY_REVIEWED
+    db.transaction().create.assert_not_called()
+
+
+def test_retry_after_lost_response_does_not_duplicate(db):
+    """A retry finds the review of the earlier attempt and does not write it again."""
+    diagnosis_doc_ref = diagnosis_ref_of(db).document()
+    diagnosis_doc_ref.get.side_effect = [
+        api_exceptions.ServiceUnavailable("lost"),
+        MagicMock(exists=True),
+    ]
+    queue = DiagnosisWriteQueue(db, initial_backoff=0.0)
+    result = queue.submit("user", "ecg", {}).result()
+    assert (result.status, result.attempts) == (WriteStatus.SAVED, 2)
+    db.transaction().create.assert_not_called()
+
+
+def test_gives_up_after_max_attempts(db):
+    """Transient errors are retried up to max_attempts times."""
+    diagnosis_ref_of(db).document().get.side_effect = api_exceptions.Aborted("busy")
+    queue = DiagnosisWriteQueue(db, max_attempts=3, initial_backoff=0.0)
+    result = queue.submit("user", "ecg", {}).result()
+    assert (result.status, result.attempts) == (WriteStatus.FAILED, 3)
+
+
+def test_wait_includes_callbacks(db, monkeypatch):
+    """wait() only returns once the on_done callbacks have completed."""
+    monkeypatch.setattr(
+        DiagnosisWriteQueue,
+        "_write",
+        lambda self, *args: WriteResult(WriteStatus.SAVED, 1),
+    )
+    callback_done = threading.Event()
+
+    def on_done(_):
+        time.sleep(0.2)
+        callback_done.set()
+
+    queue = DiagnosisWriteQueue(db)
+    queue.submit("user", "ecg", {}, on_done=on_done)
+    assert queue.wait(timeout=5)
+    assert callback_done.is_set()
+    assert queue.pending_count == 0
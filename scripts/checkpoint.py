@@ -0,0 +1,89 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Module for saving the progress of long-running invitation code jobs to a local JSON file.
+
+A checkpoint stores the parameters of a job and its progress. Loading a checkpoint with the
+same parameters resumes the job; the file is removed when the job completes.
+
+Classes:
+    Checkpoint: Progress of a job that is saved atomically after every step.
+"""
+
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+
+@dataclass
+class Checkpoint:
+    """
+    Progress of a job, saved to a local JSON file.
+
+    Attributes:
+        path (str): Local path of the checkpoint file.
+        parameters (Dict[str, Any]): The parameters of the job, which must match to resume.
+        progress (Dict[str, Any]): The progress of the job.
+        resumed (bool): Whether the progress was loaded from an existing file.
+    """
+
+    path: str
+    parameters: Dict[str, Any]
+    progress: Dict[str, Any] = field(default_factory=dict)
+    resumed: bool = False
+
+    @classmethod
+    def load(cls, path: str, **parameters) -> "Checkpoint":
+        """
+        Load the checkpoint of a job, or start a new one if the file does not exist.
+
+        Args:
+            path (str): Local path of the checkpoint file.
+            **parameters: The parameters of the job.
+
+        Returns:
+            Checkpoint: The saved progress, or an empty progress for a new job.
+
+        Raises:
+            ValueError: If the checkpoint file belongs to a job with other parameters.
+        """
+        if not os.path.exists(path):
+            return cls(path, parameters)
+
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved["parameters"] != parameters:
+            raise ValueError(
+                f"The checkpoint {path} belongs to a job with the parameters "
+                f"{saved['parameters']}; remove it to start a new job."
+            )
+        return cls(path, parameters, saved["progress"], resumed=True)
+
+    def save(self, **progress):
+        """
+        Update the progress and write the checkpoint file atomically.
+
+        Args:
+            **progress: The progress values to update.
+        """
+        self.progress.update(progress)
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump({"parameters": self.parameters, "progress": self.progress}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, self.path)
+
+    def complete(self):
+        """
+        Remove the checkpoint file after the job completed.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,172 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Module for reporting the usage of the invitation codes and the enrollment of users.
+
+All numbers are computed with Firestore count aggregation queries, so no documents are
+downloaded and the report is cheap enough to run periodically (e.g., from cron).
+
+Functions:
+    count_documents(query: Query) -> int: Counts the documents matching a query.
+    invitation_code_counts(db: Client) -> Dict[str, int]: Counts the total, used, and unused
+                                                          invitation codes.
+    enrollment_counts(db: Client, days: List[int], now: datetime | None = None)
+                                               -> Dict[str, int]: Counts the users and the users
+                                                                  enrolled in the last days.
+    main(): Connects to Firestore using FirebaseFHIRAccess and prints the report.
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+from spezi_data_pipeline.data_access.firebase_fhir_data_access import (
+    FirebaseFHIRAccess,
+)
+from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.client import Client
+from google.cloud.firestore_v1.query import Query
+
+DEFAULT_WINDOWS = [1, 7, 30]
+
+
+def count_documents(query: Query) -> int:
+    """
+    Count the documents matching a query with a count aggregation.
+
+    Args:
+        query (Query): The query or collection to count.
+
+    Returns:
+        int: The number of matching documents.
+    """
+    results = query.count(alias="count").get()
+    return int(results[0][0].value)
+
+
+def invitation_code_counts(db: Client) -> Dict[str, int]:
+    """
+    Count the invitation codes by usage.
+
+    Args:
+        db (Client): The Firestore client instance.
+
+    Returns:
+        Dict[str, int]: The number of 'total', 'used', and 'unused' invitation codes. Codes
+            without a 'used' field are only included in the total.
+    """
+    invitation_codes_collection = db.collection("invitationCodes")
+    return {
+        "total": count_documents(invitation_codes_collection),
+        "used": count_documents(
+            invitation_codes_collection.where(filter=FieldFilter("used", "==", True))
+        ),
+        "unused": count_documents(
+            invitation_codes_collection.where(filter=FieldFilter("used", "==", False))
+        ),
+    }
+
+
+def enrollment_counts(
+    db: Client, days: List[int], now: datetime | None = None
+) -> Dict[str, int]:
+    """
+    Count the users and the users enrolled within windows ending now.
+
+    Args:
+        db (Client): The Firestore client instance.
+        days (List[int]): The lengths of the enrollment windows in days.
+        now (datetime | None): The end of the windows (default is the current time).
+
+    Returns:
+        Dict[str, int]: The number of 'users' and of users enrolled in the 'last_{n}_days' by
+            their 'dateOfEnrollment'.
+    """
+    now = now or datetime.now(timezone.utc)
+    users_collection = db.collection("users")
+    counts = {"users": count_documents(users_collection)}
+    for window in days:
+        counts[f"last_{window}_days"] = count_documents(
+            users_collection.where(
+                filter=FieldFilter(
+                    "dateOfEnrollment", ">=", now - timedelta(days=window)
+                )
+            )
+        )
+    return counts
+
+
+def main():
+    """
+    Connects to Firestore using FirebaseFHIRAccess and prints the number of total, used, and
+    unused invitation codes and of the enrolled users.
+
+    Environment Variables:
+        FIRESTORE_EMULATOR_HOST (str): The Firestore emulator host (e.g., "localhost:8080").
+        GCLOUD_PROJECT (str): The Google Cloud project ID.
+
+    Command-line Arguments:
+        --days (List[int]): The lengths of the enrollment windows in days (default is 1 7 30).
+        --json (bool): Print the report as one line of JSON (default is False).
+        --service_account (str): The path to the service account JSON file for Firebase.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--days",
+        nargs="+",
+        default=DEFAULT_WINDOWS,
+        type=int,
+        help="The lengths of the enrollment windows in days",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the report as one line of JSON",
+    )
+    parser.add_argument(
+        "--service_account",
+        type=str,
+        help="The path to the service account JSON file for Firebase",
+    )
+    parsed = parser.parse_args()
+
+    # Assuming that the following environment variables are already set:
+    # export FIRESTORE_EMULATOR_HOST="localhost:8080"
+    # export GCLOUD_PROJECT=<project_id>
+    firebase_access = FirebaseFHIRAccess(
+        os.environ["GCLOUD_PROJECT"], parsed.service_account
+    )
+    firebase_access.connect()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "invitationCodes": invitation_code_counts(firebase_access.db),
+        "enrollment": enrollment_counts(firebase_access.db, parsed.days),
+    }
+
+    if parsed.json:
+        print(json.dumps(report))
+        return
+
+    codes = report["invitationCodes"]
+    print(
+        f"Invitation codes: {codes['total']} total, {codes['used']} used, "
+        f"{codes['unused']} unused."
+    )
+    enrollment = report["enrollment"]
+    print(f"Users: {enrollment['users']}.")
+    for window in parsed.days:
+        print(
+            f"Enrolled in the last {window} days: {enrollment[f'last_{window}_days']}."
+        )
+
+
+if __name__ == "__main__":
+    main()
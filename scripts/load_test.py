@@ -0,0 +1,469 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Module for load testing the checkInvitationCode enrollment path against the Firebase emulators.
+
+This module seeds invitation codes with the upload logic of `upload_codes.py`, fires a burst of
+concurrent checkInvitationCode calls at the Functions emulator, where a share of the calls
+race for a code that another user also redeems, and reports the latency percentiles, the
+rate of aborted calls, and whether any code was used twice.
+
+Functions:
+    emulator_id_token(user_id: str, project_id: str) -> str: Creates an unsigned ID token that
+                                                             the Functions emulator accepts.
+    duplicate_rate_argument(value: str) -> float: Parses a duplicate rate in [0, 1).
+    fresh_code_count(user_count: int, duplicate_rate: float) -> int: Counts the users redeeming
+                                                                     a fresh code.
+    plan_calls(codes: List[str], user_count: int, duplicate_rate: float, seed: int | None = None)
+                                       -> List[Tuple[str, str]]: Assigns codes to users.
+    call_check_invitation_code(url: str, project_id: str, user_id: str, code: str,
+                               timeout: float) -> CallResult: Calls the function once.
+    run_load(url: str, project_id: str, calls: List[Tuple[str, str]], concurrency: int,
+             timeout: float) -> List[CallResult]: Runs the calls concurrently.
+    latency_percentiles(results: List[CallResult]) -> Dict[str, float]: Computes the latency
+                                                                        percentiles.
+    verify_enrollments(db: Client, results: List[CallResult]) -> Dict[str, int]: Checks that no
+                                                                  code was used twice.
+    main(): Parses the command-line arguments, seeds the codes, and runs the load test.
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import secrets
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+from spezi_data_pipeline.data_access.firebase_fhir_data_access import (
+    FirebaseFHIRAccess,
+)
+from google.cloud.firestore_v1.client import Client
+from scripts.upload_codes import BulkUploadOptions, upload_invitation_codes
+
+OK = "OK"
+# Statuses of calls that were rejected as intended: the code was already used, or the user
+# is already enrolled
+REJECTED_STATUSES = {"NOT_FOUND", "ALREADY_EXISTS"}
+
+
+@dataclass
+class CallResult:
+    """
+    Outcome of one checkInvitationCode call.
+
+    Attributes:
+        user_id (str): The ID of the calling user.
+        code (str): The redeemed invitation code.
+        status (str): 'OK' or the status of the returned error (e.g., 'NOT_FOUND').
+        seconds (float): Latency of the call in seconds.
+    """
+
+    user_id: str
+    code: str
+    status: str
+    seconds: float
+
+
+def _base64url(data: dict) -> str:
+    """Encode a JSON object as unpadded base64url."""
+    encoded = base64.urlsafe_b64encode(json.dumps(data).encode("utf-8"))
+    return encoded.rstrip(b"=").decode("ascii")
+
+
+def emulator_id_token(user_id: str, project_id: str) -> str:
+    """
+    Create an unsigned ID token for a user.
+
+    The Functions emulator skips the verification of ID tokens, so the calls do not need users
+    in the Auth emulator. Production functions reject these tokens.
+
+    Args:
+        user_id (str): The ID of the user.
+        project_id (str): The Firebase project ID.
+
+    Returns:
+        str: The unsigned JWT.
+    """
+    now = int(time.time())
+    payload = {
+        "iss": f"https://securetoken.google.com/{project_id}",
+        "aud": project_id,
+        "sub": user_id,
+        "user_id": user_id,
+        "iat": now,
+        "exp": now + 3600,
+        "auth_time": now,
+        "firebase": {"sign_in_provider": "anonymous"},
+    }
+    return f"{_base64url({'alg': 'none', 'typ': 'JWT'})}.{_base64url(payload)}."
+
+
+def duplicate_rate_argument(value: str) -> float:
+    """
+    Parse the --duplicate_rate command-line argument.
+
+    Args:
+        value (str): The argument value.
+
+    Returns:
+        float: The share of users redeeming an already assigned code.
+
+    Raises:
+        argparse.ArgumentTypeError: If the value is not a number in [0, 1).
+    """
+    try:
+        rate = float(value)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(f"{value!r} is not a number.") from error
+    if not 0 <= rate < 1:
+        raise argparse.ArgumentTypeError(f"{rate} is not in [0, 1).")
+    return rate
+
+
+def fresh_code_count(user_count: int, duplicate_rate: float) -> int:
+    """
+    Count the users redeeming a fresh code. At least one user does, so that the others have a
+    code to race for.
+
+    Args:
+        user_count (int): The number of users.
+        duplicate_rate (float): The share of users redeeming an already assigned code, in
+            [0, 1).
+
+    Returns:
+        int: The number of fresh codes needed.
+
+    Raises:
+        ValueError: If the duplicate rate is not in [0, 1).
+    """
+    if not 0 <= duplicate_rate < 1:
+        raise ValueError(f"The duplicate rate {duplicate_rate} is not in [0, 1).")
+    if user_count <= 0:
+        return 0
+    return max(user_count - round(user_count * duplicate_rate), 1)
+
+
+def plan_calls(
+    codes: List[str], user_count: int, duplicate_rate: float, seed: int | None = None
+) -> List[Tuple[str, str]]:
+    """
+    Assign invitation codes to new users.
+
+    Every user redeems a fresh code, except that a share of the users redeems a code that is
+    already assigned to another user, to create contention on the same documents.
+
+    Args:
+        codes (List[str]): The seeded invitation codes.
+        user_count (int): The number of users.
+        duplicate_rate (float): The share of users redeeming an already assigned code, in
+            [0, 1).
+        seed (int | None): Seed of the random assignment (default is None).
+
+    Returns:
+        List[Tuple[str, str]]: Pairs of user ID and invitation code in a random order.
+
+    Raises:
+        ValueError: If the duplicate rate is not in [0, 1) or if there are fewer codes than
+            users redeeming a fresh code.
+    """
+    rng = random.Random(seed)
+    fresh = fresh_code_count(user_count, duplicate_rate)
+    duplicates = max(user_count - fresh, 0)
+    if fresh > len(codes):
+        raise ValueError(
+            f"{fresh} users need a fresh code, but only {len(codes)} exist."
+        )
+
+    run_id = secrets.token_hex(4)
+    assigned = codes[:fresh] + [rng.choice(codes[:fresh]) for _ in range(duplicates)]
+    calls = [
+        (f"loadtest-{run_id}-{index}", code) for index, code in enumerate(assigned)
+    ]
+    rng.shuffle(calls)
+    return calls
+
+
+def call_check_invitation_code(
+    url: str, project_id: str, user_id: str, code: str, timeout: float
+) -> CallResult:
+    """
+    Call the checkInvitationCode function once with the callable protocol.
+
+    Args:
+        url (str): The URL of the function.
+        project_id (str): The Firebase project ID.
+        user_id (str): The ID of the calling user.
+        code (str): The invitation code to redeem.
+        timeout (float): Timeout of the request in seconds.
+
+    Returns:
+        CallResult: The status and the latency of the call.
+    """
+    request = urllib.request.Request(
+        url,
+        data=json.dumps({"data": {"invitationCode": code}}).encode("utf-8"),
+        headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {emulator_id_token(user_id, project_id)}",
+        },
+        method="POST",
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = json.loads(response.read() or b"{}")
+    except urllib.error.HTTPError as error:
+        try:
+            body = json.loads(error.read() or b"{}")
+        except ValueError:
+            body = {"error": {"status": f"HTTP_{error.code}"}}
+    except OSError as error:
+        body = {"error": {"status": type(error).__name__}}
+    seconds = time.perf_counter() - start
+
+    status = body["error"].get("status", "UNKNOWN") if "error" in body else OK
+    return CallResult(user_id, code, status, seconds)
+
+
+def run_load(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    url: str,
+    project_id: str,
+    calls: List[Tuple[str, str]],
+    concurrency: int,
+    timeout: float,
+) -> List[CallResult]:
+    """
+    Fire the calls concurrently, starting the first `concurrency` calls at the same time.
+
+    Args:
+        url (str): The URL of the function.
+        project_id (str): The Firebase project ID.
+        calls (List[Tuple[str, str]]): Pairs of user ID and invitation code.
+        concurrency (int): The number of calls in flight at the same time.
+        timeout (float): Timeout of each request in seconds.
+
+    Returns:
+        List[CallResult]: The results in the order of the calls.
+    """
+    concurrency = max(1, min(concurrency, len(calls)))
+    start = threading.Barrier(concurrency)
+
+    def call(index: int, user_id: str, code: str) -> CallResult:
+        if index < concurrency:
+            try:
+                start.wait(timeout)
+            except threading.BrokenBarrierError:
+                pass
+        return call_check_invitation_code(url, project_id, user_id, code, timeout)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(call, index, user_id, code)
+            for index, (user_id, code) in enumerate(calls)
+        ]
+        return [future.result() for future in futures]
+
+
+def latency_percentiles(results: List[CallResult]) -> Dict[str, float]:
+    """
+    Compute the latency percentiles of the calls.
+
+    Args:
+        results (List[CallResult]): The results of the calls.
+
+    Returns:
+        Dict[str, float]: The 'p50', 'p95', and 'p99' latencies and the 'max' in milliseconds.
+    """
+    latencies = [result.seconds * 1000 for result in results]
+    if len(latencies) < 2:
+        latency = latencies[0] if latencies else 0.0
+        return {"p50": latency, "p95": latency, "p99": latency, "max": latency}
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "p50": percentiles[49],
+        "p95": percentiles[94],
+        "p99": percentiles[98],
+        "max": max(latencies),
+    }
+
+
+def verify_enrollments(db: Client, results: List[CallResult]) -> Dict[str, int]:
+    """
+    Check the enrollments against the Firestore documents after the load test.
+
+    Args:
+        db (Client): The Firestore client instance.
+        results (List[CallResult]): The results of the calls.
+
+    Returns:
+        Dict[str, int]: The number of 'codes_used_twice' (codes redeemed by more than one
+            successful call), 'enrollments_without_code' (enrolled users whose code names
+            another user in 'usedBy'), and 'enrollments_missing' (successful calls without a
+            user document).
+    """
+    successes = [result for result in results if result.status == OK]
+    redemptions = Counter(result.code for result in successes)
+
+    user_refs = [db.collection("users").document(r.user_id) for r in successes]
+    code_refs = [db.collection("invitationCodes").document(c) for c in redemptions]
+    users = {snapshot.id: snapshot for snapshot in db.get_all(user_refs)}
+    codes = {snapshot.id: snapshot for snapshot in db.get_all(code_refs)}
+
+    without_code = 0
+    missing = 0
+    for result in successes:
+        user = users.get(result.user_id)
+        if user is None or not user.exists:
+            missing += 1
+            continue
+        code = codes.get(user.get("invitationCode"))
+        if code is None or not code.exists or code.get("usedBy") != result.user_id:
+            without_code += 1
+
+    return {
+        "codes_used_twice": sum(count > 1 for count in redemptions.values()),
+        "enrollments_without_code": without_code,
+        "enrollments_missing": missing,
+    }
+
+
+def main():  # pylint: disable=too-many-locals
+    """
+    Parses the command-line arguments, seeds invitation codes in the Firestore emulator, fires
+    concurrent checkInvitationCode calls at the Functions emulator, and prints the report.
+
+    Environment Variables:
+        FIRESTORE_EMULATOR_HOST (str): The Firestore emulator host (e.g., "localhost:8080").
+        GCLOUD_PROJECT (str): The Google Cloud project ID.
+
+    Command-line Arguments:
+        -u, --users (int): The number of enrolling users (default is 500).
+        --duplicate_rate (float): The share of users redeeming a code assigned to another user,
+                                  at least 0 and less than 1 (default is 0.1).
+        --concurrency (int): The number of calls in flight at the same time (default is 50).
+        --functions_host (str): The Functions emulator host (default is "localhost:5001").
+        --region (str): The region of the function (default is "us-central1").
+        --timeout (float): Timeout of each call in seconds (default is 30).
+        --seed (int): Seed of the assignment of codes to users.
+        --json (bool): Print the report as one line of JSON (default is False).
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-u", "--users", default=500, type=int, help="The number of enrolling users"
+    )
+    parser.add_argument(
+        "--duplicate_rate",
+        default=0.1,
+        type=duplicate_rate_argument,
+        help="The share of users redeeming a code assigned to another user",
+    )
+    parser.add_argument(
+        "--concurrency",
+        default=50,
+        type=int,
+        help="The number of calls in flight at the same time",
+    )
+    parser.add_argument(
+        "--functions_host",
+        default="localhost:5001",
+        type=str,
+        help="The Functions emulator host",
+    )
+    parser.add_argument(
+        "--region", default="us-central1", type=str, help="The region of the function"
+    )
+    parser.add_argument(
+        "--timeout", default=30.0, type=float, help="Timeout of each call in seconds"
+    )
+    parser.add_argument(
+        "--seed", type=int, help="Seed of the assignment of codes to users"
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print the report as one line of JSON"
+    )
+    parsed = parser.parse_args()
+
+    # The calls use unsigned ID tokens and seed codes, so only run against the emulators:
+    # export FIRESTORE_EMULATOR_HOST="localhost:8080"
+    # export GCLOUD_PROJECT=<project_id>
+    if not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        parser.error(
+            "FIRESTORE_EMULATOR_HOST must be set to run against the emulators."
+        )
+    project_id = os.environ["GCLOUD_PROJECT"]
+    firebase_access = FirebaseFHIRAccess(project_id, "")
+    firebase_access.connect()
+
+    codes = upload_invitation_codes(
+        firebase_access.db,
+        fresh_code_count(parsed.users, parsed.duplicate_rate),
+        8,
+        bulk_options=BulkUploadOptions(),
+    )
+    calls = plan_calls(codes, parsed.users, parsed.duplicate_rate, parsed.seed)
+
+    url = f"http://{parsed.functions_host}/{project_id}/{parsed.region}/checkInvitationCode"
+    start = time.perf_counter()
+    results = run_load(url, project_id, calls, parsed.concurrency, parsed.timeout)
+    seconds = time.perf_counter() - start
+
+    statuses = Counter(result.status for result in results)
+    contended = Counter(code for _, code in calls)
+    aborted = sum(
+        count
+        for status, count in statuses.items()
+        if status != OK and status not in REJECTED_STATUSES
+    )
+    report = {
+        "calls": len(results),
+        "seconds": seconds,
+        "calls_per_second": len(results) / seconds if seconds else 0.0,
+        "latency_ms": latency_percentiles(results),
+        "statuses": dict(statuses),
+        "contended_calls": sum(count for count in contended.values() if count > 1),
+        "abort_rate": aborted / len(results) if results else 0.0,
+        **verify_enrollments(firebase_access.db, results),
+    }
+
+    if parsed.json:
+        print(json.dumps(report))
+        return
+
+    latency = report["latency_ms"]
+    print(
+        f"{report['calls']} calls in {seconds:.1f} s "
+        f"({report['calls_per_second']:.0f} calls/s), "
+        f"{report['contended_calls']} racing for a shared code."
+    )
+    print(
+        f"Latency: p50 {latency['p50']:.0f} ms, p95 {latency['p95']:.0f} ms, "
+        f"p99 {latency['p99']:.0f} ms, max {latency['max']:.0f} ms."
+    )
+    print(
+        "Statuses: "
+        + ", ".join(f"{status} {count}" for status, count in statuses.most_common())
+        + f"; abort rate {report['abort_rate']:.1%}."
+    )
+    print(
+        f"Correctness: {report['codes_used_twice']} codes used twice, "
+        f"{report['enrollments_without_code']} enrollments whose code names another "
+        f"user, {report['enrollments_missing']} enrollments without a user document."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -7,46 +7,158 @@
 #
 
 """
-Module for managing Firestore invitation codes by setting a 'used' field to False 
-and deleting the 'usedBy' field in all documents within the 'invitationCodes' collection.
+Module for managing Firestore invitation codes by setting a 'used' field to False
+and deleting the 'usedBy' field in all used documents within the 'invitationCodes' collection.
 
-This module connects to Firestore using FirebaseFHIRAccess and performs the required 
-document updates.
+This module connects to Firestore using FirebaseFHIRAccess and performs the required
+document updates. Only codes with 'used' set to True are read, page by page, and each is reset
+with a single update through a BulkWriter.
 
 Functions:
-    set_unused(db: Client): Sets the 'used' field to False and deletes the 'usedBy' field 
-                            in all documents within the 'invitationCodes' collection.
-    main(): Connects to Firestore using FirebaseFHIRAccess and updates the documents in 
+    used_codes_query(db: Client) -> Query: Returns the query for the used invitation codes.
+    count_used_codes(db: Client) -> int: Counts the used invitation codes with an aggregation
+                                         query.
+    set_unused(db: Client, options: BulkUploadOptions | None = None, page_size: int = 500,
+               checkpoint: Checkpoint | None = None)
+                                       -> UploadReport: Sets the 'used' field to False and
+                                                        deletes the 'usedBy' field in all used
+                                                        invitation codes.
+    main(): Connects to Firestore using FirebaseFHIRAccess and updates the documents in
             the 'invitationCodes' collection.
 """
 
+import argparse
 import os
+import time
 from spezi_data_pipeline.data_access.firebase_fhir_data_access import (
     FirebaseFHIRAccess,
 )
 from firebase_admin import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
 from google.cloud.firestore_v1.client import Client
+from google.cloud.firestore_v1.field_path import FieldPath
+from google.cloud.firestore_v1.query import Query
+from scripts.checkpoint import Checkpoint
+from scripts.upload_codes import (
+    BulkUploadOptions,
+    UploadReport,
+    add_bulk_arguments,
+    bulk_options_from_arguments,
+    create_bulk_writer,
+)
+
+DEFAULT_PAGE_SIZE = 500
+
+
+def used_codes_query(db: Client) -> Query:
+    """
+    Build the query for the invitation codes that have been used.
+
+    Args:
+        db (Client): The Firestore client instance.
+
+    Returns:
+        Query: The documents of the 'invitationCodes' collection with 'used' set to True.
+    """
+    return (
+        db.collection("invitationCodes")
+        .where(filter=FieldFilter("used", "==", True))
+        .order_by(FieldPath.document_id())
+    )
+
+
+def count_used_codes(db: Client) -> int:
+    """
+    Count the used invitation codes without reading the documents.
+
+    Args:
+        db (Client): The Firestore client instance.
+
+    Returns:
+        int: The number of invitation codes with 'used' set to True.
+    """
+    results = used_codes_query(db).count(alias="used").get()
+    return int(results[0][0].value)
 
 
-def set_unused(db: Client):
+def set_unused(
+    db: Client,
+    options: BulkUploadOptions | None = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    checkpoint: Checkpoint | None = None,
+) -> UploadReport:
     """
-    Sets the 'used' field to False and deletes the 'usedBy' field in all documents
+    Sets the 'used' field to False and deletes the 'usedBy' field in all used documents
     within the 'invitationCodes' collection.
 
     Args:
         db (Client): The Firestore client instance.
+        options (BulkUploadOptions | None): Parallelism, throttling, and retry options
+            (default is BulkUploadOptions()).
+        page_size (int): The number of documents read per page (default is 500).
+        checkpoint (Checkpoint | None): If given, the cursor and the counters are saved after
+            the updates of every page are committed, and a resumed job continues after the
+            saved cursor. The checkpoint is removed when all codes are reset (default is None).
+
+    Returns:
+        UploadReport: The reset and failed codes and the duration of the reset.
 
     Note:
-        This function streams all documents in the 'invitationCodes' collection and
-        performs the update and deletion operations on each document.
+        Only the IDs of the used codes are read, in pages ordered by document ID, and the next
+        page is read while the BulkWriter sends the updates of the previous pages, unless the
+        progress is checkpointed. Each code is reset with one update that sets 'used' and
+        deletes 'usedBy'.
     """
+    options = options or BulkUploadOptions()
+    report = UploadReport()
+    last_code = None
+    if checkpoint is not None and checkpoint.resumed:
+        report.restore(checkpoint.progress)
+        last_code = checkpoint.progress.get("last_code")
+
+    bulk_writer = create_bulk_writer(db, options, report)
     invitation_codes_collection = db.collection("invitationCodes")
-    docs = invitation_codes_collection.stream()
-    for doc in docs:
-        doc.reference.set({"used": False}, merge=True)
-        doc.reference.update(
-            {"usedBy": firestore.DELETE_FIELD}  # pylint: disable=no-member
+    query = used_codes_query(db).select([FieldPath.document_id()]).limit(page_size)
+
+    start = time.perf_counter() - report.seconds
+    while True:
+        page = (
+            query.start_after(
+                {
+                    FieldPath.document_id(): invitation_codes_collection.document(
+                        last_code
+                    )
+                }
+            )
+            if last_code is not None
+            else query
         )
+        docs = list(page.stream())
+        for doc in docs:
+            bulk_writer.update(
+                doc.reference,
+                {
+                    "used": False,
+                    "usedBy": firestore.DELETE_FIELD,  # pylint: disable=no-member
+                },
+            )
+        if docs:
+            last_code = docs[-1].id
+        if checkpoint is not None:
+            # Only save the cursor once the updates before it are committed
+            bulk_writer.flush()
+            bulk_writer = create_bulk_writer(db, options, report)
+            report.seconds = time.perf_counter() - start
+            checkpoint.save(last_code=last_code, **report.progress())
+        if len(docs) < page_size:
+            break
+    # close() rejects retries that are still pending, so wait for them with flush()
+    bulk_writer.flush()
+    report.seconds = time.perf_counter() - start
+
+    if checkpoint is not None:
+        checkpoint.complete()
+    return report
 
 
 def main():
@@ -59,16 +171,71 @@ def main():
         FIRESTORE_EMULATOR_HOST (str): The Firestore emulator host (e.g., "localhost:8080").
         GCLOUD_PROJECT (str): The Google Cloud project ID.
 
+    Command-line Arguments:
+        -d, --dry (bool): Only count the used codes (default is False).
+        --page_size (int): The number of documents read per page (default is 500).
+        --checkpoint (str): Local path of a progress checkpoint; an interrupted reset resumes
+                            from it.
+        --serial (bool): Send the batches one at a time (default is False).
+        --initial_ops (int): Initial writes per second (default is 500).
+        --max_ops (int): Maximum writes per second (default is 10000).
+        --max_attempts (int): Maximum attempts per code (default is 5).
+
     Note:
         Ensure that the path to the service account JSON file is adjusted as needed.
     """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-d",
+        "--dry",
+        action="store_true",
+        help="Only count the used codes with an aggregation query",
+    )
+    parser.add_argument(
+        "--page_size",
+        default=DEFAULT_PAGE_SIZE,
+        type=int,
+        help="The number of documents read per page",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        help="Local path of a progress checkpoint to resume an interrupted reset from",
+    )
+    add_bulk_arguments(parser)
+    parsed = parser.parse_args()
+
     # Assuming that the following environment variables are already set:
     # export FIRESTORE_EMULATOR_HOST="localhost:8080"
     # export GCLOUD_PROJECT=<project_id>
     # Additionally, adjust the path to the service account JSON file as needed.
     firebase_access = FirebaseFHIRAccess(os.environ["GCLOUD_PROJECT"], "")
     firebase_access.connect()
-    set_unused(firebase_access.db)
+
+    if parsed.dry:
+        print(f"{count_used_codes(firebase_access.db)} codes would be reset.")
+        return
+
+    checkpoint = (
+        Checkpoint.load(parsed.checkpoint, job="set_unused")
+        if parsed.checkpoint
+        else None
+    )
+    if checkpoint is not None and checkpoint.resumed:
+        print(
+            f"Resuming from {checkpoint.path} after "
+            f"{checkpoint.progress.get('written', 0)} reset codes."
+        )
+
+    report = set_unused(
+        firebase_access.db,
+        bulk_options_from_arguments(parsed),
+        parsed.page_size,
+        checkpoint,
+    )
+    print(report.summary("Reset"))
+    for code, message in report.failed.items():
+        print(f"Failed to reset {code}: {message}")
 
 
 if __name__ == "__main__":
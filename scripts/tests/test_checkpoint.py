@@ -0,0 +1,49 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the checkpoints of long-running invitation code jobs.
+"""
+
+# Related third-party imports
+import pytest
+
+# Local application/library specific imports
+from scripts.checkpoint import Checkpoint
+
+
+def test_resumes_saved_progress(tmp_path):
+    """A job with the same parameters resumes from the saved progress."""
+    path = str(tmp_path / "job.json")
+    checkpoint = Checkpoint.load(path, count=10)
+    assert not checkpoint.resumed and not checkpoint.progress
+    checkpoint.save(batches=2)
+    checkpoint.save(codes=4)
+
+    resumed = Checkpoint.load(path, count=10)
+    assert resumed.resumed
+    assert resumed.progress == {"batches": 2, "codes": 4}
+    assert not (tmp_path / "job.json.tmp").exists()
+
+
+def test_rejects_other_parameters(tmp_path):
+    """A checkpoint of a job with other parameters is not resumed."""
+    path = str(tmp_path / "job.json")
+    Checkpoint.load(path, count=10).save(batches=1)
+    with pytest.raises(ValueError):
+        Checkpoint.load(path, count=20)
+
+
+def test_complete_removes_the_file(tmp_path):
+    """A completed job starts from scratch when it is run again."""
+    path = str(tmp_path / "job.json")
+    checkpoint = Checkpoint.load(path, count=10)
+    checkpoint.save(batches=1)
+    checkpoint.complete()
+    checkpoint.complete()
+    assert not Checkpoint.load(path, count=10).resumed
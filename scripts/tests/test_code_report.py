@@ -0,0 +1,59 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the invitation code and enrollment report.
+"""
+
+# Standard library imports
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+# Local application/library specific imports
+from scripts.code_report import enrollment_counts, invitation_code_counts
+
+
+def mock_query(count: int) -> MagicMock:
+    """A mock query whose count aggregation returns the given number."""
+    query = MagicMock()
+    query.count.return_value.get.return_value = [[MagicMock(value=count)]]
+    return query
+
+
+def test_counts_invitation_codes_by_usage():
+    """The total, used, and unused codes are counted with aggregation queries."""
+    collection = mock_query(10)
+    used, unused = mock_query(3), mock_query(6)
+    collection.where.side_effect = [used, unused]
+    db = MagicMock()
+    db.collection.return_value = collection
+
+    assert invitation_code_counts(db) == {"total": 10, "used": 3, "unused": 6}
+    db.collection.assert_called_once_with("invitationCodes")
+    filters = [call.kwargs["filter"] for call in collection.where.call_args_list]
+    assert [(f.field_path, f.op_string, f.value) for f in filters] == [
+        ("used", "==", True),
+        ("used", "==", False),
+    ]
+
+
+def test_counts_enrollments_within_windows():
+    """Users are counted per window ending at the given time."""
+    collection = mock_query(50)
+    collection.where.side_effect = [mock_query(2), mock_query(9)]
+    db = MagicMock()
+    db.collection.return_value = collection
+    now = datetime(2024, 5, 8, tzinfo=timezone.utc)
+
+    counts = enrollment_counts(db, [1, 7], now=now)
+    assert counts == {"users": 50, "last_1_days": 2, "last_7_days": 9}
+    filters = [call.kwargs["filter"] for call in collection.where.call_args_list]
+    assert [f.value for f in filters] == [
+        now - timedelta(days=1),
+        now - timedelta(days=7),
+    ]
@@ -0,0 +1,75 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the planning of the checkInvitationCode load test.
+"""
+
+# Standard library imports
+import argparse
+from collections import Counter
+
+# Related third-party imports
+import pytest
+
+# Local application/library specific imports
+from scripts.load_test import (
+    CallResult,
+    duplicate_rate_argument,
+    fresh_code_count,
+    latency_percentiles,
+    plan_calls,
+)
+
+CODES = [f"code{index}" for index in range(100)]
+
+
+def test_share_of_users_races_for_assigned_codes():
+    """A tenth of the users redeem a code that another user also redeems."""
+    calls = plan_calls(CODES, 100, 0.1, seed=0)
+    assert len({user_id for user_id, _ in calls}) == 100
+    assigned = Counter(code for _, code in calls)
+    assert len(assigned) == 90
+    assert set(assigned) <= set(CODES[:90])
+
+
+def test_seed_makes_the_assignment_reproducible():
+    """The same seed assigns the same codes in the same order."""
+    first = [code for _, code in plan_calls(CODES, 50, 0.2, seed=1)]
+    second = [code for _, code in plan_calls(CODES, 50, 0.2, seed=1)]
+    assert first == second
+
+
+def test_at_least_one_fresh_code():
+    """A single user or a high rate still leaves one fresh code to race for."""
+    assert fresh_code_count(1, 0.9) == 1
+    assert fresh_code_count(10, 0.99) == 1
+    assert fresh_code_count(0, 0.5) == 0
+    assert [code for _, code in plan_calls(CODES[:1], 1, 0.9)] == ["code0"]
+    assert Counter(code for _, code in plan_calls(CODES, 4, 0.9)) == {"code0": 4}
+
+
+def test_rejects_invalid_duplicate_rates():
+    """Rates outside [0, 1) and too few codes are rejected before any call."""
+    for rate in ("1.0", "-0.1", "many"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            duplicate_rate_argument(rate)
+    assert duplicate_rate_argument("0") == 0.0
+    with pytest.raises(ValueError):
+        plan_calls(CODES, 10, 1.0)
+    with pytest.raises(ValueError):
+        plan_calls(CODES[:5], 10, 0.1)
+
+
+def test_latency_percentiles():
+    """Percentiles are in milliseconds, also for a single call."""
+    results = [CallResult("u", "c", "OK", seconds / 1000) for seconds in range(1, 101)]
+    percentiles = latency_percentiles(results)
+    assert percentiles["p50"] == pytest.approx(50.5)
+    assert percentiles["max"] == pytest.approx(100.0)
+    assert latency_percentiles(results[:1])["p99"] == pytest.approx(1.0)
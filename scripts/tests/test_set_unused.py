@@ -0,0 +1,96 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the paged reset of the used invitation codes.
+"""
+
+# Standard library imports
+from unittest.mock import MagicMock
+
+# Local application/library specific imports
+from scripts.checkpoint import Checkpoint
+from scripts.set_unused import set_unused
+
+USED_CODES = ["a", "b", "c", "d", "e"]
+
+
+class FakeBulkWriter:
+    """A BulkWriter that writes every update when flushed."""
+
+    def __init__(self):
+        self.updated = []
+        self.on_result = None
+
+    def on_write_result(self, callback):
+        """Register the success callback."""
+        self.on_result = callback
+
+    def on_write_error(self, callback):
+        """Ignore the error callback."""
+
+    def update(self, reference, _document_data):
+        """Pool an update."""
+        self.updated.append(reference)
+
+    def flush(self):
+        """Report all pooled updates as written."""
+        for reference in self.updated:
+            self.on_result(reference, None, self)
+
+
+def mock_db(used_codes: list[str], page_size: int) -> MagicMock:
+    """A mock Firestore client whose used codes are read in pages after a cursor."""
+    db = MagicMock()
+    db.collection.return_value.document.side_effect = lambda code: code
+    used_query = db.collection.return_value.where.return_value.order_by.return_value
+    query = used_query.select.return_value.limit.return_value
+
+    def page_after(cursor):
+        start = used_codes.index(next(iter(cursor.values()))) + 1 if cursor else 0
+        return [
+            MagicMock(id=code, reference=MagicMock(id=code))
+            for code in used_codes[start : start + page_size]
+        ]
+
+    query.stream.side_effect = lambda: page_after(None)
+    query.start_after.side_effect = lambda cursor: MagicMock(
+        stream=MagicMock(return_value=page_after(cursor))
+    )
+    db.writers = []
+
+    def new_writer(_options):
+        db.writers.append(FakeBulkWriter())
+        return db.writers[-1]
+
+    db.bulk_writer.side_effect = new_writer
+    return db
+
+
+def test_resets_all_pages():
+    """All used codes are reset, reading the pages after the last code of the previous."""
+    db = mock_db(USED_CODES, page_size=2)
+    report = set_unused(db, page_size=2)
+    assert sorted(report.written) == USED_CODES
+    assert [len(writer.updated) for writer in db.writers] == [5]
+    assert db.collection.return_value.document.call_count == 2
+
+
+def test_checkpointed_reset_resumes_after_the_saved_cursor(tmp_path):
+    """A resumed reset skips the codes before the cursor and removes the checkpoint."""
+    path = str(tmp_path / "set_unused.json")
+    Checkpoint.load(path, job="set_unused").save(last_code="b", written=2)
+    db = mock_db(USED_CODES, page_size=2)
+
+    report = set_unused(
+        db, page_size=2, checkpoint=Checkpoint.load(path, job="set_unused")
+    )
+    assert report.written == ["c", "d", "e"]
+    assert report.written_count == 5
+    assert [len(writer.updated) for writer in db.writers] == [2, 1, 0]
+    assert not (tmp_path / "set_unused.json").exists()
@@ -0,0 +1,119 @@
+#
+# This source file is part of the Stanford Spezi open-source project
+#
+# SPDX-FileCopyrightText: 2024 Stanford University and the project authors (see CONTRIBUTORS.md)
+#
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests of the invitation-code generation and upload.
+"""
+
+# Standard library imports
+from unittest.mock import MagicMock
+
+# Related third-party imports
+import pytest
+from google.api_core.exceptions import AlreadyExists
+
+# Local application/library specific imports
+from scripts import upload_codes
+from scripts.upload_codes import (
+    ALPHANUMERICS,
+    BulkUploadOptions,
+    UploadReport,
+    generate_unique_codes,
+    upload_invitation_code_batches,
+)
+
+
+class FakeBulkWriter:
+    """A BulkWriter that writes every created document when flushed."""
+
+    def __init__(self):
+        self.created = []
+        self.on_result = None
+
+    def on_write_result(self, callback):
+        """Register the success callback."""
+        self.on_result = callback
+
+    def on_write_error(self, callback):
+        """Ignore the error callback."""
+
+    def create(self, reference, _document_data):
+        """Pool a create."""
+        self.created.append(reference)
+
+    def flush(self):
+        """Report all pooled creates as written."""
+        for reference in self.created:
+            self.on_result(reference, None, self)
+
+
+def mock_db() -> MagicMock:
+    """A mock Firestore client whose document references carry the code as ID."""
+    db = MagicMock()
+    db.collection.return_value.document.side_effect = lambda code: MagicMock(id=code)
+    return db
+
+
+def test_generates_distinct_codes_of_the_alphabet():
+    """Codes are distinct, of the requested length, and alphanumeric."""
+    codes = generate_unique_codes(1000, 8)
+    assert len(set(codes)) == 1000
+    assert all(len(code) == 8 and set(code) <= set(ALPHANUMERICS) for code in codes)
+
+
+def test_repeated_codes_are_counted_and_regenerated(monkeypatch):
+    """A code generated twice is counted as an in-batch collision."""
+    generated = iter(["aa", "bb", "aa", "cc"])
+    monkeypatch.setattr(
+        upload_codes, "generate_random_alphanumeric", lambda _: next(generated)
+    )
+    report = UploadReport()
+    assert generate_unique_codes(3, 2, report) == ["aa", "bb", "cc"]
+    assert report.in_batch_collisions == 1
+
+
+def test_rejects_more_codes_than_the_code_space():
+    """Requesting more codes than possible fails before any write."""
+    with pytest.raises(ValueError):
+        next(upload_invitation_code_batches(mock_db(), len(ALPHANUMERICS) + 1, 1))
+
+
+def test_existing_codes_are_regenerated():
+    """A create of an existing code is a collision, and another code is written."""
+    db = mock_db()
+    create = MagicMock(side_effect=[AlreadyExists("exists"), None, None])
+    db.collection.return_value.document.side_effect = lambda code: MagicMock(
+        id=code, create=create
+    )
+    report = UploadReport()
+    written = [
+        code
+        for batch in upload_invitation_code_batches(db, 2, 8, report=report)
+        for code in batch
+    ]
+    assert len(written) == 2
+    assert report.existing_collisions == 1
+
+
+def test_bulk_upload_uses_a_writer_per_batch():
+    """Every batch is written by a new BulkWriter that is flushed once."""
+    db = mock_db()
+    writers = []
+
+    def new_writer(_options):
+        writers.append(FakeBulkWriter())
+        return writers[-1]
+
+    db.bulk_writer.side_effect = new_writer
+    batches = list(
+        upload_invitation_code_batches(
+            db, 5, 8, bulk_options=BulkUploadOptions(), batch_size=2
+        )
+    )
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert [len(writer.created) for writer in writers] == [2, 2, 1]
@@ -13,29 +13,168 @@ This module includes functions to generate random alphanumeric codes, upload the
 Firestore collection, and handle command-line arguments for configuring the process.
 
 Functions:
-    generate_random_alphanumeric(code_length: int) -> str: Generates a random alphanumeric
-                                                           string of a given length.
-    upload_invitation_codes(db: Client, code_count: int, code_length: int, simulate: bool = False)
+    generate_random_alphanumeric(code_length: int) -> str: Generates a secure random
+                                                           alphanumeric string of a given length.
+    generate_unique_codes(count: int, code_length: int, report: UploadReport | None = None)
+                                                   -> List[str]: Generates distinct codes.
+    find_existing_codes(db: Client, codes: List[str]) -> Set[str]: Looks up which codes already
+                                                                   exist in Firestore.
+    upload_invitation_code_batches(db: Client, code_count: int, code_length: int, ...)
+                                                   -> Iterator[List[str]]: Generates and uploads
+                                                                  distinct codes in batches.
+    upload_invitation_codes(db: Client, code_count: int, code_length: int, simulate: bool = False,
+                            bulk_options: BulkUploadOptions | None = None,
+                            batch_size: int = 10000)
                                                    -> List[str]:  Generates and uploads invitation
                                                                   codes to Firestore.
+    save_code_batches(batches: Iterator[List[str]], report: UploadReport,
+                      outfile: str | None = None, checkpoint: Checkpoint | None = None):
+                                                   Saves uploaded codes and checkpoints the
+                                                   progress.
+    print_report(report: UploadReport, simulate: bool = False): Prints the summary of an upload.
+    create_bulk_writer(db: Client, options: BulkUploadOptions, report: UploadReport)
+                                                   -> BulkWriter: Creates a BulkWriter that records
+                                                                  its outcome in a report, for one
+                                                                  flush().
+    bulk_upload_invitation_codes(db: Client, codes: List[str],
+                                 options: BulkUploadOptions | None = None) -> UploadReport:
+                                                   Uploads invitation codes with a BulkWriter.
+    add_bulk_arguments(parser: ArgumentParser): Adds the command-line arguments of the bulk
+                                                options to a parser.
+    bulk_options_from_arguments(parsed: Namespace) -> BulkUploadOptions: Creates the bulk
+                                                options from parsed command-line arguments.
     main(): Main function to parse command-line arguments and run the logic for generating 
             and uploading invitation codes.
 """
 
 import argparse
 import os
-import random
+import secrets
 import string
-from typing import List
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Set
 from spezi_data_pipeline.data_access.firebase_fhir_data_access import (
     FirebaseFHIRAccess,
 )
+from google.api_core.exceptions import AlreadyExists
+from google.cloud.firestore_v1.bulk_writer import (
+    BulkRetry,
+    BulkWriter,
+    BulkWriterOptions,
+    SendMode,
+)
 from google.cloud.firestore_v1.client import Client
+from scripts.checkpoint import Checkpoint
+
+# gRPC status codes of transient failures: DEADLINE_EXCEEDED, RESOURCE_EXHAUSTED, ABORTED,
+# INTERNAL, and UNAVAILABLE
+RETRYABLE_STATUS_CODES = {4, 8, 10, 13, 14}
+# gRPC status code of a create() for a document that already exists
+ALREADY_EXISTS = 6
+ALPHANUMERICS = string.ascii_letters + string.digits
+DEFAULT_BATCH_SIZE = 10000
+GET_ALL_CHUNK_SIZE = 1000
+# Consecutive batches of only collisions after which the code space is considered exhausted
+MAX_COLLIDING_BATCHES = 10
+
+
+@dataclass
+class BulkUploadOptions:
+    """
+    Options of the bulk upload.
+
+    The BulkWriter starts at `initial_ops_per_second` and raises its budget by 50% every five
+    minutes up to `max_ops_per_second`, following the 500/50/5 ramp-up rule for Firestore
+    writes.
+
+    Attributes:
+        parallel (bool): Whether batches are sent in parallel by the thread pool of the
+            BulkWriter (False sends them one at a time).
+        initial_ops_per_second (int): Write budget at the start of the upload.
+        max_ops_per_second (int): Maximum write budget after ramping up.
+        max_attempts (int): Maximum attempts per document for transient failures.
+    """
+
+    parallel: bool = True
+    initial_ops_per_second: int = 500
+    max_ops_per_second: int = 10000
+    max_attempts: int = 5
+
+
+@dataclass
+class UploadReport:
+    """
+    Outcome of a bulk upload.
+
+    Attributes:
+        written (List[str]): The codes that were written and not yet drained.
+        failed (Dict[str, str]): Error messages of the codes that could not be written.
+        seconds (float): Duration of the upload in seconds.
+        in_batch_collisions (int): Generated codes that repeated a code of the same batch.
+        existing_collisions (int): Generated codes that already existed in Firestore.
+        drained (int): The number of written codes removed from `written` by drain().
+    """
+
+    written: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    seconds: float = 0.0
+    in_batch_collisions: int = 0
+    existing_collisions: int = 0
+    drained: int = 0
+
+    @property
+    def written_count(self) -> int:
+        """The number of written codes, including the drained ones."""
+        return self.drained + len(self.written)
+
+    @property
+    def throughput(self) -> float:
+        """Written codes per second."""
+        return self.written_count / self.seconds if self.seconds else 0.0
+
+    def progress(self) -> Dict[str, Any]:
+        """Return the counters of the report to save in a checkpoint."""
+        return {
+            "written": self.written_count,
+            "failed": self.failed,
+            "seconds": self.seconds,
+            "in_batch_collisions": self.in_batch_collisions,
+            "existing_collisions": self.existing_collisions,
+        }
+
+    def restore(self, progress: Dict[str, Any]):
+        """Restore the counters of the report from a checkpoint."""
+        self.failed = dict(progress.get("failed", {}))
+        self.seconds = progress.get("seconds", 0.0)
+        self.in_batch_collisions = progress.get("in_batch_collisions", 0)
+        self.existing_collisions = progress.get("existing_collisions", 0)
+        self.drained = progress.get("written", 0) - len(self.written)
+
+    def drain(self) -> List[str]:
+        """Remove and return the written codes, keeping their count."""
+        written, self.written = self.written, []
+        self.drained += len(written)
+        return written
+
+    def summary(self, action: str = "Uploaded") -> str:
+        """Describe the outcome in one line, starting with the action taken on the codes."""
+        summary = (
+            f"{action} {self.written_count} codes in {self.seconds:.1f} s "
+            f"({self.throughput:.0f} codes/s), {len(self.failed)} failed"
+        )
+        if self.in_batch_collisions or self.existing_collisions:
+            summary += (
+                f", {self.in_batch_collisions} in-batch and "
+                f"{self.existing_collisions} existing collisions regenerated"
+            )
+        return summary + "."
 
 
 def generate_random_alphanumeric(code_length: int) -> str:
     """
-    Generate a random alphanumeric string.
+    Generate a random alphanumeric string with a cryptographically secure generator.
 
     Args:
         code_length (int): The length of the alphanumeric string to generate.
@@ -43,38 +182,395 @@ def generate_random_alphanumeric(code_length: int) -> str:
     Returns:
         str: A randomly generated alphanumeric string of the specified length.
     """
-    alphanumerics = string.ascii_letters + string.digits
-    return "".join(random.choice(alphanumerics) for _ in range(code_length))
+    return "".join(secrets.choice(ALPHANUMERICS) for _ in range(code_length))
 
 
-def upload_invitation_codes(
-    db: Client, code_count: int, code_length: int, simulate: bool = False
+def generate_unique_codes(
+    count: int, code_length: int, report: UploadReport | None = None
 ) -> List[str]:
     """
-    Generate and upload invitation codes to Firestore.
+    Generate distinct random alphanumeric codes.
+
+    Args:
+        count (int): The number of codes to generate.
+        code_length (int): The character length of each code.
+        report (UploadReport | None): If given, repeated codes are counted as in-batch
+            collisions (default is None).
+
+    Returns:
+        List[str]: The codes in the order they were generated.
+    """
+    codes: Dict[str, None] = {}
+    while len(codes) < count:
+        code = generate_random_alphanumeric(code_length)
+        if code in codes:
+            if report is not None:
+                report.in_batch_collisions += 1
+        else:
+            codes[code] = None
+    return list(codes)
+
+
+def find_existing_codes(db: Client, codes: List[str]) -> Set[str]:
+    """
+    Look up which codes already exist in the 'invitationCodes' collection.
+
+    The documents are read with batched get_all() calls that return no fields.
+
+    Args:
+        db (Client): The Firestore client instance.
+        codes (List[str]): The codes to look up.
+
+    Returns:
+        Set[str]: The codes that already exist.
+    """
+    invitation_codes_collection = db.collection("invitationCodes")
+    existing = set()
+    for start in range(0, len(codes), GET_ALL_CHUNK_SIZE):
+        references = [
+            invitation_codes_collection.document(code)
+            for code in codes[start : start + GET_ALL_CHUNK_SIZE]
+        ]
+        for snapshot in db.get_all(references, field_paths=[]):
+            if snapshot.exists:
+                existing.add(snapshot.id)
+    return existing
+
+
+def create_bulk_writer(
+    db: Client, options: BulkUploadOptions, report: UploadReport
+) -> BulkWriter:
+    """
+    Create a BulkWriter that records its outcome in a report.
+
+    Documents that fail with a transient error are retried with exponential backoff up to
+    `options.max_attempts` times. Creates of documents that already exist are counted as
+    existing collisions; other failures are added to the report.
+
+    The BulkWriter shuts its thread pool down in flush(), after which another flush() does not
+    send operations that do not fill a whole batch, so callers create a new writer per flush().
+
+    Args:
+        db (Client): The Firestore client instance.
+        options (BulkUploadOptions): Parallelism, throttling, and retry options.
+        report (UploadReport): The report that written and failed document IDs are added to.
+
+    Returns:
+        BulkWriter: The writer; call flush() once to wait for all writes and retries.
+    """
+    lock = threading.Lock()
+    bulk_writer = db.bulk_writer(
+        BulkWriterOptions(
+            initial_ops_per_second=options.initial_ops_per_second,
+            max_ops_per_second=options.max_ops_per_second,
+            mode=SendMode.parallel if options.parallel else SendMode.serial,
+            retry=BulkRetry.exponential,
+        )
+    )
+
+    def on_write_result(reference, _result, _bulk_writer):
+        with lock:
+            report.written.append(reference.id)
+
+    def on_write_error(failure, _bulk_writer) -> bool:
+        if (
+            failure.code in RETRYABLE_STATUS_CODES
+            and failure.attempts < options.max_attempts
+        ):
+            return True
+        with lock:
+            if failure.code == ALREADY_EXISTS:
+                report.existing_collisions += 1
+            else:
+                report.failed[failure.operation.reference.id] = failure.message
+        return False
+
+    bulk_writer.on_write_result(on_write_result)
+    bulk_writer.on_write_error(on_write_error)
+    return bulk_writer
+
+
+def bulk_upload_invitation_codes(
+    db: Client, codes: List[str], options: BulkUploadOptions | None = None
+) -> UploadReport:
+    """
+    Upload invitation codes to Firestore with a BulkWriter.
+
+    Writes are sent in parallel batches within the ramped-up write budget. Codes are created
+    with a precondition, so codes that already exist are counted as collisions and never
+    overwritten. Documents that fail with a transient error are retried with exponential backoff;
+    other failures are reported.
+
+    Args:
+        db (Client): The Firestore client instance.
+        codes (List[str]): The invitation codes to upload.
+        options (BulkUploadOptions | None): Parallelism, throttling, and retry options
+            (default is BulkUploadOptions()).
+
+    Returns:
+        UploadReport: The written and failed codes and the duration of the upload.
+    """
+    options = options or BulkUploadOptions()
+    invitation_codes_collection = db.collection("invitationCodes")
+    report = UploadReport()
+    bulk_writer = create_bulk_writer(db, options, report)
+
+    start = time.perf_counter()
+    for code in codes:
+        bulk_writer.create(invitation_codes_collection.document(code), {"used": False})
+    # close() rejects retries that are still pending, so wait for them with flush()
+    bulk_writer.flush()
+    report.seconds = time.perf_counter() - start
+
+    return report
+
+
+def upload_invitation_code_batches(  # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals,too-many-branches
+    db: Client,
+    code_count: int,
+    code_length: int,
+    simulate: bool = False,
+    bulk_options: BulkUploadOptions | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    report: UploadReport | None = None,
+    checkpoint: Checkpoint | None = None,
+) -> Iterator[List[str]]:
+    """
+    Generate and upload distinct invitation codes to Firestore in batches.
+
+    Codes are deduplicated within a batch and created with a precondition, so a code that
+    already exists is never overwritten; collisions are replaced by new codes until
+    `code_count` codes are written or have failed. Only one batch is held in memory, except in
+    a dry run, which keeps the codes of earlier batches to deduplicate across batches.
 
     Args:
         db (Client): The Firestore client instance.
         code_count (int): The number of invitation codes to generate.
         code_length (int): The character length of each invitation code.
-        simulate (bool): If True, do not actually upload to Firestore (default is False).
+        simulate (bool): If True, only look up existing codes with get_all() instead of
+            uploading (default is False).
+        bulk_options (BulkUploadOptions | None): If given, the codes are uploaded with a
+            BulkWriter (default is None, which writes one code at a time).
+        batch_size (int): The number of codes generated and uploaded per batch (default is
+            10000).
+        report (UploadReport | None): Report that collects the outcome (default is None).
+        checkpoint (Checkpoint | None): If given, every batch is saved as pending before it is
+            written, and a resumed job continues from the counters of the checkpoint. Pending
+            codes that exist were written by the interrupted job and count as written; the
+            others are created. The caller saves the progress after every batch (default is
+            None).
 
-    Returns:
-        List[str]: A list of generated invitation codes.
+    Yields:
+        List[str]: The codes of a batch that were written.
+
+    Raises:
+        ValueError: If there are fewer possible codes of the given length than requested.
+        RuntimeError: If consecutive batches only produce collisions.
     """
+    if code_count > len(ALPHANUMERICS) ** code_length:
+        raise ValueError(
+            f"Cannot generate {code_count} distinct codes of length {code_length}."
+        )
+    report = report if report is not None else UploadReport()
     invitation_codes_collection = db.collection("invitationCodes")
-    codes = []
 
-    for _ in range(code_count):
-        code = generate_random_alphanumeric(code_length)
-        if not simulate:
-            document_reference = invitation_codes_collection.document(code)
-            document_reference.set({"used": False})
-        codes.append(code)
+    pending: List[str] = []
+    if checkpoint is not None and checkpoint.resumed:
+        report.restore(checkpoint.progress)
+        pending = checkpoint.progress.get("pending", [])
+
+    start = time.perf_counter() - report.seconds
+    remaining = code_count - report.written_count - len(report.failed)
+    colliding_batches = 0
+    simulated: Set[str] = set()
+    while remaining > 0 or pending:
+        failed_before = len(report.failed)
+        if pending:
+            existing = find_existing_codes(db, pending)
+            report.written.extend(code for code in pending if code in existing)
+            codes = [code for code in pending if code not in existing]
+            pending = []
+        else:
+            codes = generate_unique_codes(
+                min(batch_size, remaining), code_length, report
+            )
+        if checkpoint is not None:
+            checkpoint.save(pending=codes)
+
+        if simulate:
+            existing = find_existing_codes(db, codes) | simulated.intersection(codes)
+            report.existing_collisions += len(existing)
+            report.written.extend(code for code in codes if code not in existing)
+            simulated.update(report.written)
+        elif bulk_options is not None:
+            bulk_writer = create_bulk_writer(db, bulk_options, report)
+            for code in codes:
+                bulk_writer.create(
+                    invitation_codes_collection.document(code), {"used": False}
+                )
+            # close() rejects retries that are still pending, so wait for them with flush()
+            bulk_writer.flush()
+        else:
+            for code in codes:
+                try:
+                    invitation_codes_collection.document(code).create({"used": False})
+                except AlreadyExists:
+                    report.existing_collisions += 1
+                    continue
+                report.written.append(code)
+
+        written = report.drain()
+        completed = len(written) + len(report.failed) - failed_before
+        colliding_batches = colliding_batches + 1 if completed == 0 else 0
+        if colliding_batches == MAX_COLLIDING_BATCHES:
+            raise RuntimeError(
+                f"{MAX_COLLIDING_BATCHES} consecutive batches only collided with existing "
+                "codes; increase the code length."
+            )
+        remaining -= completed
+        report.seconds = time.perf_counter() - start
+        yield written
+
+
+def upload_invitation_codes(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    db: Client,
+    code_count: int,
+    code_length: int,
+    simulate: bool = False,
+    bulk_options: BulkUploadOptions | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> List[str]:
+    """
+    Generate and upload distinct invitation codes to Firestore and print a report.
 
+    Args:
+        db (Client): The Firestore client instance.
+        code_count (int): The number of invitation codes to generate.
+        code_length (int): The character length of each invitation code.
+        simulate (bool): If True, do not actually upload to Firestore (default is False).
+        bulk_options (BulkUploadOptions | None): If given, the codes are uploaded with a
+            BulkWriter (default is None, which writes one code at a time).
+        batch_size (int): The number of codes generated and uploaded per batch (default is
+            10000).
+
+    Returns:
+        List[str]: A list of generated invitation codes. Codes that could not be written are
+            left out.
+    """
+    report = UploadReport()
+    codes = [
+        code
+        for batch in upload_invitation_code_batches(
+            db, code_count, code_length, simulate, bulk_options, batch_size, report
+        )
+        for code in batch
+    ]
+    print_report(report, simulate)
     return codes
 
 
+def save_code_batches(
+    batches: Iterator[List[str]],
+    report: UploadReport,
+    outfile: str | None = None,
+    checkpoint: Checkpoint | None = None,
+):
+    """
+    Write uploaded batches of codes to a local file and checkpoint the progress after every
+    batch.
+
+    A resumed job truncates the file to the size saved in the checkpoint and appends to it, so
+    codes of an interrupted batch are not written twice. The checkpoint is removed once all
+    batches are written.
+
+    Args:
+        batches (Iterator[List[str]]): The batches of upload_invitation_code_batches.
+        report (UploadReport): The report the batches are collected in.
+        outfile (str | None): Local path where a copy of the codes is saved (default is None).
+        checkpoint (Checkpoint | None): The checkpoint passed to the batches (default is None).
+    """
+    offset = checkpoint.progress.get("outfile_offset", 0) if checkpoint else 0
+    with open(outfile or os.devnull, "a+", encoding="utf-8") as f:
+        if outfile and os.path.getsize(outfile) > offset:
+            f.truncate(offset)
+        separator = "\n" if offset else ""
+        for batch in batches:
+            if batch:
+                f.write(separator + "\n".join(batch))
+                separator = "\n"
+            f.flush()
+            if checkpoint is not None:
+                checkpoint.save(
+                    pending=[], outfile_offset=f.tell(), **report.progress()
+                )
+    if checkpoint is not None:
+        checkpoint.complete()
+
+
+def print_report(report: UploadReport, simulate: bool = False):
+    """
+    Print the summary of an upload and the codes that could not be written.
+
+    Args:
+        report (UploadReport): The outcome of the upload.
+        simulate (bool): Whether the upload was a dry run (default is False).
+    """
+    print(report.summary("Simulated" if simulate else "Uploaded"))
+    for code, message in report.failed.items():
+        print(f"Failed to upload {code}: {message}")
+
+
+def add_bulk_arguments(parser: argparse.ArgumentParser):
+    """
+    Add the command-line arguments of the BulkUploadOptions to a parser.
+
+    Args:
+        parser (argparse.ArgumentParser): The parser of a script that writes with a BulkWriter.
+    """
+    parser.add_argument(
+        "--serial",
+        action="store_true",
+        default=False,
+        help="Send the batches of writes one at a time instead of in parallel",
+    )
+    parser.add_argument(
+        "--initial_ops",
+        default=BulkUploadOptions.initial_ops_per_second,
+        type=int,
+        help="The initial writes per second, ramped up by 50%% every 5 minutes",
+    )
+    parser.add_argument(
+        "--max_ops",
+        default=BulkUploadOptions.max_ops_per_second,
+        type=int,
+        help="The maximum writes per second",
+    )
+    parser.add_argument(
+        "--max_attempts",
+        default=BulkUploadOptions.max_attempts,
+        type=int,
+        help="The maximum attempts per code for transient failures",
+    )
+
+
+def bulk_options_from_arguments(parsed: argparse.Namespace) -> BulkUploadOptions:
+    """
+    Create the BulkUploadOptions from parsed command-line arguments.
+
+    Args:
+        parsed (argparse.Namespace): Arguments of a parser set up with add_bulk_arguments.
+
+    Returns:
+        BulkUploadOptions: The parallelism, throttling, and retry options.
+    """
+    return BulkUploadOptions(
+        parallel=not parsed.serial,
+        initial_ops_per_second=parsed.initial_ops,
+        max_ops_per_second=parsed.max_ops,
+        max_attempts=parsed.max_attempts,
+    )
+
+
 def main():
     """
     Main function to parse command-line arguments and run the logic for generating
@@ -87,6 +583,16 @@ def main():
         -d, --dry (bool): Dry run the program (i.e., without uploading to Firestore) (default is
                           False).
         --service_account (str): The path to the service account JSON file for Firebase.
+        --batch_size (int): The number of codes generated and uploaded per batch (default is
+                            10000).
+        --checkpoint (str): Local path of a progress checkpoint; an interrupted upload with the
+                            same count, length, and outfile resumes from it (ignored in dry
+                            runs).
+        --bulk (bool): Upload the codes with a BulkWriter (default is False).
+        --serial (bool): Send the batches one at a time in bulk mode (default is False).
+        --initial_ops (int): Initial writes per second in bulk mode (default is 500).
+        --max_ops (int): Maximum writes per second in bulk mode (default is 10000).
+        --max_attempts (int): Maximum attempts per code in bulk mode (default is 5).
     """
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -121,6 +627,24 @@ def main():
         type=str,
         help="The path to the service account JSON file for Firebase",
     )
+    parser.add_argument(
+        "--batch_size",
+        default=DEFAULT_BATCH_SIZE,
+        type=int,
+        help="The number of codes generated and uploaded per batch",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        help="Local path of a progress checkpoint to resume an interrupted upload from",
+    )
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        default=False,
+        help="Upload the codes with a BulkWriter and report the throughput",
+    )
+    add_bulk_arguments(parser)
     parsed = parser.parse_args()
 
     # Assuming that the following environment variables are already set:
@@ -131,13 +655,37 @@ def main():
         os.environ["GCLOUD_PROJECT"], parsed.service_account
     )
     firebase_access.connect()
-    codes = upload_invitation_codes(
-        firebase_access.db, parsed.count, parsed.length, parsed.dry
+    bulk_options = bulk_options_from_arguments(parsed) if parsed.bulk else None
+    checkpoint = (
+        Checkpoint.load(
+            parsed.checkpoint,
+            job="upload_codes",
+            count=parsed.count,
+            length=parsed.length,
+            outfile=parsed.outfile,
+        )
+        if parsed.checkpoint and not parsed.dry
+        else None
     )
+    if checkpoint is not None and checkpoint.resumed:
+        print(
+            f"Resuming from {checkpoint.path} with "
+            f"{checkpoint.progress.get('written', 0)} codes uploaded."
+        )
 
-    if parsed.outfile:
-        with open(parsed.outfile, "w+", encoding="utf-8") as f:
-            f.write("\n".join(codes))
+    report = UploadReport()
+    batches = upload_invitation_code_batches(
+        firebase_access.db,
+        parsed.count,
+        parsed.length,
+        parsed.dry,
+        bulk_options,
+        parsed.batch_size,
+        report,
+        checkpoint,
+    )
+    save_code_batches(batches, report, parsed.outfile, checkpoint)
+    print_report(report, parsed.dry)
 
 
 if __name__ == "__main__":